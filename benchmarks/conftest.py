@@ -0,0 +1,130 @@
+"""
+Fixtures for the benchmark suite.
+
+Run the suite via
+
+    pytest benchmarks
+
+Results are saved as JSON in .benchmarks/ (including the git commit), so runs can be compared
+with `pytest-benchmark compare`. Synthetic catalogs are created with 10k and 100k bitstreams by
+default - use `--catalog-sizes 10000,100000,1000000` to include larger ones.
+"""
+import json
+import random
+import hashlib
+import zipfile
+from pathlib import Path
+from collections import OrderedDict
+
+import pytest
+from pytest_benchmark.utils import get_tag
+
+from pysoundcomparisons.mediacatalog import MediaCatalog
+
+REPOS = Path(__file__).resolve().parent.parent
+WORDS_PER_VARIETY = 1000
+SEED = 42
+EXTENSIONS = OrderedDict([('mp3', 'audio/mpeg'), ('ogg', 'audio/ogg'), ('wav', 'audio/wav')])
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--catalog-sizes',
+        default='10000,100000',
+        help='comma separated numbers of bitstreams in the synthetic catalogs')
+
+
+def pytest_configure(config):
+    # Autosave results, unless they are explicitly saved otherwise.
+    if not (config.option.benchmark_json or config.option.benchmark_save):
+        config.option.benchmark_autosave = get_tag()
+
+
+def pytest_generate_tests(metafunc):
+    if 'size' in metafunc.fixturenames:
+        metafunc.parametrize(
+            'size',
+            [int(n) for n in metafunc.config.getoption('catalog_sizes').split(',')],
+            scope='session')
+
+
+def synthetic_catalog(size):
+    """
+    :return: `dict` in the format of soundfiles/catalog.json, with `size` bitstreams.
+    """
+    res = OrderedDict()
+    for i in range(size // len(EXTENSIONS)):
+        variety, word = divmod(i, WORDS_PER_VARIETY)
+        name = 'Fam_Sub_Lg_{0}_Dl_{1:03d}_word_w{1}'.format(variety, word + 100)
+        res['EAEA0-{0:04X}-{1:04X}-{2:04X}-0'.format(i >> 32, (i >> 16) & 0xffff, i & 0xffff)] = {
+            'bitstreams': [OrderedDict([
+                ('bitstreamid', '{0}.{1}'.format(name, ext)),
+                ('checksum', hashlib.md5('{0}.{1}'.format(name, ext).encode()).hexdigest()),
+                ('created', 1530871113011),
+                ('checksum-algorithm', 'MD5'),
+                ('last-modified', 1530871113045),
+                ('filesize', 23703),
+                ('content-type', mimetype),
+            ]) for ext, mimetype in EXTENSIONS.items()],
+            'metadata': {'collection': 'soundcomparisons', 'name': name, 'type': 'soundfile'},
+        }
+    return res
+
+
+@pytest.fixture(scope='session')
+def catalog_paths(tmp_path_factory):
+    """
+    :return: function returning the paths of the json and zipped synthetic catalogs of a size.
+    """
+    cache = {}
+
+    def paths(size):
+        if size not in cache:
+            d = tmp_path_factory.mktemp('catalog{0}'.format(size))
+            data = json.dumps(synthetic_catalog(size), indent=0, separators=(',', ':'))
+            d.joinpath('catalog.json').write_text(data, encoding='utf8')
+            with zipfile.ZipFile(str(d / 'catalog.json.zip'), 'w', zipfile.ZIP_DEFLATED) as z:
+                z.writestr('catalog.json', data)
+            cache[size] = (d / 'catalog.json', d / 'catalog.json.zip')
+        return cache[size]
+    return paths
+
+
+@pytest.fixture(scope='session')
+def catalogs(catalog_paths):
+    cache = {}
+
+    def catalog(size):
+        if size not in cache:
+            cache[size] = MediaCatalog(catalog_paths(size)[0])
+        return cache[size]
+    return catalog
+
+
+@pytest.fixture
+def catalog(catalogs, size):
+    return catalogs(size)
+
+
+@pytest.fixture
+def sample(catalog):
+    """
+    A reproducible sample of 1000 object names of the catalog.
+    """
+    return random.Random(SEED).sample(sorted(catalog._name_uid_map), 1000)
+
+
+@pytest.fixture(scope='session')
+def catalog_keys():
+    """
+    The names of all objects in soundfiles/catalog.json.zip - or, if the catalog is not
+    available, the names listed in soundfiles/modified.json, padded to a similar size.
+    """
+    catalog = REPOS / 'soundfiles' / 'catalog.json.zip'
+    if catalog.exists():
+        return list(MediaCatalog(catalog)._name_uid_map)
+
+    modified = json.loads(REPOS.joinpath('soundfiles', 'modified.json').read_text('utf8'))
+    names = sorted(set(n for k in ['obsolete', 'check'] for v in modified[k].values() for n in v))
+    return ['{0}{1}'.format(n, '' if i == 0 else '_pron{0}'.format(i + 1))
+            for i in range(40) for n in names]
@@ -0,0 +1,38 @@
+"""
+Tagging throughput of the in-memory tag rewriter vs. the ffmpeg subprocess fallback.
+"""
+import shutil
+import struct
+import itertools
+
+import pytest
+
+from pysoundcomparisons.audiotags import retag, ffmpeg_retag, _paginate
+
+TAGS = dict(title='626_leaf', album='Oce_Van_Mal_Nth_WNth_MaluaBay_Marasup_Dl', artist='x')
+
+# Synthetic sound files of roughly the size of a typical bitstream in the catalog.
+DATA = {
+    'mp3': b'\xff\xfb\x90\x00' * 6000,
+    'wav': b''.join([
+        b'RIFF', struct.pack('<I', 185560), b'WAVEfmt ', struct.pack('<I', 16), b'\x00' * 16,
+        b'data', struct.pack('<I', 185524), b'\x00' * 185524]),
+    'ogg': b''.join(itertools.chain(
+        _paginate([b'\x01vorbis' + b'\x00' * 23], 1, 0),
+        _paginate([b'\x03vorbis\x00\x00\x00\x00\x00\x00\x00\x00\x01',
+                   b'\x05vorbis' + b'x' * 3000], 1, 1),
+        [b''.join(_paginate([b'a' * 4000], 1, i)) for i in range(2, 9)])),
+}
+
+
+@pytest.mark.parametrize('fmt', sorted(DATA))
+def test_retag(benchmark, fmt):
+    benchmark(retag, DATA[fmt], fmt, **TAGS)
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg not installed')
+@pytest.mark.parametrize('fmt', sorted(DATA))
+def test_ffmpeg_retag(benchmark, tmp_path, fmt):
+    src = tmp_path / 'in.{0}'.format(fmt)
+    src.write_bytes(retag(DATA[fmt], fmt, **TAGS))
+    benchmark(ffmpeg_retag, src, tmp_path / 'out.{0}'.format(fmt), **TAGS)
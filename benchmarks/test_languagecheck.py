@@ -0,0 +1,35 @@
+"""
+Cross-study language consistency check on synthetic Languages data of 30 studies with 1000
+languages each - every language in 3 studies - and 40 fields.
+"""
+import random
+
+import pytest
+
+from pysoundcomparisons.languagecheck import LanguageTable, find_conflicts
+
+STUDIES, LANGUAGES, FIELDS = 30, 10000, 40
+
+
+@pytest.fixture(scope='module')
+def languages():
+    rng = random.Random(42)
+    header = ['study', 'LanguageIx'] + ['Field{0}'.format(i) for i in range(FIELDS)]
+    rows = []
+    for ix in range(LANGUAGES):
+        values = ['value {0} {1}'.format(ix, i) for i in range(FIELDS)]
+        for study in rng.sample(range(STUDIES), 3):
+            row = ['Study{0}'.format(study), str(11110000000 + ix)] + values
+            if rng.random() < 0.01:
+                row[rng.randrange(2, len(row))] = 'conflicting'
+            rows.append(row)
+    return header, rows
+
+
+def test_LanguageTable(benchmark, languages):
+    benchmark(LanguageTable, *languages)
+
+
+def test_find_conflicts(benchmark, languages):
+    res = benchmark(find_conflicts, LanguageTable(*languages))
+    assert 0 < len(res) < LANGUAGES
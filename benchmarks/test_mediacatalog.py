@@ -0,0 +1,98 @@
+"""
+Benchmarks for the hot paths of catalog handling, reconciliation and export, run on synthetic
+catalogs of different sizes.
+"""
+import random
+import types
+
+from cdstarcat import Catalog
+
+from pysoundcomparisons.mediacatalog import MediaCatalog, SoundfileName, SoundfileNames
+from pysoundcomparisons.commands import _write_csv_to_file
+from pysoundcomparisons.commands.write_modified_soundfiles import modified_soundfiles
+
+from conftest import SEED
+
+
+def test_load_json(benchmark, catalog_paths, size):
+    cat = benchmark.pedantic(MediaCatalog, args=(catalog_paths(size)[0],), rounds=3)
+    assert len(cat) == size // 3
+
+
+def test_load_zip(benchmark, catalog_paths, size):
+    cat = benchmark.pedantic(MediaCatalog, args=(catalog_paths(size)[1],), rounds=3)
+    assert len(cat) == size // 3
+
+
+def test_name_uid_map(benchmark, catalog):
+    def build():
+        catalog.__dict__.pop('_name_uid_map', None)
+        return catalog._name_uid_map
+    benchmark(build)
+
+
+def test_getitem(benchmark, catalog, sample):
+    keys = sample + [catalog[k].id for k in sample]
+    benchmark(lambda: [catalog[k] for k in keys])
+
+
+def test_contains(benchmark, catalog, sample):
+    keys = sample + [k + '_x' for k in sample]
+    benchmark(lambda: [k in catalog for k in keys])
+
+
+def test_get_soundfilenames(benchmark, catalog, sample):
+    prefixes = [SoundfileName(k).variety for k in sample[:10]]
+    benchmark(lambda: [catalog.get_soundfilenames(p) for p in prefixes])
+
+
+def test_matching_bitstreams(benchmark, catalog, sample):
+    mimetypes = [MediaCatalog.mimetypes['ogg']]
+    benchmark(lambda: [catalog.matching_bitstreams(k, mimetypes=mimetypes) for k in sample])
+
+
+def test_SoundfileName(benchmark, catalog):
+    names = [bs.id for obj in catalog for bs in obj.bitstreams]
+    benchmark(lambda: [SoundfileName(n) for n in names])
+
+
+def test_SoundfileNames(benchmark, catalog):
+    names = [bs.id for obj in catalog for bs in obj.bitstreams]
+    benchmark(SoundfileNames.parse, names)
+
+
+def test_modified_soundfiles(benchmark, catalog):
+    rng = random.Random(SEED)
+    objs = sorted(catalog, key=lambda o: o.id)
+    server, valid = [], set()
+    for i, obj in enumerate(objs):
+        name = obj.metadata['name']
+        if i % 10:  # 10% of the objects are missing on the server.
+            for bs in obj.bitstreams:
+                md5 = bs.md5 if rng.random() > 0.01 else '0' * 32
+                server.append('{0}  /srv/sound/{1}/{2}'.format(
+                    md5, SoundfileName(name).variety, bs.id))
+        if i % 20:
+            valid.add(name)
+    res = benchmark.pedantic(modified_soundfiles, args=(catalog, server, valid), rounds=3)
+    assert res['obsolete'] and res['check'] and res['modified']
+
+
+def test_write_csv(benchmark, tmp_path, size):
+    header = ['LanguageIx', 'FilePathPart', 'ShortName', 'Latitude', 'Longitude']
+    rows = [[i, 'Fam_Sub_Lg_{0}_Dl'.format(i), 'Lang {0}'.format(i), 52.5, 13.4]
+            for i in range(size)]
+    api = types.SimpleNamespace(repos=tmp_path)
+    benchmark.pedantic(_write_csv_to_file, args=(rows, 'languages.csv', api, header), rounds=3)
+
+
+def test_save_cdstarcat(benchmark, catalogs, size, tmp_path):
+    cat = catalogs(size)
+    cat.path = tmp_path / 'catalog.json.zip'
+    benchmark.pedantic(Catalog.__exit__, args=(cat, None, None, None), rounds=3)
+
+
+def test_save(benchmark, catalogs, size, tmp_path):
+    cat = catalogs(size)
+    cat.path = tmp_path / 'catalog.json.zip'
+    benchmark.pedantic(cat.save, kwargs=dict(force=True), rounds=3)
@@ -0,0 +1,27 @@
+"""
+Parse throughput for the full set of catalog keys, one name at a time vs. in bulk.
+"""
+from pysoundcomparisons.mediacatalog import SoundfileName, SoundfileNames
+
+
+def _parse_each(names):
+    res = []
+    for name in names:
+        try:
+            res.append(SoundfileName(name))
+        except ValueError:
+            pass
+    return res
+
+
+def test_SoundfileName(benchmark, catalog_keys):
+    benchmark(_parse_each, catalog_keys)
+
+
+def test_SoundfileNames(benchmark, catalog_keys):
+    res = benchmark(SoundfileNames.parse, catalog_keys)
+    assert len(res) + len(res.invalid) == len(catalog_keys)
+
+
+def test_SoundfileNames_by_variety(benchmark, catalog_keys):
+    benchmark(SoundfileNames.parse(catalog_keys).by_variety)
@@ -30,8 +30,9 @@ setup(
         'attrs',
         'pycldf>=1.0.6',
         'csvw',
-        'sqlalchemy',
+        'sqlalchemy>=1.4',
         'pymysql',
+        'numpy',
     ],
     extras_require={
         'test': [
@@ -40,6 +41,7 @@ setup(
             'pytest-cov',
             'coverage>=4.2',
         ],
+        'bench': ['pytest-benchmark'],
         'dev': ['flake8'],
     },
     entry_points={
@@ -1,5 +1,27 @@
+import json
+
 from clldutils.apilib import API
 
+from pysoundcomparisons.modified import iter_records, read_records, filter_records
+
 
 class SoundComparisons(API):
-    pass
+    def modified_soundfiles(self, categories=None, prefix=None):
+        """
+        Stream the records of the report written by `write_modified_soundfiles` - from
+        soundfiles/modified.jsonl if it exists and is not older than soundfiles/modified.json,
+        otherwise from soundfiles/modified.json.
+
+        :param categories: Only yield records of these categories, e.g. `['obsolete']`.
+        :param prefix: Only yield records with a path whose file name starts with `prefix`, \
+        e.g. a variety.
+        :return: Generator of `dict`s with keys category, uid and path.
+        """
+        path = self.repos / 'soundfiles' / 'modified.jsonl'
+        report = self.repos / 'soundfiles' / 'modified.json'
+        if path.exists() and not (
+                report.exists() and report.stat().st_mtime > path.stat().st_mtime):
+            return read_records(path, categories=categories, prefix=prefix)
+        with report.open(encoding='utf8') as fp:
+            data = json.load(fp)
+        return filter_records(iter_records(data), categories=categories, prefix=prefix)
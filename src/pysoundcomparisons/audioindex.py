@@ -0,0 +1,205 @@
+"""
+An index of audio features - duration, sample rate, number of channels, peak and RMS level - of
+the sound files, keyed by md5 checksum, so quality checks for silent, clipped or truncated
+recordings do not need to decode the files again.
+
+The index is stored as NumPy `.npz` file with one array per column, sorted by md5.
+
+Decoding of formats other than PCM wav requires ffmpeg (https://www.ffmpeg.org).
+"""
+import os
+import io
+import wave
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from pysoundcomparisons.audiotags import ffmpeg
+from pysoundcomparisons.profiling import timer, count
+
+__all__ = ['COLUMNS', 'decode', 'features', 'file_features', 'AudioIndex']
+
+# Columns of the index with their NumPy dtypes:
+COLUMNS = [
+    ('md5', 'S32'),
+    ('duration', 'float32'),  # in seconds
+    ('rate', 'uint32'),  # samples per second
+    ('channels', 'uint8'),
+    ('peak', 'float32'),  # maximal absolute sample value, relative to full scale
+    ('rms', 'float32'),  # root mean square of the sample values, relative to full scale
+]
+
+
+def _samples(frames, sampwidth):
+    """
+    Convert little-endian PCM frames to an array of floats in [-1, 1].
+    """
+    if sampwidth == 1:  # 8-bit wav is unsigned.
+        return (np.frombuffer(frames, dtype=np.uint8).astype(np.float64) - 128) / 128
+    if sampwidth == 3:
+        b = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        s = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        return np.where(s >= 1 << 23, s - (1 << 24), s).astype(np.float64) / (1 << 23)
+    dtype = {2: '<i2', 4: '<i4'}[sampwidth]
+    return np.frombuffer(frames, dtype=dtype).astype(np.float64) / (1 << (8 * sampwidth - 1))
+
+
+def _read_wav(fp):
+    with wave.open(fp, 'rb') as w:
+        return (
+            _samples(w.readframes(w.getnframes()), w.getsampwidth()),
+            w.getframerate(),
+            w.getnchannels())
+
+
+def decode(path):
+    """
+    Decode a sound file - PCM wav files natively, other formats via ffmpeg.
+
+    :return: triple (samples as `numpy.ndarray` of floats in [-1, 1], interleaved by channel, \
+    sample rate, number of channels).
+    """
+    if path.suffix.lower() == '.wav':
+        try:
+            with path.open('rb') as fp:
+                return _read_wav(fp)
+        except (wave.Error, EOFError, KeyError):
+            pass  # Not PCM - let ffmpeg handle it.
+    with tempfile.TemporaryDirectory() as tmp:
+        dest = os.path.join(tmp, 'decoded.wav')
+        subprocess.run(
+            [ffmpeg(), '-loglevel', 'error', '-y', '-i', str(path), '-vn',
+             '-codec:a', 'pcm_s16le', '-f', 'wav', dest],
+            check=True)
+        with open(dest, 'rb') as fp:
+            return _read_wav(io.BytesIO(fp.read()))
+
+
+def features(samples, rate, channels):
+    """
+    :return: tuple (duration, rate, channels, peak, rms) - i.e. the columns of the index \
+    after md5.
+    """
+    n = len(samples)
+    return (
+        n / channels / rate if rate else 0.0,
+        rate,
+        channels,
+        float(np.abs(samples).max()) if n else 0.0,
+        float(np.sqrt(np.mean(np.square(samples)))) if n else 0.0)
+
+
+def file_features(path):
+    return features(*decode(path))
+
+
+class AudioIndex(object):
+    """
+    Audio features of sound files, keyed by md5.
+
+    Columns are available as `numpy.ndarray`s via item access, e.g. `index['duration']`, so
+    conditions can be expressed as vectorised comparisons.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        if path and path.exists():
+            with timer('index load'), np.load(str(path)) as data:
+                self.columns = {name: data[name] for name, _ in COLUMNS}
+        else:
+            self.columns = {name: np.array([], dtype=dtype) for name, dtype in COLUMNS}
+
+    def __len__(self):
+        return len(self.columns['md5'])
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def _pos(self, checksum):
+        checksum = checksum.encode('ascii')
+        i = int(np.searchsorted(self.columns['md5'], checksum))
+        if i < len(self) and self.columns['md5'][i] == checksum:
+            return i
+
+    def __contains__(self, checksum):
+        return self._pos(checksum) is not None
+
+    def get(self, checksum):
+        """
+        :return: `dict` of the features of the sound file with md5 `checksum` or `None`.
+        """
+        i = self._pos(checksum)
+        if i is not None:
+            return {
+                name: self.columns[name][i].decode('ascii') if name == 'md5'
+                else self.columns[name][i].item()
+                for name, _ in COLUMNS}
+
+    def md5s(self, mask):
+        """
+        :param mask: Boolean array over the rows of the index, e.g. `index['duration'] < 0.2`.
+        :return: `set` of the md5 checksums of the selected rows.
+        """
+        return {c.decode('ascii') for c in self.columns['md5'][mask]}
+
+    def update(self, rows):
+        """
+        Add or replace features.
+
+        :param rows: Iterable of tuples (md5, duration, rate, channels, peak, rms).
+        :return: Number of rows added or replaced.
+        """
+        rows = {r[0]: r for r in rows}
+        if not rows:
+            return 0
+        new = {
+            name: np.array([r[i] for r in rows.values()], dtype=dtype)
+            for i, (name, dtype) in enumerate(COLUMNS)}
+        new['md5'] = np.array([c.encode('ascii') for c in rows], dtype='S32')
+        keep = ~np.isin(self.columns['md5'], new['md5'])
+        merged = {
+            name: np.concatenate([self.columns[name][keep], new[name]]) for name, _ in COLUMNS}
+        order = np.argsort(merged['md5'], kind='stable')
+        self.columns = {name: col[order] for name, col in merged.items()}
+        return len(rows)
+
+    def index(self, files, workers=4, log=None):
+        """
+        Decode sound files with md5 checksums not yet in the index, in parallel processes.
+
+        :param files: Iterable of (path, md5) pairs.
+        :return: Number of sound files added to the index.
+        """
+        todo = {}
+        for path, checksum in files:
+            if checksum not in self and checksum not in todo:
+                todo[checksum] = path
+        rows = []
+        if todo:
+            count('decoded sound files', len(todo))
+            with timer('decode'), ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    checksum: pool.submit(file_features, path) for checksum, path in todo.items()}
+                for checksum, future in futures.items():
+                    try:
+                        rows.append((checksum,) + future.result())
+                    except Exception as e:
+                        if log:
+                            log.warning('decoding {0} failed: {1}'.format(todo[checksum], e))
+        return self.update(rows)
+
+    def save(self, path=None):
+        """
+        Write the index to a temporary file, which then replaces `path`.
+        """
+        path = path or self.path
+        tmp = path.parent / '.{0}.{1}.tmp'.format(path.name, os.getpid())
+        try:
+            with timer('file write'), tmp.open('wb') as fp:
+                np.savez(fp, **self.columns)
+            os.replace(str(tmp), str(path))
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return path
@@ -0,0 +1,381 @@
+"""
+Rewriting of title/album/artist tags of sound files without re-encoding.
+
+The supported formats are those listed in `MediaCatalog.mimetypes`:
+- mp3: an ID3v2.4 tag is prepended to the MPEG frames (an ID3v1 trailer is dropped),
+- ogg: the Vorbis (or Opus) comment header is replaced and the header pages re-paginated,
+- wav: the RIFF LIST/INFO chunk is replaced.
+
+All functions operate on `bytes`, so sound files can be re-tagged in memory. `ffmpeg_retag`
+is kept as fallback for files which cannot be handled here - `retag` signals these by raising
+`ValueError`.
+"""
+import re
+import shutil
+import struct
+import platform
+import subprocess
+
+__all__ = ['TAGS', 'retag', 'read_tags', 'ffmpeg', 'ffmpeg_retag']
+
+# The tags we manage, with the corresponding ID3v2 frame ID, Vorbis comment field name and
+# RIFF INFO chunk ID:
+TAGS = [
+    ('title', b'TIT2', 'TITLE', b'INAM'),
+    ('album', b'TALB', 'ALBUM', b'IPRD'),
+    ('artist', b'TPE1', 'ARTIST', b'IART'),
+]
+
+
+def _check_tags(tags):
+    unknown = set(tags) - set(t[0] for t in TAGS)
+    if unknown:
+        raise TypeError('unknown tags: {0}'.format(', '.join(sorted(unknown))))
+    return {k: v for k, v in tags.items() if v is not None}
+
+
+def retag(data, fmt, **tags):
+    """
+    Rewrite the tags of a sound file.
+
+    :param data: The content of the sound file as `bytes`.
+    :param fmt: The file format, i.e. one of the keys of `MediaCatalog.mimetypes`.
+    :param tags: Values for any of the tags in `TAGS`; tags which are not passed are kept.
+    :return: The re-tagged content as `bytes`.
+    :raises ValueError: If the format is not supported or the data cannot be parsed.
+    """
+    fmt = fmt.lower().lstrip('.')
+    if fmt not in _FORMATS:
+        raise ValueError('unsupported format: {0}'.format(fmt))
+    return _FORMATS[fmt][0](bytes(data), _check_tags(tags))
+
+
+def read_tags(data, fmt):
+    """
+    :return: `dict` mapping the names of the tags in `TAGS` found in data to their values.
+    """
+    fmt = fmt.lower().lstrip('.')
+    if fmt not in _FORMATS:
+        raise ValueError('unsupported format: {0}'.format(fmt))
+    return _FORMATS[fmt][1](bytes(data))
+
+
+def ffmpeg():
+    """
+    :return: The name of the ffmpeg executable.
+    :raises OSError: If ffmpeg cannot be found.
+    """
+    ffmpeg_cmd = (platform.system() == 'Windows' and 'ffmpeg.exe') or 'ffmpeg'
+    if shutil.which(ffmpeg_cmd) is None:
+        raise OSError("Please make sure that '%s' (https://www.ffmpeg.org) "
+                      "is installed and can be found in a shell call." % ffmpeg_cmd)
+    return ffmpeg_cmd
+
+
+def ffmpeg_retag(src, dest, **tags):
+    """
+    Rewrite the tags of file src, writing the result to dest, using ffmpeg.
+
+    ffmpeg can be installed via https://www.ffmpeg.org and must be found in a shell call.
+    """
+    cmd = [ffmpeg(), '-loglevel', 'error', '-y', '-i', str(src)]
+    for k, v in sorted(_check_tags(tags).items()):
+        cmd.extend(['-metadata', '{0}={1}'.format(k, v)])
+    subprocess.run(cmd + ['-codec', 'copy', str(dest)], check=True)
+
+
+#
+# mp3: ID3v2
+#
+def _synchsafe(n):
+    return bytes([(n >> 21) & 0x7f, (n >> 14) & 0x7f, (n >> 7) & 0x7f, n & 0x7f])
+
+
+def _unsynchsafe(b):
+    if any(c & 0x80 for c in b):
+        raise ValueError('invalid synchsafe integer')
+    return (b[0] << 21) | (b[1] << 14) | (b[2] << 7) | b[3]
+
+
+def _id3_split(data):
+    """
+    Split mp3 data into the frames of an ID3v2 tag and the audio data.
+
+    :return: pair (list of (frame ID, frame content) pairs, audio data)
+    """
+    frames = []
+    if data[:3] == b'ID3':
+        if len(data) < 10:
+            raise ValueError('truncated ID3v2 header')
+        major, flags = data[3], data[5]
+        size = _unsynchsafe(data[6:10])
+        end = 10 + size + (10 if flags & 0x10 else 0)
+        if end > len(data):
+            raise ValueError('truncated ID3v2 tag')
+        # We only carry over frames from tags we can parse reliably, i.e. ID3v2.3 and v2.4
+        # without unsynchronisation and extended header.
+        if major in (3, 4) and not flags & 0xc0:
+            body, pos = data[10:10 + size], 0
+            while pos + 10 <= len(body) and re.match(b'[A-Z0-9]{4}$', body[pos:pos + 4]):
+                fsize = _unsynchsafe(body[pos + 4:pos + 8]) if major == 4 \
+                    else struct.unpack('>I', body[pos + 4:pos + 8])[0]
+                if not body[pos + 9]:  # Frames with format flags set cannot be carried over.
+                    frames.append((body[pos:pos + 4], body[pos + 10:pos + 10 + fsize]))
+                pos += 10 + fsize
+        data = data[end:]
+    if len(data) >= 128 and data[-128:-125] == b'TAG':
+        data = data[:-128]
+    if data and not (len(data) > 1 and data[0] == 0xff and data[1] & 0xe0 == 0xe0):
+        raise ValueError('no MPEG frame sync found')
+    return frames, data
+
+
+def _id3_text(content):
+    encoding = {0: 'latin1', 1: 'utf-16', 2: 'utf-16-be', 3: 'utf8'}.get(content[0])
+    if not encoding:
+        raise ValueError('invalid text encoding in ID3v2 frame')
+    return content[1:].decode(encoding).rstrip('\x00')
+
+
+def _retag_mp3(data, tags):
+    frames, audio = _id3_split(data)
+    ids = {fid: name for name, fid, _, _ in TAGS if name in tags}
+    frames = [(fid, content) for fid, content in frames if fid not in ids]
+    frames.extend((fid, b'\x03' + tags[name].encode('utf8')) for fid, name in ids.items())
+    body = b''.join(
+        fid + _synchsafe(len(content)) + b'\x00\x00' + content for fid, content in frames)
+    return b''.join([b'ID3\x04\x00\x00', _synchsafe(len(body)), body, audio])
+
+
+def _read_mp3(data):
+    frames = dict(_id3_split(data)[0])
+    return {name: _id3_text(frames[fid]) for name, fid, _, _ in TAGS if fid in frames}
+
+
+#
+# ogg: Vorbis comments
+#
+def _crc_table():
+    table = []
+    for i in range(256):
+        r = i << 24
+        for _ in range(8):
+            r = ((r << 1) ^ 0x04c11db7) if r & 0x80000000 else (r << 1)
+        table.append(r & 0xffffffff)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+# Codecs we know the header packets of: (number of header packets, prefix of the comment
+# header packet, whether the comment header has a framing bit)
+_OGG_CODECS = {
+    b'\x01vorbis': (3, b'\x03vorbis', True),
+    b'OpusHead': (2, b'OpusTags', False),
+}
+
+
+def _ogg_crc(page):
+    crc = 0
+    for b in page:
+        crc = ((crc << 8) & 0xffffffff) ^ _CRC_TABLE[(crc >> 24) ^ b]
+    return crc
+
+
+def _ogg_pages(data):
+    """
+    :return: list of (start, end, header type, serial number, page sequence number, lacing \
+    values, body offset) tuples.
+    """
+    pages, pos = [], 0
+    while pos < len(data):
+        if data[pos:pos + 4] != b'OggS' or len(data) < pos + 27:
+            raise ValueError('invalid Ogg page at offset {0}'.format(pos))
+        header_type, serial, seqno, nsegs = struct.unpack_from('<5xB8xII4xB', data, pos)
+        lacing = data[pos + 27:pos + 27 + nsegs]
+        end = pos + 27 + nsegs + sum(lacing)
+        if end > len(data):
+            raise ValueError('truncated Ogg page at offset {0}'.format(pos))
+        pages.append((pos, end, header_type, serial, seqno, lacing, pos + 27 + nsegs))
+        pos = end
+    return pages
+
+
+def _ogg_page(continued, serial, seqno, lacing, body):
+    # Header pages only carry granule position 0 - or -1 if no packet finishes on the page.
+    granule = 0 if any(v < 255 for v in lacing) else -1
+    page = bytearray(struct.pack(
+        '<4sBBqIIIB', b'OggS', 0, 1 if continued else 0, granule, serial, seqno, 0, len(lacing)))
+    page.extend(lacing)
+    page.extend(body)
+    struct.pack_into('<I', page, 22, _ogg_crc(page))
+    return bytes(page)
+
+
+def _paginate(packets, serial, seqno):
+    pages, lacing, chunks, continued = [], [], [], False
+    for packet in packets:
+        pos = 0
+        for v in [255] * (len(packet) // 255) + [len(packet) % 255]:
+            if len(lacing) == 255:
+                pages.append(_ogg_page(
+                    continued, serial, seqno + len(pages), lacing, b''.join(chunks)))
+                lacing, chunks, continued = [], [], pos > 0
+            lacing.append(v)
+            chunks.append(packet[pos:pos + v])
+            pos += v
+    if lacing:
+        pages.append(_ogg_page(continued, serial, seqno + len(pages), lacing, b''.join(chunks)))
+    return pages
+
+
+def _ogg_headers(data):
+    """
+    :return: pair (codec spec, header packets, pages, index of the first page after the headers)
+    """
+    pages = _ogg_pages(data)
+    if not pages:
+        raise ValueError('no Ogg pages found')
+    packets, packet, spec = [], [], None
+    for i, (start, end, _, serial, _, lacing, pos) in enumerate(pages):
+        if serial != pages[0][3]:
+            raise ValueError('multiplexed Ogg streams are not supported')
+        for v in lacing:
+            packet.append(data[pos:pos + v])
+            pos += v
+            if v < 255:
+                packets.append(b''.join(packet))
+                packet = []
+                if len(packets) == 1:
+                    spec = _OGG_CODECS.get(packets[0][:8]) or _OGG_CODECS.get(packets[0][:7])
+                    if not spec:
+                        raise ValueError('unsupported Ogg codec')
+                    if pos != end:
+                        raise ValueError('identification header does not fill first page')
+                elif len(packets) == spec[0]:
+                    if pos != end:
+                        raise ValueError('audio data on Ogg header page')
+                    return spec, packets, pages, i + 1
+    raise ValueError('incomplete Ogg headers')
+
+
+def _vorbis_comments(packet, spec):
+    prefix = spec[1]
+    if not packet.startswith(prefix):
+        raise ValueError('invalid comment header')
+    try:
+        pos = len(prefix)
+        n = struct.unpack_from('<I', packet, pos)[0]
+        vendor, pos = packet[pos + 4:pos + 4 + n], pos + 4 + n
+        comments = []
+        for _ in range(struct.unpack_from('<I', packet, pos)[0]):
+            n = struct.unpack_from('<I', packet, pos + 4)[0]
+            comments.append(packet[pos + 8:pos + 8 + n].decode('utf8'))
+            pos += 4 + n
+    except (struct.error, UnicodeDecodeError):
+        raise ValueError('invalid comment header')
+    return vendor, comments
+
+
+def _retag_ogg(data, tags):
+    spec, packets, pages, first_audio_page = _ogg_headers(data)
+    vendor, comments = _vorbis_comments(packets[1], spec)
+    fields = {field: name for name, _, field, _ in TAGS if name in tags}
+    comments = [c for c in comments if c.partition('=')[0].upper() not in fields]
+    comments.extend('{0}={1}'.format(field, tags[name]) for field, name in fields.items())
+    comment_packet = [spec[1], struct.pack('<I', len(vendor)), vendor]
+    comment_packet.append(struct.pack('<I', len(comments)))
+    for c in comments:
+        c = c.encode('utf8')
+        comment_packet.extend([struct.pack('<I', len(c)), c])
+    if spec[2]:
+        comment_packet.append(b'\x01')
+
+    serial = pages[0][3]
+    header_pages = _paginate([b''.join(comment_packet)] + packets[2:], serial, 1)
+    res = [data[:pages[0][1]]] + header_pages
+    delta = len(header_pages) + 1 - first_audio_page
+    if delta == 0:
+        # The common case: No need to touch the audio pages at all.
+        res.append(data[pages[first_audio_page][0]:] if first_audio_page < len(pages) else b'')
+    else:
+        for start, end, _, _, seqno, _, _ in pages[first_audio_page:]:
+            page = bytearray(data[start:end])
+            struct.pack_into('<II', page, 18, seqno + delta, 0)
+            struct.pack_into('<I', page, 22, _ogg_crc(page))
+            res.append(bytes(page))
+    return b''.join(res)
+
+
+def _read_ogg(data):
+    spec, packets, _, _ = _ogg_headers(data)
+    comments = {}
+    for c in _vorbis_comments(packets[1], spec)[1]:
+        k, _, v = c.partition('=')
+        comments.setdefault(k.upper(), v)
+    return {name: comments[field] for name, _, field, _ in TAGS if field in comments}
+
+
+#
+# wav: RIFF INFO
+#
+def _riff_chunks(data, pos=12, end=None):
+    if end is None:
+        if len(data) < 12 or data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+            raise ValueError('invalid RIFF WAVE header')
+        end = min(len(data), 8 + struct.unpack_from('<I', data, 4)[0])
+    chunks = []
+    while pos + 8 <= end:
+        size = struct.unpack_from('<I', data, pos + 4)[0]
+        if pos + 8 + size > end:
+            raise ValueError('truncated RIFF chunk {0}'.format(data[pos:pos + 4]))
+        chunks.append((data[pos:pos + 4], data[pos + 8:pos + 8 + size]))
+        pos += 8 + size + (size & 1)
+    return chunks
+
+
+def _riff_chunk(cid, content):
+    return b''.join([cid, struct.pack('<I', len(content)), content, b'\x00' * (len(content) & 1)])
+
+
+def _is_info(cid, content):
+    return cid == b'LIST' and content[:4] == b'INFO'
+
+
+def _retag_wav(data, tags):
+    chunks = _riff_chunks(data)
+    ids = {cid: name for name, _, _, cid in TAGS if name in tags}
+    info = b''.join(c[4:] for cid, c in chunks if _is_info(cid, c))
+    info = [(cid, content) for cid, content in _riff_chunks(info, pos=0, end=len(info))
+            if cid not in ids]
+    info.extend((cid, tags[name].encode('utf8') + b'\x00') for cid, name in ids.items())
+    info = (b'LIST', b'INFO' + b''.join(_riff_chunk(cid, content) for cid, content in info))
+
+    res, index = [], None
+    for cid, content in chunks:
+        if _is_info(cid, content):
+            if index is None:
+                index = len(res)
+            continue
+        if cid == b'data' and index is None:
+            index = len(res)
+        res.append((cid, content))
+    res.insert(len(res) if index is None else index, info)
+    body = b'WAVE' + b''.join(_riff_chunk(cid, content) for cid, content in res)
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def _read_wav(data):
+    info = {}
+    for cid, content in _riff_chunks(data):
+        if _is_info(cid, content):
+            for k, v in _riff_chunks(content, pos=4, end=len(content)):
+                info.setdefault(k, v.rstrip(b'\x00').decode('utf8', errors='replace'))
+    return {name: info[cid] for name, _, _, cid in TAGS if cid in info}
+
+
+_FORMATS = {
+    'mp3': (_retag_mp3, _read_mp3),
+    'ogg': (_retag_ogg, _read_ogg),
+    'wav': (_retag_wav, _read_wav),
+}
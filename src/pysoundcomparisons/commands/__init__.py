@@ -0,0 +1,177 @@
+"""
+The sub-commands of the soundcomparisons CLI - one module per command, providing a function
+`run(args)` - and helpers shared between them.
+
+Command modules are only imported when the command is run, and the helpers here import
+expensive dependencies only when called, to keep CLI startup fast.
+"""
+import os
+import re
+import json
+import errno
+import shutil
+from pathlib import Path
+
+from pysoundcomparisons.profiling import timer
+
+
+def _client(args=None):
+    """
+    The HTTP client shared by all network access - with --workers connections per host.
+    """
+    from pysoundcomparisons.httpclient import client
+
+    return client(per_host=getattr(args, 'workers', None) or 4)
+
+
+def _get_catalog(args, cattype):
+    from pysoundcomparisons.mediacatalog import MediaCatalog, ImageCatalog
+
+    if cattype == 'soundfiles':
+        catalog = MediaCatalog(
+            args.repos / 'soundfiles' / 'catalog.json.zip',
+            cdstar_url=os.environ.get('CDSTAR_URL', 'https://cdstar.shh.mpg.de'),
+            cdstar_user=os.environ.get('CDSTAR_USER'),
+            cdstar_pwd=os.environ.get('CDSTAR_PWD'),
+        )
+    elif cattype == 'imagefiles':
+        catalog = ImageCatalog(
+            args.repos / 'imagefiles' / 'catalog.json',
+            cdstar_url=os.environ.get('CDSTAR_URL', 'https://cdstar.shh.mpg.de'),
+            cdstar_user=os.environ.get('CDSTAR_USER'),
+            cdstar_pwd=os.environ.get('CDSTAR_PWD'),
+        )
+    else:
+        return
+    _client(args).install(catalog.api)
+    return catalog
+
+
+def _db(args):
+    from pysoundcomparisons.db import DB
+
+    return DB(host=args.db_host, db=args.db_name, user=args.db_user, password=args.db_password)
+
+
+def _api(args):
+    from pysoundcomparisons.api import SoundComparisons
+
+    return SoundComparisons(repos=args.repos)
+
+
+def _get_all_study_names(db):
+    return [s['Name'] for s in list(db("select Name from Studies"))]
+
+
+def _write_csv_to_file(data, file_name, api, header=None, dir_name='cldf'):
+    from csvw.dsv import UnicodeWriter
+
+    outdir = api.repos.joinpath(dir_name)
+    if not outdir.exists():
+        outdir.mkdir()
+    if header is None:
+        try:
+            header = data.keys()
+        except AttributeError:
+            pass
+    with timer('file write'), UnicodeWriter(outdir.joinpath(file_name)) as w:
+        if header is not None:
+            w.writerow(header)
+        for row in data:
+            w.writerow(row)
+
+
+def _copy_path(src, dest):
+    """
+    copy an entire folder or a single file from src to dest
+    """
+    try:
+        shutil.copytree(src, dest)
+    except OSError as e:
+        # If the error was caused due to the source wasn't a folder
+        # then copy a file
+        if e.errno == errno.ENOTDIR:
+            shutil.copy(src, dest)
+        else:
+            raise
+
+
+def _copy_save_url(url, query, dest, log=None):
+    """
+    download the content of the URL url + "/" + query and save that content to dest -- the URL
+    and error are logged to log if the download fails
+    """
+    from requests import RequestException
+    from pysoundcomparisons.httpclient import HTTPError, ChecksumMismatch
+
+    try:
+        _client().fetch(url + "/" + query, Path(dest))
+    except (RequestException, HTTPError, ChecksumMismatch, OSError) as e:
+        if log:
+            log.error("Error while downloading %s: %s" % (url + "/" + query, e))
+        return False
+    return True
+
+
+def _fetch_save_scdata_json(url, dest, file_path, prefix, with_online_soundpaths=False,
+                            encode=False, log=None, precompressed=None):
+    """
+    get a Sound-Comparisons data JSON object from url and save that object as valid JavaScript
+    file at dest/file_path prefixed by prefix -- in addition replace cdstar sound and image file urls by
+    local relative paths (if desired) -- study data can be dictionary encoded
+    (see _save_scdata_json)
+    """
+    data = _client().get_json(url)
+
+    re_img = re.compile(r"^https?://cdstar[^/]*?/[^/]*?/[^/]*?/(.*)$")
+
+    if file_path == 'data_global':
+        for c in data['global']['contributors']:
+            if 'Avatar' in c:
+                c['Avatar'] = re_img.sub(r"img/contributors/\g<1>", c['Avatar'])
+
+    if file_path.startswith('data_study_'):
+
+        if not with_online_soundpaths:
+            # regex for replacing all soundPaths having http://cdstar.shh.mpg.de/bitstreams/{UID}/{soundPath}
+            # by relative URL sound/{languageFilePath}/{soundPath}
+            # {languageFilePath} is parsed via the fact that each {soundPath} begins with the
+            # {languageFilePath} and can be cut at the occurrance of a _ followed by at least three digits: _\d{3,}
+            re_snd = re.compile(r"https?://cdstar[^/]*?/[^/]*?/[^/]*?/((.*?)_\d{3,}_.*?\.(ogg|mp3))", re.IGNORECASE)
+            for k, v in data['transcriptions'].items():
+                # since the structure is not a fixed one, do it via regex of str(structure) simply
+                v['soundPaths'] = eval(
+                    re_snd.sub(r"sound/\g<2>/\g<1>", json.dumps(v['soundPaths'], separators=(',', ':')))
+                )
+
+        for lg in data['languages']:
+            for ci in lg['ContributorImages']:
+                 ci= re_img.sub(r"img/contributors/\g<1>", ci)
+
+    return _save_scdata_json(
+        data, dest, file_path, prefix, encode=encode, log=log, precompressed=precompressed)
+
+
+def _save_scdata_json(data, dest, file_path, prefix, encode=False, log=None, precompressed=None):
+    """
+    save a Sound-Comparisons data JSON object as valid JavaScript file at dest/file_path
+    prefixed by prefix -- if encode is True, study data is dictionary encoded and precompressed
+    copies are written to the directory precompressed (default: next to the file) as well,
+    logging sizes and encoding time to log
+    """
+    pth = Path(os.path.join(dest, "data", file_path + ".js"))
+    if encode and file_path.startswith('data_study_'):
+        from pysoundcomparisons.offline import write_encoded_js
+
+        stats = write_encoded_js(
+            pth, prefix, data, precompressed=Path(precompressed) if precompressed else None)
+        if log:
+            log.info("    %s: %s plain, %s encoded (%.0f%%), %s gzipped%s, encoded in %.2fs" % (
+                pth.name, stats['plain'], stats['encoded'],
+                100.0 * stats['encoded'] / stats['plain'], stats['gzip'],
+                ", %s brotli" % stats['brotli'] if stats['brotli'] is not None else "",
+                stats['seconds']))
+        return data
+    with timer('file write'), pth.open(mode="w", encoding="UTF-8") as output:
+        output.write(prefix + json.dumps(data, separators=(',', ':')))
+    return data
@@ -0,0 +1,20 @@
+from pathlib import Path
+
+from pysoundcomparisons.rawdb import build_sqlite
+
+
+def run(args):
+    """
+    Builds an indexed SQLite database from the CSV exports of the database tables in raw/,
+    so that write_languages, write_valid_soundfilepaths and downloadSoundFiles with db_needed
+    can run without a MariaDB server, e.g.
+    --db-host sqlite:raw/soundcomparisons.sqlite write_languages
+    Usage:
+    build_sqlite {PATH}
+      PATH: path of the database file (default: raw/soundcomparisons.sqlite)
+    """
+    raw = args.repos / 'raw'
+    path = Path(args.args[0]) if args.args else raw / 'soundcomparisons.sqlite'
+    res = build_sqlite(raw, path, log=args.log)
+    args.log.info('{0} tables with {1} rows written to {2}'.format(
+        len(res), sum(res.values()), path))
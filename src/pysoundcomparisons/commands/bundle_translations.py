@@ -0,0 +1,23 @@
+from clldutils.misc import format_size
+
+from pysoundcomparisons.commands import _api
+from pysoundcomparisons.translations import BUNDLE, read_translations, make_bundle, write_bundle
+
+
+def run(args):
+    """
+    Combines the files 'translations/{BrowserMatch}/translations.json' into one bundle
+    'translations/translations.bundle.json' - a shared table of the translation keys plus one
+    array of values per language - written as minified JSON with precompressed .gz (and, if
+    the brotli package is installed, .br) siblings.
+    createOfflineVersion local_translations uses this bundle instead of fetching the
+    translations from --sc-host.
+    """
+    api = _api(args)
+    d = api.repos / 'translations'
+    translations = read_translations(d)
+    sizes = write_bundle(d / BUNDLE, make_bundle(translations))
+    args.log.info('{0} languages, {1} bytes in per-language files'.format(
+        len(translations), sum(p.stat().st_size for p in d.glob('*/translations.json'))))
+    for path, size in sorted(sizes.items()):
+        args.log.info('{0}: {1}'.format(path.name, format_size(size)))
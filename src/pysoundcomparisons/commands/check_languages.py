@@ -0,0 +1,41 @@
+import sys
+import time
+from pathlib import Path
+
+from pysoundcomparisons.commands import _db, _get_all_study_names
+from pysoundcomparisons.languagecheck import LanguageTable, find_conflicts
+
+
+def run(args):
+    """
+    Checks whether the data of languages which belong to several studies agree across the
+    Languages_<study> tables - as required by write_languages - and reports the conflicting
+    fields per language. By default, the data is read from raw/Languages.csv, pass db to read
+    it from the database (see --db-host). The conflict matrix - number of distinct values per
+    language and conflicting field - can be written to a CSV file.
+    Exits with status 1 if there are conflicts, so the check can gate exports.
+    Usage:
+    check_languages {db} {CSV}
+    """
+    start = time.time()
+    if 'db' in args.args:
+        db = _db(args)
+        table = LanguageTable.from_db(db, _get_all_study_names(db))
+    else:
+        table = LanguageTable.from_raw(args.repos / 'raw')
+    conflicts = find_conflicts(table)
+    args.log.info('{0} rows of {1} languages checked in {2:.2f}s'.format(
+        len(table), len(table.values['LanguageIx']), time.time() - start))
+    if len(conflicts) == 0:
+        args.log.info('no conflicts')
+        return
+    for line in conflicts.report():
+        args.log.warning(line)
+    for field, n in conflicts.by_field().items():
+        args.log.warning('{0}: {1} languages'.format(field, n))
+    for arg in args.args:
+        if arg != 'db':
+            conflicts.write_csv(Path(arg))
+            args.log.info('conflict matrix written to {0}'.format(arg))
+    args.log.error('{0} languages with conflicting data'.format(len(conflicts)))
+    sys.exit(1)
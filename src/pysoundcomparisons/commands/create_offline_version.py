@@ -0,0 +1,268 @@
+import os
+import re
+import shutil
+import zipfile
+from pathlib import Path
+from collections import OrderedDict
+
+from requests import RequestException
+
+from pysoundcomparisons.commands import (
+    _api, _client, _get_catalog, _copy_path, _copy_save_url, _fetch_save_scdata_json,
+    _save_scdata_json,
+)
+from pysoundcomparisons.store import Store
+from pysoundcomparisons.httpclient import HTTPError
+from pysoundcomparisons.translations import BUNDLE, read_bundle, i18n
+from pysoundcomparisons.commands.download_soundfiles import run as downloadSoundFiles
+
+
+def run(args):
+    """
+    Creates sndComp_offline.zip in {sc-repo}/site/offline without map tile files and (as default) without sound files.
+    Usage:
+      --sc-host --sc-repo {--image-store} createOfflineVersion
+        sc-host: URL to soundcomparisons - default http://www.soundcomaprisons.com
+        sc-repo: path to local Sound-Comparisons github repository - default './../../../Sound-Comparisons'
+           (../imagefiles/catalog.json is needed)
+        image-store: directory of a content-addressed store for contributor images - images in the
+           store are not downloaded again
+
+    Optional arguments:
+      with_online_soundpaths  - use online cdstar sound paths instead of local ones (mainly for testing)
+
+      local_translations  - use translations/translations.bundle.json - as written by
+           bundle_translations - instead of fetching the translations of all languages from sc-host
+
+      encode  - dictionary encode repeated sound path prefixes and varieties in data/data_study_*.js
+           (decoded when loaded) and write precompressed copies data/data_study_*.js.gz (and .br)
+           to {sc-repo}/site/offline/data - they are not added to the zip archive
+
+      all_sounds  - creates the sound folder and copy all mp3 and ogg sound files (../soundfiles/catalog.json is needed)
+
+      [any_study_name]  - creates the sound folder and copy all mp3 and ogg sound files of the passed study or studies
+           (../soundfiles/catalog.json is needed)
+
+    """
+
+    api = _api(args)
+
+    with_online_soundpaths = False
+    if "with_online_soundpaths" in args.args:
+        with_online_soundpaths = True
+    outPath = "/tmp/sndComp_offline"
+    # precompressed copies of the study data are only useful when served by a web server, so
+    # they are written outside of the tree which is zipped
+    precompressedPath = outPath + "_precompressed"
+    homeURL = args.sc_host
+    baseURL = homeURL + "/query"
+    sndCompRepoPath = args.sc_repo
+    if (not os.path.exists(sndCompRepoPath)):
+        # try to get path based on --repo
+        sndCompRepoPath = api.repos.resolve().parent.joinpath("Sound-Comparisons")
+        if (not os.path.exists(sndCompRepoPath)):
+            args.log.error("Please check --sc-repo argument '%s' for a valid Sound-Comparisons repository path."
+                           % (sndCompRepoPath))
+            return
+    sound_file_folders = {}
+
+    # create folder structure
+    if (os.path.exists(outPath)):
+        shutil.rmtree(outPath)
+    os.makedirs(outPath)
+    os.makedirs(os.path.join(outPath, "data"))
+    os.makedirs(os.path.join(outPath, "js"))
+    os.makedirs(os.path.join(outPath, "js", "extern"))
+    if (os.path.exists(precompressedPath)):
+        shutil.rmtree(precompressedPath)
+    if "encode" in args.args:
+        os.makedirs(os.path.join(precompressedPath, "data"))
+
+    # copy from repo all necessary static files
+    args.log.info("copying static files ...")
+    _copy_path(os.path.join(sndCompRepoPath, "site", "css"), os.path.join(outPath, "css"))
+    _copy_path(os.path.join(sndCompRepoPath, "site", "img"), os.path.join(outPath, "img"))
+    _copy_path(os.path.join(
+        sndCompRepoPath, "site", "js", "extern", "FileSaver.js"),
+        os.path.join(outPath, "js", "extern"))
+    _copy_path(os.path.join(sndCompRepoPath, "LICENSE"), outPath)
+    _copy_path(os.path.join(sndCompRepoPath, "README.md"), outPath)
+
+    # Download all contributor images hosted on CDSTAR
+    args.log.info("downloading images from CDSTAR ...")
+    catalog = _get_catalog(args, 'imagefiles')
+    store = Store(args.image_store) if getattr(args, 'image_store', None) else None
+    jobs, links = OrderedDict(), []
+    for obj in catalog:
+        md = obj.metadata
+        if md['name']:
+            target = Path(os.path.join(outPath, "img", "contributors", md['path']))
+            bitstreams = catalog.matching_bitstreams(obj, ['original'])
+            if not bitstreams:
+                shutil.rmtree(outPath)
+                args.log.error("No image file %s in catalog" % (md['path']))
+                return
+            bs = bitstreams[0]
+            if store:
+                links.append((bs.md5, target))
+                if bs.md5 not in store:
+                    store.path(bs.md5).parent.mkdir(parents=True, exist_ok=True)
+                    jobs[bs.md5] = (catalog.bitstream_url(obj, bs), store.path(bs.md5), bs.md5)
+            else:
+                jobs[target] = (catalog.bitstream_url(obj, bs), target, bs.md5)
+    # download concurrently, with --workers connections to CDSTAR
+    for job, res in zip(jobs.values(), _client(args).fetch_all(jobs.values())):
+        if isinstance(res, Exception):
+            shutil.rmtree(outPath)
+            args.log.error("Error while downloading image file %s\n%s" % (job[0], res))
+            return
+    for checksum, target in links:
+        store.link(checksum, target)
+
+    # create index.html - handle and copy the main App.js file
+    args.log.info("creating index.html ...")
+    response = None
+    minifiedKey = ""
+    try:
+        response = _client(args).get(homeURL + "/index.html")
+    except (RequestException, HTTPError) as e:
+        shutil.rmtree(outPath)
+        args.log.error("Please check --sc-host argument or connection for a valid URL (%s): %s"
+                       % (homeURL + "/index.html", e))
+        return
+    with open(os.path.join(outPath, "index.html"), "w") as output:
+        data = response.content.decode("utf-8").splitlines(True)
+        # try to find App-minified.KEY.js's key, if found delete it and store the key
+        p = re.compile("(.*?)(App\\-minified)\\.(.*?)(\\.js)(.*)")
+        for line in data:
+            if p.match(line):
+                g = p.match(line).groups()
+                if not len(g) == 5:
+                    shutil.rmtree(outPath)
+                    args.log.error("Error while parsing index.html")
+                    return
+                output.write(g[0] + g[1] + g[3] + g[4] + "\n")
+                minifiedKey = g[2]
+            else:
+                output.write(line)
+    if not len(minifiedKey):
+        shutil.rmtree(outPath)
+        args.log.error("Error while getting minified key in index.html")
+        return
+    # copy App-minified.js without key
+    if not _copy_save_url(homeURL, "js/App-minified." + minifiedKey + ".js",
+                          os.path.join(outPath, "js", "App-minified.js"), log=args.log):
+        shutil.rmtree(outPath)
+        args.log.error("Check connection %s for App-minified.js" % (homeURL))
+        return
+
+    # get data global json
+    args.log.info("getting global data from sc-host ...")
+    _fetch_save_scdata_json(baseURL + "/data", outPath, "data", "var localData=")
+    global_data = _fetch_save_scdata_json(
+        baseURL + "/data?global", outPath, "data_global", "var localDataGlobal=")
+
+    # Providing translation files:
+    tdata = _fetch_save_scdata_json(
+        baseURL + "/translations?action=summary", outPath,
+        "translations_action_summary", "var localTranslationsActionSummary=")
+    # Combined translations map for all BrowserMatch:
+    lnames = []
+    for k in tdata.keys():
+        lnames.append(tdata[k]['BrowserMatch'])
+    if "local_translations" in args.args:
+        # use the bundle written by bundle_translations instead of querying sc-host
+        try:
+            _save_scdata_json(
+                i18n(read_bundle(api.repos / 'translations' / BUNDLE), lnames), outPath,
+                "translations_i18n", "var localTranslationsI18n=")
+        except (IOError, KeyError) as e:
+            shutil.rmtree(outPath)
+            args.log.error("Please run bundle_translations first - %s" % (e))
+            return
+    else:
+        _fetch_save_scdata_json(
+            baseURL + "/translations?lng=" + "+".join(lnames) + "&ns=translation", outPath,
+            "translations_i18n", "var localTranslationsI18n=")
+
+    # get all study names out of global_data and query all relevant json files
+    # and save them as valid javascript files which can be loaded via <script>...</script>
+    args.log.info("getting study data from sc-host ...")
+    all_studies = []
+    try:
+        all_studies = global_data['studies']
+    except (KeyError, TypeError):
+        shutil.rmtree(outPath)
+        args.log.error("Error while getting all studies from global json.")
+        return
+
+    for s in all_studies:
+        if(s != '--'):  # skip delimiters
+            args.log.info("  %s ..." % (s))
+            d = _fetch_save_scdata_json(baseURL + "/data?study=" + s, outPath,
+                                        "data_study_" + s, "var localDataStudy" + s + "=",
+                                        with_online_soundpaths, encode="encode" in args.args,
+                                        log=args.log,
+                                        precompressed=os.path.join(precompressedPath, "data"))
+            # save all languages > FilePathPart for downloading sounds later on
+            sound_file_folders[s] = []
+            for lg in d['languages']:
+                sound_file_folders[s].append(lg['FilePathPart'])
+
+    # check if user passed desired study names for sounds
+    desired_sounds = []
+    if "all_sounds" in args.args:
+        desired_sounds = list(all_studies)
+        # delete all separators
+        desired_sounds = [x for x in desired_sounds if x != "--"]
+    else:
+        for arg in args.args:
+            if arg in all_studies:
+                desired_sounds.append(arg)
+            elif arg not in ["all_sounds", "local_translations", "encode"]:
+                args.log.warning(
+                    "argument '%s' is not a valid study name - will be ignored" % (arg))
+    # download all mp3 and ogg sound files for studies in desired_sounds list
+    # and store them in /sound folder
+    if len(desired_sounds) > 0:
+        if not os.path.exists(os.path.join(outPath, "sound")):
+            os.makedirs(os.path.join(outPath, "sound"))
+
+    pth = os.path.join(outPath, "sound")
+    for study in desired_sounds:
+        if study not in sound_file_folders.keys():
+            args.log.warning("Nothing found for study %s -- will be ignored" % (study))
+            continue
+        # get all cdstar sound file paths and download them
+        args.args = ['mp3', 'ogg']
+        args.args.extend(sound_file_folders[study])
+        downloadSoundFiles(args, pth, False)  # db_needed=False since we have only FilePathParts
+
+    # create the zip archive
+    args.log.info("creating ZIP archive ...")
+    try:
+        zipf = zipfile.ZipFile(outPath + ".zip", "w", zipfile.ZIP_DEFLATED)
+        fp = Path(outPath).parent
+        for root, dirs, files in os.walk(outPath):
+            for f in files:
+                if not f.startswith(".") and not f.startswith("__"):  # mainly for macOSX hidden files
+                    zipf.write(os.path.join(root, f), os.path.relpath(os.path.join(root, f), fp))
+        zipf.close()
+        shutil.rmtree(outPath)
+        args.log.info("Copying archive to '%s' ..." %
+                      os.path.join(sndCompRepoPath, "site", "offline"))
+        shutil.copy(outPath + ".zip", os.path.join(sndCompRepoPath, "site", "offline"))
+        Path(outPath + ".zip").unlink()
+        if os.path.exists(precompressedPath):
+            dest = os.path.join(sndCompRepoPath, "site", "offline", "data")
+            args.log.info("Copying precompressed study data to '%s' ..." % dest)
+            if not os.path.exists(dest):
+                os.makedirs(dest)
+            for f in sorted(os.listdir(os.path.join(precompressedPath, "data"))):
+                shutil.copy(os.path.join(precompressedPath, "data", f), dest)
+            shutil.rmtree(precompressedPath)
+        args.log.info("Done")
+    except Exception as e:
+        args.log.error("Something went wrong while creating the zip archive.")
+        args.log.error(e)
+        raise
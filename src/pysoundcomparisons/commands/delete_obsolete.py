@@ -0,0 +1,25 @@
+from pysoundcomparisons.commands import _api, _get_catalog
+from pysoundcomparisons.modified import delete_obsolete
+
+
+def run(args):
+    """
+    Deletes the objects listed as 'obsolete' in the report written by write_modified_soundfiles
+    in CDSTAR and removes them from soundfiles/catalog.json.zip.
+    Objects are deleted in batches, with --workers concurrent requests; the catalog is saved
+    after each batch.
+    Usage:
+    delete_obsolete {PREFIX} {dry_run}
+      PREFIX: only delete objects with a name starting with PREFIX, e.g. a variety
+      dry_run: only list the objects which would be deleted
+    """
+    api = _api(args)
+    prefix = ([a for a in args.args if a != 'dry_run'] or [None])[0]
+    records = api.modified_soundfiles(categories=['obsolete'], prefix=prefix)
+    if 'dry_run' in args.args:
+        for record in records:
+            print('{0}\t{1}'.format(record['uid'], record['path']))
+        return
+    with _get_catalog(args, 'soundfiles') as catalog:
+        n = delete_obsolete(catalog, records, workers=args.workers, log=args.log)
+    args.log.info('{0} obsolete objects deleted'.format(n))
@@ -0,0 +1,180 @@
+import os
+import time
+import shutil
+import tempfile
+from pathlib import Path
+from collections import OrderedDict
+
+from pysoundcomparisons.commands import _db, _client, _get_catalog
+from pysoundcomparisons.mediacatalog import md5
+from pysoundcomparisons.selection import Selection
+from pysoundcomparisons.store import Store, link
+from pysoundcomparisons.transcoding import TranscodeCache, SOURCE_PREFERENCE
+from pysoundcomparisons.scheduling import schedule, parse_size, Budget, QuotaExceeded
+
+
+def run(args, out_path=os.path.join(os.getcwd(), "sound"), db_needed=False):
+    """
+    Downloads desired sound files as {sound/}FilePathPart/FilePathPart_WordID.EXT from CDSTAR
+    to {current_folder}/sound or to out_path if passed.
+    As default it downloads all stored sound files, with the argument {EXT} you can pass desired
+    sound file extensions
+    Usage:
+    --sc-repo {--db-host --db-name --db-user --db-password} downloadSoundFiles ITEM {EXT}
+      Valid ITEMs:
+        UID(s): EAEA0-3A11-8354-556E-0 EAEA0-303B-3625-4014-0 ...
+        Study Name(s): Brazil Europe ...
+        FilePathPart(s): Clt_Bryth_Wel_Dyfed_Pem_Maenclochog_Dl ...
+        FilePathPart(s)+Word: Clt_Bryth_Wel_Dyfed_Pem_Maenclochog_Dl_909_praised_maalato ...
+        FilePathPart(s)+Word.EXT: Clt_Bryth_Wel_Dyfed_Pem_Maenclochog_Dl_909_praised_maalato.mp3 ...
+        Language_Index: 11121250509 11131000008 ...
+      Valid EXTs: mp3 ogg wav
+        (if an extension is not stored it falls back to the first ext mentioned in catalog,
+         otherwise no sound file)
+
+    db_needed = False if all items can be calculated as keys of catalog.json like FilePathPart {+ WordID}
+
+    With --sound-store, bitstreams are downloaded into a content-addressed store (once per md5)
+    and hardlinked (or symlinked) into out_path.
+    Use --download-order to download small files first or interleave small and big files,
+    --max-rate to cap the bandwidth (e.g. 2M bytes/sec) and --quota to stop after a total
+    number of bytes (e.g. 10G); progress and ETA are logged every 30 seconds.
+    With --transcode-cache, requested formats (EXT) which are not available for a sound file are
+    transcoded (requires ffmpeg) from another format of the same sound file, instead of falling
+    back to the first format in the catalog; results are cached in the passed directory.
+    """
+
+    if 'db_needed' in args.args:
+        db_needed = True
+
+    catalog = _get_catalog(args, 'soundfiles')
+    if db_needed:
+        from sqlalchemy.exc import SQLAlchemyError
+
+        try:
+            selection = Selection.from_args(args.args, catalog, db=_db(args))
+        except SQLAlchemyError as e:
+            args.log.error("Check DB settings!")
+            args.log.error(e)
+            return
+    else:
+        selection = Selection.from_args(args.args, catalog)
+    for msg in selection.warnings:
+        args.log.warning(msg)
+    args.log.info(str(selection))
+
+    out_path = Path(out_path)
+    if not out_path.exists():
+        out_path.mkdir()
+
+    store = Store(args.sound_store) if getattr(args, 'sound_store', None) else None
+
+    transcode_cache = getattr(args, 'transcode_cache', None)
+    downloads = selection.downloads(transcode=bool(transcode_cache))
+    transcodes = selection.transcodes(SOURCE_PREFERENCE) if transcode_cache else []
+    for folder in sorted(set(d.folder for d in downloads) | set(d.folder for d, _ in transcodes)):
+        if not (out_path / folder).exists():
+            try:
+                (out_path / folder).mkdir()
+            except Exception as e:
+                args.log.warning(' ... cannot make folder {0}'.format(out_path / folder))
+
+    budget = Budget(
+        sum(d.bitstream.size for d in downloads),
+        rate=parse_size(args.max_rate) if getattr(args, 'max_rate', None) else None,
+        quota=parse_size(args.quota) if getattr(args, 'quota', None) else None)
+    client = _client(args)
+    progress = {'last_report': time.monotonic()}
+
+    def done(job, res):
+        if isinstance(res, Exception):
+            args.log.warning(' ... ... {0} should be checked: {1}'.format(job[1].name, res))
+            return
+        budget.consume(res[0])
+        if time.monotonic() - progress['last_report'] > 30:
+            args.log.info(' ... {0}'.format(budget))
+            progress['last_report'] = time.monotonic()
+
+    scheduled = [
+        d for d in schedule(downloads, order=getattr(args, 'download_order', 'name'))
+        if (out_path / d.folder).exists()]
+    # Downloads run concurrently - with --workers connections to CDSTAR - in windows, so the
+    # quota is checked against the bytes already queued. To cap the rate, the start of each
+    # download is delayed - without blocking the other downloads of the window.
+    window = 8 * (getattr(args, 'workers', None) or 4)
+    exceeded = None
+    for i in range(0, len(scheduled), window):
+        jobs, sizes, links, queued = OrderedDict(), {}, [], 0
+        for obj, bs, folder in scheduled[i:i + window]:
+            target = out_path / folder / bs.id
+            if store is not None:
+                links.append((bs.md5, target))
+                if bs.md5 in store or bs.md5 in jobs:
+                    budget.skip(bs.size)
+                    continue
+                store.path(bs.md5).parent.mkdir(parents=True, exist_ok=True)
+                path = store.path(bs.md5)
+            elif target.exists() and target.stat().st_size == bs.size \
+                    and md5(target) == bs.md5:
+                budget.skip(bs.size)
+                continue
+            else:
+                path = target
+            try:
+                budget.check(queued + bs.size)
+            except QuotaExceeded as e:
+                # Stop queueing, but still fetch and link what is queued already.
+                exceeded = e
+                break
+            queued += bs.size
+            sizes[path] = bs.size
+            # Downloads are hashed while streaming and only renamed to their path if the md5
+            # matches the catalog:
+            jobs[bs.md5 if store is not None else target] = (
+                catalog.bitstream_url(obj, bs), path, bs.md5)
+        client.fetch_all(
+            jobs.values(), callback=done, delay=lambda job: budget.reserve(sizes[job[1]]))
+        for checksum, target in links:
+            if checksum in store:
+                store.link(checksum, target)
+        if exceeded:
+            args.log.warning('{0} - stopping'.format(exceeded))
+            break
+    args.log.info(' ... {0}'.format(budget))
+
+    if transcodes:
+        _transcode(args, catalog, transcodes, TranscodeCache(transcode_cache), out_path)
+
+
+def _transcode(args, catalog, transcodes, cache, out_path):
+    """
+    Create sound files in formats missing in the catalog by transcoding another bitstream of
+    the same object - unless the result is already in the cache.
+    """
+    args.log.info('transcoding {0} sound files ...'.format(len(transcodes)))
+    tmpdir = Path(tempfile.mkdtemp())
+    try:
+        jobs = []
+        for d, ext in transcodes:
+            if (d.bitstream.md5, ext) in cache:
+                jobs.append((None, d.bitstream.md5, ext))
+                continue
+            src = tmpdir / d.bitstream.id
+            if not src.exists():
+                try:
+                    _client(args).fetch(
+                        catalog.bitstream_url(d.obj, d.bitstream), src, md5=d.bitstream.md5)
+                except Exception as e:
+                    args.log.warning(' ... ... {0} should be checked'.format(d.bitstream.id))
+                    continue
+            jobs.append((src, d.bitstream.md5, ext))
+
+        results = cache.transcode_all(jobs, workers=args.workers, log=args.log)
+        for d, ext in transcodes:
+            if (d.bitstream.md5, ext) in results:
+                link(
+                    results[d.bitstream.md5, ext],
+                    out_path / d.folder / '{0}.{1}'.format(Path(d.bitstream.id).stem, ext))
+    finally:
+        shutil.rmtree(str(tmpdir))
+
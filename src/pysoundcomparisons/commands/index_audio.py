@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+
+from pysoundcomparisons.commands import _get_catalog
+from pysoundcomparisons.mirror import expected_files
+from pysoundcomparisons.audioindex import AudioIndex
+
+
+def run(args):
+    """
+    Decodes the sound files in a local mirror - as created by downloadSoundFiles - and adds
+    their duration, sample rate, number of channels, peak and RMS level to
+    soundfiles/audioindex.npz, keyed by md5. Only files with checksums not yet in the index
+    are decoded, in --workers parallel processes.
+    Usage:
+    index_audio DIR {EXT}
+      Valid EXTs: mp3 ogg wav (only index files with these extensions)
+    """
+    d = Path(args.args[0])
+    if not d.is_dir():
+        args.log.error('{0} is not a directory'.format(d))
+        sys.exit(1)
+
+    catalog = _get_catalog(args, 'soundfiles')
+    mimetypes = [catalog.mimetypes[ext] for ext in args.args[1:] if ext in catalog.mimetypes]
+    index = AudioIndex(args.repos / 'soundfiles' / 'audioindex.npz')
+    n = index.index(
+        ((d / rel, checksum) for rel, checksum in expected_files(catalog, mimetypes).items()
+         if d.joinpath(rel).exists()),
+        workers=args.workers,
+        log=args.log)
+    if n:
+        index.save()
+    args.log.info('{0} sound files added, {1} in index'.format(n, len(index)))
+    for label, mask in [
+        ('shorter than 200ms', index['duration'] < 0.2),
+        ('silent (peak below -60dBFS)', index['peak'] < 0.001),
+        ('clipped (peak at full scale)', index['peak'] >= 0.999),
+    ]:
+        args.log.info('{0} bitstreams {1}'.format(len(catalog.query_audio(index, mask)), label))
@@ -0,0 +1,73 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from pysoundcomparisons.audiotags import retag, ffmpeg_retag
+from pysoundcomparisons.commands import _client, _get_catalog
+from pysoundcomparisons.mediacatalog import SoundfileName
+
+
+def run(args):
+    """
+    usage: rename_soundfile old_soundfile_name new_soundfile_name
+    This command downloads the passed old sound files, renames the old ones by
+    simultaneously changing their meta data (title, album and artist) in memory,
+    deletes the old bitstreams and uploads the new ones with same OID.
+    Files whose tags cannot be rewritten in memory are processed in a temporary folder using:
+      ffmpeg -i old.ext -metadata key=value -codec copy new.ext
+    ffmpeg can be installed via https://www.ffmpeg.org and must be found in a shell call.
+    """
+    (old_sfname, new_sfname) = args.args
+    new_sfname = SoundfileName(new_sfname)
+    tags = dict(
+        title=new_sfname.word_id + "_" + new_sfname.word,
+        album=str(new_sfname.variety),
+        artist='Paul Heggarty: https://soundcomparisons.com')
+
+    with _get_catalog(args, 'soundfiles') as catalog:
+
+        obj = catalog.api.get_object(catalog[old_sfname].id)
+
+        tempdir = Path(tempfile.mkdtemp())
+        new_files = []
+
+        try:
+            for bs in obj.bitstreams:
+                # download sound file
+                target = tempdir / bs.id
+                data = _client(args).get(catalog.bitstream_url(obj, bs)).content
+
+                # change sound file meta data and sound file name
+                new_target = tempdir / Path(str(new_sfname) + target.suffix)
+                new_files.append(new_target)
+                try:
+                    new_target.write_bytes(retag(data, target.suffix, **tags))
+                except ValueError as e:
+                    args.log.warning('{0}: {1} - falling back to ffmpeg'.format(bs.id, e))
+                    target.write_bytes(data)
+                    ffmpeg_retag(target, new_target, **tags)
+
+            # delete old bitstreams
+            for bs in obj.bitstreams:
+                args.log.info('deleting {0}'.format(bs.id))
+                bs.delete()
+
+            # upload new sound files to obj
+            for f in new_files:
+                args.log.info('uploading {0} to {1}'.format(f.name, obj.id))
+                obj.add_bitstream(fname=str(f), name=f.name, mimetype=catalog.mimetypes[f.suffix[1:]])
+
+            # update metadata on CDSTAR
+            new_md = {'collection': 'soundcomparisons', 'name': str(new_sfname), 'type': 'soundfile'}
+            md = obj.metadata
+            md.update(metadata=new_md)
+
+            # update catalog
+            obj.read()
+            catalog.add(obj, metadata=new_md, update=True)
+
+            shutil.rmtree(str(tempdir))
+
+        except:
+            args.log.info("processed sound files are in temporary folder:\n%s" % str(tempdir))
+            raise
@@ -0,0 +1,29 @@
+from pysoundcomparisons.commands import _get_catalog
+from pysoundcomparisons.store import Store, dedup_stats
+
+
+def run(args):
+    """
+    Shows how many bitstreams in soundfiles/catalog.json.zip are byte-identical (same md5)
+    and how many bytes a content-addressed store saves for a full mirror, and - if
+    --sound-store is given - the size of the store and the bytes saved by hardlinks into
+    mirrors.
+    Usage:
+    [--sound-store STORE] store_stats {EXT}
+      Valid EXTs: mp3 ogg wav (only count bitstreams with these extensions)
+    """
+    catalog = _get_catalog(args, 'soundfiles')
+    mimetypes = [catalog.mimetypes[ext] for ext in args.args if ext in catalog.mimetypes]
+    res = dedup_stats(catalog, mimetypes=mimetypes)
+    print('catalog: {0} bitstreams, {1} unique'.format(res['bitstreams'], res['unique_bitstreams']))
+    print('catalog: {0} bytes, {1} unique, {2} saved ({3:.1%})'.format(
+        res['bytes'],
+        res['unique_bytes'],
+        res['bytes_saved'],
+        res['bytes_saved'] / res['bytes'] if res['bytes'] else 0))
+
+    if args.sound_store:
+        res = Store(args.sound_store).stats()
+        print('store: {0} objects, {1} bytes'.format(res['objects'], res['bytes']))
+        print('store: {0} additional hardlinks, {1} bytes saved'.format(
+            res['links'], res['bytes_linked']))
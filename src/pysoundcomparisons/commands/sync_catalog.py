@@ -0,0 +1,16 @@
+from pysoundcomparisons.commands import _get_catalog
+
+
+def run(args):
+    """
+    Updates soundfiles/catalog.json.zip with the sound file objects created or modified in
+    CDSTAR since the newest last-modified timestamp in the catalog.
+    Search results and objects are retrieved with --workers concurrent requests.
+    Usage:
+    sync_catalog {TIMESTAMP}
+      TIMESTAMP: sync objects modified after this timestamp (in ms since the epoch) instead
+    """
+    with _get_catalog(args, 'soundfiles') as catalog:
+        since = int(args.args[0]) if args.args else None
+        changed = catalog.sync(since=since, workers=args.workers)
+        args.log.info('{0} objects added or updated'.format(len(changed)))
@@ -0,0 +1,16 @@
+from pathlib import Path
+
+from pysoundcomparisons.commands import _get_catalog
+
+
+def run(args):
+    """
+    Uploads new or changed image files from the passed directory to the CDSTAR server,
+    if an object identified by metadata's 'name' exists it will be replaced.
+    Images whose md5 matches the original image in imagefiles/catalog.json are skipped;
+    the derivatives thumbnail.jpg and web.jpg are created locally (requires ImageMagick).
+    Use --workers to set the number of parallel conversions and uploads.
+    """
+    with _get_catalog(args, 'imagefiles') as cat:
+        n = cat.upload(Path(args.args[0]), workers=args.workers, log=args.log)
+        args.log.info('{0} images uploaded'.format(n))
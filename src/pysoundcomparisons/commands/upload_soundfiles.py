@@ -0,0 +1,27 @@
+from pathlib import Path
+
+from pysoundcomparisons.commands import _get_catalog
+from pysoundcomparisons.uploadsync import sync_upload, watch, ARCHIVE
+
+
+def run(args):
+    """
+    Uploads sound files from the passed directory to the CDSTAR server
+    Usage:
+    upload_soundfiles DIR {sync|watch} {keep}
+      sync: only upload files which are not yet recorded in the journal DIR/.journal.jsonl,
+        i.e. new or changed files, and move uploaded files to DIR/archive/
+      watch: like sync, but keep running, polling DIR for new files every 10 seconds
+      keep: do not move uploaded files to DIR/archive/
+    """
+    d = Path(args.args[0])
+    with _get_catalog(args, 'soundfiles') as cat:
+        if not ({'sync', 'watch'} & set(args.args)):
+            cat.upload(d)
+            return
+        archive = None if 'keep' in args.args else d / ARCHIVE
+        if 'watch' in args.args:
+            n = watch(cat, d, archive=archive, log=args.log)
+        else:
+            n = sync_upload(cat, d, archive=archive, log=args.log)
+        args.log.info('{0} sound files uploaded'.format(n))
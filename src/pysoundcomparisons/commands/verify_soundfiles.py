@@ -0,0 +1,42 @@
+import sys
+from pathlib import Path
+
+from pysoundcomparisons.commands import _get_catalog
+from pysoundcomparisons.mirror import verify
+
+
+def run(args):
+    """
+    Verifies a local mirror of sound files - as created by downloadSoundFiles - against
+    soundfiles/catalog.json.zip, reporting missing, corrupt (md5 mismatch) and orphan files.
+    Files are hashed in --workers parallel processes; checksums are cached in
+    DIR/.md5cache.json and only recomputed for files whose size or mtime changed.
+    Exits with status 1 if files are missing or corrupt.
+    Usage:
+    verify_soundfiles DIR {EXT} {partial} {nocache}
+      Valid EXTs: mp3 ogg wav (only files with these extensions are expected)
+      partial: only check varieties which have a folder in DIR
+      nocache: hash all files, ignoring and not writing the cache
+    """
+    d = Path(args.args[0])
+    if not d.is_dir():
+        args.log.error('{0} is not a directory'.format(d))
+        sys.exit(1)
+
+    catalog = _get_catalog(args, 'soundfiles')
+    mimetypes = [catalog.mimetypes[ext] for ext in args.args[1:] if ext in catalog.mimetypes]
+    res = verify(
+        catalog,
+        d,
+        mimetypes=mimetypes,
+        workers=args.workers,
+        use_cache='nocache' not in args.args,
+        partial='partial' in args.args)
+
+    for key in ['missing', 'corrupt', 'orphan']:
+        for path in res[key]:
+            args.log.warning('{0}: {1}'.format(key, path))
+    args.log.info('{0} files ok, {1} hashed, {2} missing, {3} corrupt, {4} orphan'.format(
+        res['ok'], res['hashed'], len(res['missing']), len(res['corrupt']), len(res['orphan'])))
+    if res['missing'] or res['corrupt']:
+        sys.exit(1)
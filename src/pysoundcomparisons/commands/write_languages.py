@@ -0,0 +1,50 @@
+from pysoundcomparisons.commands import _api, _db, _get_all_study_names, _write_csv_to_file
+from pysoundcomparisons.languagecheck import LanguageTable, find_conflicts
+
+
+def run(args):
+    """
+    Get all unique language data from all studies (Languages_*) and
+    write them into file 'languages.csv' and the mapping between
+    language and study into x_study_languages.csv'. Before writing files
+    it will be checked if any language data differ across studies (see
+    check_languages).
+    """
+    db = _db(args)
+    api = _api(args)
+
+    all_studies = _get_all_study_names(db)
+    union_query_withstudy_array = []
+    for study in all_studies:
+        union_query_withstudy_array.append(
+            "SELECT *, '%s' AS Study FROM Languages_%s" % (study, study))
+
+    # first check for language uniqueness across studies
+    conflicts = find_conflicts(LanguageTable.from_db(db, all_studies))
+    if len(conflicts) > 0:
+        args.log.warning(
+            "\nData of these languages differ across studies - please clean up data first:")
+        for line in conflicts.report():
+            args.log.warning(line)
+        return
+
+    # make sure all studies will be concatenated
+    db("SET @@group_concat_max_len = 4096")
+    query = """SELECT DISTINCT *, GROUP_CONCAT(Study) AS Studies FROM (%s) AS t
+        GROUP BY LanguageIx""" % (" UNION ".join(union_query_withstudy_array))
+    data = db(query)
+    # header minus last two columns Study and Studies
+    header = data.keys()[:-2]
+
+    # go through each row, get mapping LanguageIx and Study and
+    # delete the last two columns
+    data_db = list()
+    study_lg_map_data = list()
+    for row in data:
+        data_db.append(row[:-2])
+        for s in row['Studies'].split(","):
+            study_lg_map_data.append([row['LanguageIx'], s])
+
+    _write_csv_to_file(data_db, 'languages.csv', api, header)
+    _write_csv_to_file(study_lg_map_data, 'x_study_languages.csv', api, [
+        'LanguageIx', 'StudyName'])
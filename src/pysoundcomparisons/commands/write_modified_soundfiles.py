@@ -0,0 +1,181 @@
+import os
+import re
+import json
+
+from pysoundcomparisons.commands import _api
+from pysoundcomparisons.mediacatalog import MediaCatalog
+from pysoundcomparisons.modified import iter_records, write_records
+from pysoundcomparisons.profiling import timer
+from pysoundcomparisons.soundpaths import SoundPathIndex
+
+
+def run(args):
+    """
+    Creates the file 'modified.json' in folder 'soundfiles' which contains the following keys:
+    • 'new': paths on soundcomparisons.com which are not on cdstar
+    • 'modified': paths on cdstar whose source on soundcomparisons.com had changed
+    • 'obsolete': paths on cdstar which are not on soundcomparisons.com and not valid paths
+    • 'check': paths on cdstar which are not on soundcomparisons.com BUT VALID paths
+        [paths which are probably deleted by mistake on soundcomparisons.com ]
+    - files needed before execution:
+    • 'ServerSndFilesChecksums.txt' in 'soundfiles' - generate via:
+        find /srv/soundcomparisons/site/sound/ -iname "*[.wav\\|.mp3\\|.ogg]" -type f -exec md5sum {} \\; > ServerSndFilesChecksums.txt
+      at soundcomparisons.com server
+    • 'valid_soundfilepaths.txt' in 'soundfiles' - generate via 'write_valid_soundfilepaths'
+      (if 'valid_soundfilepaths.idx' - generated via 'write_valid_soundfilepaths index' - exists,
+      it is memory-mapped instead of reading the text file)
+    Usage:
+    write_modified_soundfiles {jsonl}
+      jsonl: also write 'modified.jsonl' with one JSON record per category, uid and path,
+        which can be streamed via SoundComparisons.modified_soundfiles (without jsonl, an
+        existing 'modified.jsonl' is deleted)
+    """
+
+    api = _api(args)
+
+    return_data = {}
+    valid_soundfilepaths = set()
+
+    valid_soundfilepaths_filepath = api.repos.joinpath('soundfiles',
+                                                       'valid_soundfilepaths.txt')
+    valid_soundfilepaths_index = api.repos.joinpath('soundfiles', 'valid_soundfilepaths.idx')
+    if valid_soundfilepaths_index.exists() and not _is_newer(
+            valid_soundfilepaths_filepath, valid_soundfilepaths_index):
+        valid_soundfilepaths = SoundPathIndex(valid_soundfilepaths_index)
+    elif valid_soundfilepaths_filepath.exists():
+        with open(valid_soundfilepaths_filepath) as fp:
+            line = fp.readline().strip()
+            while line:
+                lineArray = line.split("/")
+                if len(lineArray) > 0:
+                    valid_soundfilepaths.add(lineArray[-1])
+                line = fp.readline().strip()
+    else:
+        args.log.error("'valid_soundfilepaths.txt' cannot be found at %s" % (
+            valid_soundfilepaths_filepath))
+        return
+
+    catalog = MediaCatalog(api.repos.joinpath('soundfiles', 'catalog.json'))
+
+    server_md5_filepath = api.repos.joinpath('soundfiles', 'ServerSndFilesChecksums.txt')
+    if not os.path.isfile(server_md5_filepath):
+        args.log.error("File path {} does not exist. Please generate it first.".format(
+            server_md5_filepath))
+        return return_data
+
+    with open(server_md5_filepath) as fp:
+        return_data = modified_soundfiles(catalog, fp, valid_soundfilepaths)
+
+    write_report(api.repos / 'soundfiles', return_data, jsonl='jsonl' in args.args)
+
+
+def _is_newer(path, other):
+    return path.exists() and path.stat().st_mtime > other.stat().st_mtime
+
+
+def write_report(d, data, jsonl=False):
+    """
+    Write 'modified.json' - and 'modified.jsonl' if `jsonl` is `True` - to directory `d`.
+
+    Without `jsonl`, an existing 'modified.jsonl' is deleted, since it would describe an older
+    report - and take precedence when read via `SoundComparisons.modified_soundfiles`.
+    """
+    with timer('file write'), open(d.joinpath('modified.json'), 'w') as f:
+        json.dump(data, f, indent=4)
+    if jsonl:
+        write_records(d / 'modified.jsonl', iter_records(data))
+    elif d.joinpath('modified.jsonl').exists():
+        d.joinpath('modified.jsonl').unlink()
+
+
+def modified_soundfiles(catalog, server_checksums, valid_soundfilepaths):
+    """
+    Compare the catalog with the sound files on the soundcomparisons.com server.
+
+    :param catalog: `MediaCatalog` instance.
+    :param server_checksums: Iterable of lines in the format of 'ServerSndFilesChecksums.txt'.
+    :param valid_soundfilepaths: Set (or `SoundPathIndex`) of valid sound file paths (without \
+    folder).
+    :return: `dict` with the content of 'modified.json'.
+    """
+    return_new = set()
+    return_modified = {}
+    return_obsolete = {}
+    return_check = {}
+    server_md5_items = set()
+
+    # for speed map sound paths and uids
+    sfpath_uid_map = {obj.metadata['name']: obj.id for obj in catalog}
+    for line in server_checksums:
+        line = line.strip()
+        if not line:
+            break
+        (md5, sffolder, sfpath, ext) = re.match(
+            r"^(.*?)  .*/([^/]+?)/([^/]+?)\.(.*)", line).groups()
+        server_md5_items.add(sfpath)
+
+        try:
+            obj = catalog.objects.get(sfpath_uid_map[sfpath])
+            check_sf = "%s.%s" % (sfpath, ext)
+            for bs in obj.bitstreams:
+                if bs.id == check_sf:
+                    uid = obj.id
+                    if bs.md5 != md5:
+                        if uid not in return_modified:
+                            return_modified[uid] = []
+                        return_modified[uid].append(
+                            "%s/%s" % (sffolder, check_sf)
+                        )
+                    break
+        except KeyError:
+            if sfpath in valid_soundfilepaths:
+                return_new.add("%s/%s" % (sffolder, sfpath))
+
+    # Check if there are items in catalog.json
+    # which are not listed in ServerSndFilesChecksums.txt
+    # and distinguish between valid paths and not valid ones.
+    # 'obsolete' objects could be deleted, 'check' data are valid on cdstar
+    #   but not on soundcomparisons.com !
+    sfpath_duplicates = {}
+    md5_duplicates = {}
+    for obj in catalog:
+        uid = obj.id
+        sfpath = obj.metadata['name']
+        if sfpath in sfpath_duplicates:
+            sfpath_duplicates[sfpath].append(uid)
+        else:
+            sfpath_duplicates[sfpath] = [uid]
+        for bs in obj.bitstreams:
+            if bs.md5 in md5_duplicates:
+                md5_duplicates[bs.md5].append(uid)
+            else:
+                md5_duplicates[bs.md5] = [uid]
+        if sfpath not in server_md5_items:
+            if sfpath in valid_soundfilepaths:
+                if uid not in return_check:
+                    return_check[uid] = []
+                return_check[uid].append(sfpath)
+            else:
+                if uid not in return_obsolete:
+                    return_obsolete[uid] = []
+                return_obsolete[uid].append(sfpath)
+
+    dup_paths = {}
+    for (k,v) in sfpath_duplicates.items():
+        if len(v) > 1:
+            dup_paths[k]=v
+
+    dup_md5 = {}
+    for (k,v) in md5_duplicates.items():
+        if len(v) > 1:
+            dup_md5[k]=v
+
+    return_data = {
+        'new': sorted(return_new),
+        'modified': {k: return_modified[k] for k in sorted(return_modified)},
+        'obsolete': {k: return_obsolete[k] for k in sorted(return_obsolete)},
+        'check': {k: return_check[k] for k in sorted(return_check)},
+        'dup_paths': {k: dup_paths[k] for k in sorted(dup_paths)},
+        'dup_md5': {k: dup_md5[k] for k in sorted(dup_md5)}
+    }
+    return return_data
@@ -0,0 +1,36 @@
+import json
+from collections import OrderedDict
+
+from pysoundcomparisons.commands import _api, _db
+from pysoundcomparisons.profiling import timer
+
+
+def run(args):
+    """
+    Get the static and dynamic translations of all languages of the site and write them
+    into the files 'translations/{BrowserMatch}/translations.json'.
+    """
+    db = _db(args)
+    api = _api(args)
+    for row in list(db("select * from Page_Translations")):
+        data = OrderedDict()
+        # if row['Active']:
+        print(row['TranslationName'], row['Active'])
+        for tr in db(
+            "select Req, Trans, IsHtml from Page_StaticTranslation where TranslationId = %s order by Req",
+            (row['TranslationId'],)
+        ):
+            data[tr['Req']] = tr['Trans']
+        print(len(data))
+        for tr in db(
+                "select Category, Field, Trans from Page_DynamicTranslation where TranslationId = %s order by Category, Field",
+                (row['TranslationId'],)
+        ):
+            data[tr['Category'] + tr['Field']] = tr['Trans']
+        print(len(data))
+
+        outdir = api.repos.joinpath('translations', row['BrowserMatch'])
+        if not outdir.exists():
+            outdir.mkdir()
+        with timer('file write'), outdir.joinpath('translations.json').open('w') as fp:
+            json.dump(data, fp, indent=4)
@@ -0,0 +1,35 @@
+from pysoundcomparisons.commands import _api, _db, _get_all_study_names
+from pysoundcomparisons.soundpaths import (
+    iter_paths_db, iter_paths_raw, external_sort, write_paths, SoundPathIndex,
+)
+
+
+def run(args):
+    """
+    Creates the file 'valid_soundfilepaths.txt' containig all valid
+    sound file paths based on database data.
+    Paths are computed with streamed per-study queries and sorted with an external merge sort,
+    so memory use stays bounded.
+    Usage:
+    write_valid_soundfilepaths {raw} {index}
+      raw: compute the paths from the CSV files in raw/ instead of querying the database
+      index: also write 'valid_soundfilepaths.idx', a sorted binary index of the file names,
+        which write_modified_soundfiles memory-maps
+    """
+    api = _api(args)
+    if 'raw' in args.args:
+        paths = iter_paths_raw(api.repos / 'raw')
+    else:
+        db = _db(args)
+        paths = iter_paths_db(db, _get_all_study_names(db))
+
+    n = write_paths(
+        api.repos / 'soundfiles' / 'valid_soundfilepaths.txt',
+        external_sort(paths))
+    args.log.info('{0} valid sound file paths'.format(n))
+
+    if 'index' in args.args:
+        with (api.repos / 'soundfiles' / 'valid_soundfilepaths.txt').open(encoding='utf8') as fp:
+            SoundPathIndex.write(
+                api.repos / 'soundfiles' / 'valid_soundfilepaths.idx',
+                (line.rstrip('\n').split('/')[-1] for line in fp))
@@ -1,9 +1,121 @@
+import re
+
 from sqlalchemy import create_engine
 
+from pysoundcomparisons.profiling import timer, count
+
+SQLITE = 'sqlite:'
+# MariaDB session variables - e.g. group_concat_max_len - have no counterpart in SQLite:
+SET_SESSION_VARIABLE = re.compile(r'\s*SET\s+@@', flags=re.IGNORECASE)
+# String literals are matched - and kept as is - so that only real placeholders are replaced:
+PLACEHOLDER = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")|%(%|s)""")
+
+
+def _placeholder(m):
+    if m.group(1):
+        return m.group(1)
+    return '%' if m.group(2) == '%' else '?'
+
 
 class DB(object):
-    def __init__(self, host='localhost', db='soundcomparisons', user='soundcomparisons', password='pwd'):
-        self.engine = create_engine('mysql+pymysql://%s:%s@%s/%s?charset=utf8mb4' % (user, password, host, db))
+    def __init__(
+            self, host='localhost', db='soundcomparisons', user='soundcomparisons', password='pwd'):
+        """
+        :param host: Host of the MariaDB server, or `sqlite:PATH` to query an SQLite database \
+        built with the `build_sqlite` command instead.
+        """
+        if host.startswith(SQLITE):
+            self.engine = create_engine('sqlite:///' + host[len(SQLITE):])
+        else:
+            self.engine = create_engine(
+                'mysql+pymysql://%s:%s@%s/%s?charset=utf8mb4' % (user, password, host, db))
+
+    @property
+    def is_sqlite(self):
+        return self.engine.dialect.name == 'sqlite'
+
+    def _sql(self, sql):
+        """
+        Adapt queries written for MariaDB - with `%s` placeholders and `%%` for a literal `%` -
+        to SQLite. `%s` within string literals is left alone.
+        """
+        if self.is_sqlite:
+            return PLACEHOLDER.sub(_placeholder, sql)
+        return sql
+
+    def _execute(self, con, sql, params):
+        count('db queries')
+        with timer('db'):
+            if params is None:
+                res = con.exec_driver_sql(self._sql(sql))
+            else:
+                res = con.exec_driver_sql(self._sql(sql), params)
+        return res, Row.for_keys(res.keys()) if res.returns_rows else None
+
+    def __call__(self, sql, params=None):
+        """
+        Execute a query - with `%s` placeholders for the `params` - in a transaction.
+
+        :return: `Result`, i.e. the `list` of rows, or `None` for MariaDB session variables \
+        when querying SQLite.
+        """
+        if self.is_sqlite and SET_SESSION_VARIABLE.match(sql):
+            return None
+        with self.engine.begin() as con:
+            res, row = self._execute(con, sql, params)
+            if row is None:
+                return Result([], [])
+            return Result(row.columns, map(row, res))
+
+    def stream(self, sql, params=None):
+        """
+        Execute a query, fetching result rows from the server in batches rather than all at once.
+
+        :return: Generator of result rows.
+        """
+        with self.engine.connect() as con:
+            res, row = self._execute(con.execution_options(stream_results=True), sql, params)
+            try:
+                for r in res:
+                    yield row(r)
+            finally:
+                res.close()
+
+
+class Row(tuple):
+    """
+    A result row - a `tuple` which can also be indexed by column name.
+    """
+    __slots__ = ()
+    columns = {}
+
+    @classmethod
+    def for_keys(cls, keys):
+        """
+        :return: A subclass of `Row` for results with columns `keys`.
+        """
+        return type(cls.__name__, (cls,), dict(
+            __slots__=(), columns={k: i for i, k in enumerate(keys)}))
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = self.columns[key]
+        return tuple.__getitem__(self, key)
+
+    def keys(self):
+        return list(self.columns)
+
+    def items(self):
+        return list(zip(self.columns, self))
+
+
+class Result(list):
+    """
+    The rows of a query result, with the column names available via `keys()`.
+    """
+    def __init__(self, keys, rows):
+        list.__init__(self, rows)
+        self._keys = list(keys)
 
-    def __call__(self, *args, **kw):
-        return self.engine.execute(*args, **kw)
+    def keys(self):
+        return list(self._keys)
@@ -0,0 +1,277 @@
+"""
+The HTTP client shared by all network access to CDSTAR and sc-host.
+
+Requests are made with one `requests.Session`, whose connection pools are limited to
+`per_host` connections per host - pycdstar's sessions are routed through the same pools (see
+`Client.install`). Coroutines run the blocking requests in threads, so many transfers can be
+awaited concurrently, with
+
+- timeouts for connecting and reading,
+- retries with exponential backoff for connection errors, timeouts, HTTP status codes which
+  signal temporary failures and corrupt downloads,
+- downloads streamed to a temporary file, computing the md5 checksum on the fly, and
+- per-host metrics, which are also reported to `pysoundcomparisons.profiling`.
+
+Synchronous wrappers - `get`, `get_json`, `fetch` and `fetch_all` - run the coroutines in an
+event loop of their own.
+"""
+import asyncio
+import functools
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pysoundcomparisons.profiling import timer, count
+from pysoundcomparisons.streaming import ChecksumMismatch, write_hashed
+
+__all__ = [
+    'HTTPError', 'ChecksumMismatch', 'RetryPolicy', 'Metrics', 'Client', 'client',
+    'CHUNK_SIZE']
+
+CHUNK_SIZE = 256 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, url, status):
+        Exception.__init__(self, 'HTTP {0} for {1}'.format(status, url))
+        self.url = url
+        self.status = status
+
+
+class RetryPolicy(object):
+    """
+    Which failures are retried, how often, and how long to wait before the next attempt.
+    """
+    def __init__(self, attempts=3, backoff=0.5, factor=2.0, max_backoff=30.0,
+                 statuses=(408, 429, 500, 502, 503, 504)):
+        """
+        :param attempts: Maximal number of attempts per request.
+        :param backoff: Seconds to wait before the first retry.
+        :param factor: Multiplier for the wait time of each further retry.
+        """
+        self.attempts = attempts
+        self.backoff = backoff
+        self.factor = factor
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+
+    def delay(self, attempt):
+        """
+        :param attempt: Number of failed attempts so far, starting with 1.
+        """
+        return min(self.backoff * self.factor ** (attempt - 1), self.max_backoff)
+
+    def retryable(self, error):
+        if isinstance(error, HTTPError):
+            return error.status in self.statuses
+        return isinstance(error, (requests.ConnectionError, requests.Timeout, ChecksumMismatch))
+
+
+class Metrics(object):
+    """
+    Thread-safe counters of requests, errors, retries, transferred bytes and time spent per
+    host.
+    """
+    fields = ['requests', 'errors', 'retries', 'bytes', 'seconds']
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hosts = OrderedDict()
+
+    def record(self, url, **kw):
+        host = urlsplit(url).netloc
+        with self._lock:
+            counters = self.hosts.setdefault(host, OrderedDict((f, 0) for f in self.fields))
+            for k, v in kw.items():
+                counters[k] += v
+        for k, v in kw.items():
+            if k != 'seconds':
+                count('http {0}'.format(k), v)
+
+    def asdict(self):
+        with self._lock:
+            return OrderedDict((h, OrderedDict(c)) for h, c in sorted(self.hosts.items()))
+
+    def __str__(self):
+        return '\n'.join(
+            '{0}: {1[requests]} requests, {1[errors]} errors, {1[retries]} retries, '
+            '{1[bytes]} bytes in {1[seconds]:.1f}s'.format(h, c)
+            for h, c in self.asdict().items())
+
+
+class Client(object):
+    def __init__(self, per_host=4, timeout=(10, 120), retry=None, auth=None,
+                 chunk_size=CHUNK_SIZE):
+        """
+        :param per_host: Maximal number of concurrent connections - and requests - per host.
+        :param timeout: Seconds to wait for a connection and for data, see `requests`.
+        :param retry: `RetryPolicy` instance.
+        :param auth: Credentials for HTTP basic auth.
+        """
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy()
+        self.chunk_size = chunk_size
+        self.metrics = Metrics()
+        # pool_block makes threads wait for a free connection, instead of opening more than
+        # `per_host` connections:
+        self.adapter = HTTPAdapter(pool_connections=16, pool_maxsize=per_host, pool_block=True)
+        self.session = requests.Session()
+        self.session.auth = auth
+        self.install(self.session)
+        self._executor = ThreadPoolExecutor(max_workers=4 * per_host)
+        self._semaphores = {}
+
+    def install(self, target):
+        """
+        Route the requests of a `requests.Session` - or a pycdstar `Cdstar` API - through the
+        connection pools of the client, and record them in its metrics.
+        """
+        session = getattr(target, 'session', target)
+        session.mount('http://', self.adapter)
+        session.mount('https://', self.adapter)
+        if self._on_response not in session.hooks['response']:
+            session.hooks['response'].append(self._on_response)
+        return target
+
+    def _on_response(self, res, *args, **kw):
+        self.metrics.record(
+            res.url,
+            requests=1,
+            bytes=int(res.headers.get('Content-Length') or 0),
+            seconds=res.elapsed.total_seconds())
+
+    def _semaphore(self, url):
+        host = urlsplit(url).netloc
+        loop = asyncio.get_event_loop()
+        if (id(loop), host) not in self._semaphores:
+            self._semaphores[id(loop), host] = asyncio.Semaphore(self.per_host)
+        return self._semaphores[id(loop), host]
+
+    async def _retrying(self, url, func, *args):
+        """
+        Run blocking `func` in a thread - limited to `per_host` concurrent calls per host -
+        retrying failures according to the retry policy.
+        """
+        loop = asyncio.get_event_loop()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with self._semaphore(url):
+                    return await loop.run_in_executor(
+                        self._executor, functools.partial(func, url, *args))
+            except Exception as e:
+                self.metrics.record(url, errors=1)
+                if attempt >= self.retry.attempts or not self.retry.retryable(e):
+                    raise
+                self.metrics.record(url, retries=1)
+                await asyncio.sleep(self.retry.delay(attempt))
+
+    def _request(self, url, method, kw):
+        with timer('http'):
+            res = self.session.request(method, url, timeout=self.timeout, **kw)
+        if res.status_code >= 400:
+            raise HTTPError(url, res.status_code)
+        return res
+
+    async def request(self, method, url, **kw):
+        """
+        :return: `requests.Response` with the content read.
+        :raises HTTPError: for responses with status code >= 400.
+        """
+        return await self._retrying(url, self._request, method, kw)
+
+    def _download(self, url, path, md5):
+        with timer('http'), self.session.get(url, timeout=self.timeout, stream=True) as res:
+            if res.status_code >= 400:
+                raise HTTPError(url, res.status_code)
+            return write_hashed(res.iter_content(chunk_size=self.chunk_size), Path(path), md5)
+
+    async def download(self, url, path, md5=None):
+        """
+        Stream the content of `url` to a temporary file next to `path`, computing its md5
+        checksum on the fly; the file is renamed to `path` when complete - and, if `md5` is
+        given, only if the checksum matches.
+
+        :return: pair (number of bytes, md5 checksum).
+        :raises ChecksumMismatch: if the md5 checksum does not match - after retries.
+        """
+        return await self._retrying(url, self._download, path, md5)
+
+    def run(self, coro):
+        """
+        Run a coroutine in a new event loop.
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            for key in [k for k in self._semaphores if k[0] == id(loop)]:
+                del self._semaphores[key]
+            loop.close()
+
+    def get(self, url, **kw):
+        return self.run(self.request('GET', url, **kw))
+
+    def get_json(self, url, **kw):
+        return self.get(url, **kw).json()
+
+    def fetch(self, url, path, md5=None):
+        """
+        Download `url` to `path`, see `Client.download`.
+
+        Since the (size, md5) pair is returned, `functools.partial(client.fetch, url)` can be
+        passed as `download` to `Store.fetch`.
+        """
+        return self.run(self.download(url, path, md5=md5))
+
+    def fetch_all(self, jobs, callback=None, delay=None):
+        """
+        Download many files concurrently.
+
+        :param jobs: Iterable of triples (url, path, md5 or `None`).
+        :param callback: callable, called with the job and the result - (size, md5) pair or \
+        exception - when a download is done. It runs in the event loop, so it must not block.
+        :param delay: callable, called with a job before it is started, returning the number \
+        of seconds to wait before the download starts - e.g. `Budget.reserve` to cap the rate.
+        :return: `list` of results, in the order of the jobs.
+        """
+        async def one(job):
+            if delay:
+                await asyncio.sleep(delay(job))
+            try:
+                res = await self.download(*job)
+            except Exception as e:
+                res = e
+            if callback:
+                callback(job, res)
+            return res
+
+        async def gather(jobs):
+            return await asyncio.gather(*[one(job) for job in jobs])
+
+        return self.run(gather(list(jobs)))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+
+_CLIENT = None
+
+
+def client(**kw):
+    """
+    :return: The shared `Client` instance - created with the keyword arguments of the first \
+    call.
+    """
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = Client(**kw)
+    return _CLIENT
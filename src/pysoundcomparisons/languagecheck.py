@@ -0,0 +1,172 @@
+"""
+A check of the language data for consistency across studies.
+
+A language - identified by its LanguageIx - may belong to several studies, but since
+`write_languages` merges the rows of all Languages_<study> tables into one row per language,
+its data must be the same in all of them.
+
+The rows are loaded column-wise - from the database or from raw/Languages.csv - with each
+column dictionary encoded as integer codes of its distinct values. The number of distinct
+values per language is then computed for all languages of a field at once, by sorting the codes
+grouped by LanguageIx, resulting in a matrix of languages and fields with conflicting values.
+"""
+import csv
+from collections import OrderedDict
+
+import numpy as np
+
+from pysoundcomparisons.profiling import timer
+
+__all__ = ['KEY', 'LanguageTable', 'Conflicts', 'find_conflicts']
+
+KEY = 'LanguageIx'
+STUDY = 'study'
+
+
+class LanguageTable(object):
+    """
+    The rows of the Languages_<study> tables of all studies, stored column-wise: `codes` maps
+    column names to `numpy.ndarray`s of integer codes, `values` to the `list`s of distinct
+    values the codes refer to.
+    """
+    def __init__(self, header, rows):
+        """
+        :param header: Column names, including `study` and `LanguageIx`.
+        :param rows: Iterable of rows, i.e. sequences of string values in the order of `header`.
+        """
+        self.header = list(header)
+        self.codes, self.values = OrderedDict(), OrderedDict()
+        columns = list(zip(*rows)) or [()] * len(self.header)
+        for name, column in zip(self.header, columns):
+            values = list(OrderedDict.fromkeys(column))
+            codes = {value: i for i, value in enumerate(values)}
+            self.codes[name] = np.fromiter(
+                map(codes.__getitem__, column), dtype=np.int32, count=len(column))
+            self.values[name] = values
+
+    def __len__(self):
+        return len(self.codes[KEY])
+
+    def column(self, name):
+        """
+        :return: `numpy.ndarray` of the (string) values of a column.
+        """
+        return np.array(self.values[name], dtype=object)[self.codes[name]]
+
+    @classmethod
+    def from_raw(cls, raw):
+        """
+        :param raw: Directory with the CSV exports of the database tables.
+        """
+        with timer('csv read'), raw.joinpath('Languages.csv').open(
+                encoding='utf8', newline='') as fp:
+            reader = csv.reader(fp)
+            return cls(next(reader), reader)
+
+    @classmethod
+    def from_db(cls, db, studies):
+        """
+        :param db: `pysoundcomparisons.db.DB` instance.
+        :param studies: Names of the studies.
+        """
+        # Values are converted to strings - with NULL as empty string - as in the CSV exports.
+        header, rows = [STUDY], []
+        for study in studies:
+            for row in db.stream('SELECT * FROM Languages_{0}'.format(study)):
+                row = dict(row.items())
+                if len(header) == 1:
+                    header.extend(row)
+                rows.append([study] + [
+                    '' if row.get(name) is None else str(row[name]) for name in header[1:]])
+        return cls(header, rows)
+
+
+class Conflicts(object):
+    """
+    The conflict matrix: for the languages and fields with conflicting values across studies,
+    the number of distinct values of a field among the studies of a language - 1 meaning no
+    conflict.
+    """
+    def __init__(self, table, languages, fields, matrix):
+        self.table = table
+        self.languages = languages
+        self.fields = fields
+        self.matrix = matrix
+
+    def __len__(self):
+        return len(self.languages)
+
+    def by_field(self):
+        """
+        :return: `OrderedDict` mapping fields to the number of languages with conflicts.
+        """
+        return OrderedDict(zip(self.fields, (self.matrix > 1).sum(axis=0).tolist()))
+
+    def values(self, language, field):
+        """
+        :return: `OrderedDict` mapping the values of `field` for `language` to the `list`s of \
+        studies with this value.
+        """
+        rows = np.flatnonzero(
+            self.table.codes[KEY] == self.table.values[KEY].index(language))
+        res = OrderedDict()
+        for row in rows:
+            res.setdefault(self.table.values[field][self.table.codes[field][row]], []).append(
+                self.table.values[STUDY][self.table.codes[STUDY][row]])
+        return res
+
+    def report(self):
+        """
+        :return: Generator of lines describing the conflicting values of each language.
+        """
+        for language, counts in zip(self.languages, self.matrix):
+            name = ''
+            if 'ShortName' in self.table.values:
+                name = ' ({0})'.format('/'.join(self.values(language, 'ShortName')))
+            yield '{0} = {1}{2}:'.format(KEY, language, name)
+            for field, n in zip(self.fields, counts):
+                if n > 1:
+                    yield '    {0}: {1}'.format(field, '; '.join(
+                        '"{0}" in {1}'.format(value, ', '.join(studies))
+                        for value, studies in self.values(language, field).items()))
+
+    def write_csv(self, path):
+        """
+        Write the matrix as CSV, with one row per language and one column per field - blank if
+        the values of the field agree.
+        """
+        with path.open('w', encoding='utf8', newline='') as fp:
+            writer = csv.writer(fp)
+            writer.writerow([KEY] + self.fields)
+            for language, counts in zip(self.languages, self.matrix.tolist()):
+                writer.writerow([language] + [n if n > 1 else '' for n in counts])
+
+
+def find_conflicts(table, ignore=()):
+    """
+    :param table: `LanguageTable` instance.
+    :param ignore: Names of fields which may differ across studies.
+    :return: `Conflicts` instance - empty if the data of all languages agree.
+    """
+    fields = [f for f in table.header if f not in (KEY, STUDY) and f not in ignore]
+    if not len(table):
+        return Conflicts(table, [], [], np.zeros((0, 0), dtype=np.int32))
+    order = np.argsort(table.codes[KEY], kind='stable')
+    keys = table.codes[KEY][order]
+    same_key = keys[1:] == keys[:-1]
+    starts = np.flatnonzero(np.r_[True, ~same_key])
+    distinct = np.empty((len(starts), len(fields)), dtype=np.int32)
+    for j, field in enumerate(fields):
+        codes = table.codes[field][order]
+        # Sorting by code within each language - keys are sorted already - any change of the
+        # code within a language is a further distinct value.
+        codes = codes[np.lexsort((codes, keys))]
+        new = np.r_[True, ~same_key | (codes[1:] != codes[:-1])]
+        distinct[:, j] = np.add.reduceat(new, starts)
+    conflicting = distinct > 1
+    rows, cols = np.flatnonzero(conflicting.any(axis=1)), np.flatnonzero(conflicting.any(axis=0))
+    return Conflicts(
+        table,
+        [table.values[KEY][keys[starts[i]]] for i in rows],
+        [fields[j] for j in cols],
+        distinct[np.ix_(rows, cols)])
@@ -1,42 +1,241 @@
+import os
 import re
+import json
+import time
+import bisect
+import zipfile
+import logging
+import mimetypes
+import contextlib
 from itertools import groupby
+from collections import OrderedDict
 from pathlib import Path
-import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
+import pycdstar
+from pycdstar import media
 from cdstarcat import Catalog, Object
 from clldutils.misc import lazyproperty
-from clldutils.path import md5
+from clldutils.path import md5 as _md5
 
-__all__ = ['SoundfileName', 'MediaCatalog']
+from pysoundcomparisons.profiling import timer, timed, count
+from pysoundcomparisons.streaming import ChecksumMismatch, HashingReader, read_hashed
+
+__all__ = ['SoundfileName', 'SoundfileNames', 'MediaCatalog', 'ImageCatalog']
 
 
 class SoundfileName(str):
+    __slots__ = ('variety', 'word_id', 'word', 'extension')
+
     pattern = re.compile(
-        '(?P<variety>.+?)_(?P<word_id>\d{3,})_(?P<word>[^.]+)\.?(?P<extension>.+)?')
+        r'(?P<variety>.+?)_(?P<word_id>\d{3,})_(?P<word>[^.]+)\.?(?P<extension>.+)?')
 
     def __new__(cls, content):
         # split into variety|word_id|word_text|{extension}
-        match = cls.pattern.search(content)
+        match = cls.pattern.match(content)
         if not match:
             raise ValueError('invalid {0}: {1}'.format(cls.__name__, content))
+        return cls._from_parts(*match.groups())
 
-        s = str.__new__(cls, '_'.join(match.groups()[:-1]))
-        for k, v in match.groupdict().items():
-            setattr(s, k, v)
+    @classmethod
+    def _from_parts(cls, variety, word_id, word, extension):
+        s = str.__new__(cls, '_'.join((variety, word_id, word)))
+        s.variety, s.word_id, s.word, s.extension = variety, word_id, word, extension
         return s
 
+    def __reduce__(self):
+        return (self.__class__._from_parts, (self.variety, self.word_id, self.word, self.extension))
+
     @property
     def path(self):
         return Path('{0}.{0.extension}'.format(self))
 
 
-class MediaCatalog(Catalog):
+class SoundfileNames(object):
+    """
+    A list of parsed sound file names, stored column-wise.
+
+    Use `SoundfileNames.parse` to parse large numbers of names in bulk - e.g. all keys of a
+    catalog. Repeated values (varieties, extensions) are stored only once.
+    """
+    __slots__ = ('variety', 'word_id', 'word', 'extension', 'invalid')
+
+    # Same as SoundfileName.pattern, but matching a whole line of newline separated names - or
+    # the invalid name on this line.
+    pattern = re.compile(
+        r'^(?:(?P<variety>[^\n]+?)_(?P<word_id>\d{3,})_(?P<word>[^.\n]+)\.?(?P<extension>[^\n]+)?'
+        r'|(?P<invalid>[^\n]*))$',
+        re.MULTILINE)
+
+    def __init__(self, variety=(), word_id=(), word=(), extension=(), invalid=()):
+        self.variety = tuple(variety)
+        self.word_id = tuple(word_id)
+        self.word = tuple(word)
+        self.extension = tuple(extension)
+        self.invalid = list(invalid)
+
+    @classmethod
+    def parse(cls, names, strict=False):
+        """
+        Parse an iterable of names.
+
+        :param strict: If `True`, raise `ValueError` for invalid names, otherwise collect them \
+        in the `invalid` attribute.
+        """
+        names = list(names)
+        rows = cls.pattern.findall('\n'.join(names)) if names else []
+        if len(rows) != len(names):  # Some names contained newlines.
+            rows = [(cls.pattern.fullmatch(n), n) for n in names]
+            rows = [m.groups() if m else ('', '', '', '', n) for m, n in rows]
+        # Invalid names are the ones not matching the variety group:
+        invalid = [row[4] for row in rows if not row[0]]
+        if strict and invalid:
+            raise ValueError('invalid {0}: {1}'.format(SoundfileName.__name__, invalid[0]))
+        columns = list(zip(*[row for row in rows if row[0]])) or [()] * 5
+        # Store repeated values only once:
+        shared = {v: v for v in set(columns[0]).union(columns[3])}
+        shared[''] = None
+        columns[0] = map(shared.__getitem__, columns[0])
+        columns[3] = map(shared.__getitem__, columns[3])
+        return cls(*columns[:4], invalid=invalid)
+
+    def __len__(self):
+        return len(self.variety)
+
+    def __getitem__(self, i):
+        return SoundfileName._from_parts(
+            self.variety[i], self.word_id[i], self.word[i], self.extension[i])
+
+    def __iter__(self):
+        return map(SoundfileName._from_parts, self.variety, self.word_id, self.word, self.extension)
+
+    def keys(self):
+        """
+        :return: `list` of names without extension, i.e. as used as keys in the catalog.
+        """
+        return ['_'.join(t) for t in zip(self.variety, self.word_id, self.word)]
+
+    def by_variety(self):
+        """
+        :return: `OrderedDict` mapping (sorted) varieties to the sorted list of their names \
+        without extension.
+        """
+        res = OrderedDict()
+        for variety, key in sorted(zip(self.variety, self.keys())):
+            res.setdefault(variety, []).append(key)
+        return res
+
+
+md5 = timed('md5')(_md5)
+
+
+class _Catalog(Catalog):
+    """
+    A cdstarcat Catalog, reporting time spent loading and saving the catalog and in requests to
+    the CDSTAR API to `pysoundcomparisons.profiling`.
+
+    Changes made via `add`, `remove` or `delete` mark the catalog as dirty; leaving the context
+    of a catalog only writes it to disk if it is dirty. They also reset the lazily built indexes
+    of the objects listed in `_indexes` - for a batch of changes only once, see `batch`.
+    """
+    _indexes = []
+    _in_batch = False
+
+    def __init__(self, path, **kw):
+        with timer('catalog load'):
+            Catalog.__init__(self, path, **kw)
+        count('catalog objects', len(self.objects))
+        self.api._req = timed('http')(self.api._req)
+        self.dirty = False
+
+    def __setitem__(self, item, obj):
+        Catalog.__setitem__(self, item, obj)
+        self._changed()
+
+    def remove(self, obj):
+        Catalog.remove(self, obj)
+        self._changed()
+
+    def _changed(self):
+        self.dirty = True
+        if not self._in_batch:
+            self._reset_indexes()
+
+    def _reset_indexes(self):
+        for name in self._indexes:
+            self.__dict__.pop(name, None)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Context manager for adding or removing many objects: the indexes are reset only once,
+        when leaving the context - rather than with each change, which would make rebuilding
+        them quadratic if they are used between changes. Within the context, lookups via the
+        indexes see the objects as before the batch.
+        """
+        self._in_batch = True
+        try:
+            yield self
+        finally:
+            self._in_batch = False
+            self._reset_indexes()
+
+    def __exit__(self, *args):
+        self.save()
+
+    def bitstream_url(self, obj, bs):
+        return self.api.url("/bitstreams/%s/%s" % (obj.id, bs.id))
+
+    def dumps(self):
+        """
+        Serialize the catalog as JSON - objects sorted by ID, one object per line, with sorted
+        keys and without whitespace.
+        """
+        return '{\n' + ',\n'.join('{0}:{1}'.format(
+            json.dumps(uid),
+            json.dumps(obj.asdict(), ensure_ascii=False, sort_keys=True, separators=(',', ':')))
+            for uid, obj in sorted(self.objects.items())) + '\n}\n'
+
+    def save(self, force=False):
+        """
+        Write the catalog to disk - if it has been changed or `force` is `True`.
+
+        The data is written to a temporary file first, which then replaces the catalog, so an
+        interrupted save can not truncate the catalog.
+
+        :return: `True` if the catalog was written, `False` otherwise.
+        """
+        if self.path.exists() and not (self.dirty or force):
+            return False
+        with timer('catalog save'):
+            data = self.dumps()
+            tmp = self.path.parent / '.{0}.{1}.tmp'.format(self.path.name, os.getpid())
+            try:
+                with tmp.open('wb') as fp:
+                    if self.path.suffix.lower() == '.zip':
+                        with zipfile.ZipFile(fp, 'w', zipfile.ZIP_DEFLATED) as z:
+                            z.writestr(self.path.stem, data)
+                    else:
+                        fp.write(data.encode('utf8'))
+                    fp.flush()
+                    os.fsync(fp.fileno())
+                os.replace(str(tmp), str(self.path))
+            finally:
+                if tmp.exists():
+                    tmp.unlink()
+        self.dirty = False
+        return True
+
+
+class MediaCatalog(_Catalog):
 
     mimetypes = {
         'mp3': 'audio/mpeg',
         'ogg': 'audio/ogg',
         'wav': 'audio/wav',
     }
+    sync_query = 'collection:soundcomparisons AND type:soundfile'
+    _indexes = ['_name_uid_map', '_sorted_names']
 
     def __getitem__(self, key):
         """
@@ -58,8 +257,20 @@ class MediaCatalog(Catalog):
     def _name_uid_map(self):
         return {obj.metadata['name']: obj for obj in self}
 
+    @lazyproperty
+    def _sorted_names(self):
+        return sorted(self._name_uid_map)
+
     def get_soundfilenames(self, prefix=""):
-        return [k for k in self._name_uid_map if k.startswith(prefix)]
+        """
+        :return: Sorted `list` of the names of objects starting with `prefix`.
+        """
+        names = self._sorted_names
+        start = bisect.bisect_left(names, prefix)
+        end = start
+        while end < len(names) and names[end].startswith(prefix):
+            end += 1
+        return names[start:end]
 
     def matching_bitstreams(self, obj, mimetypes=None):
         if not isinstance(obj, Object):
@@ -67,8 +278,66 @@ class MediaCatalog(Catalog):
         mimetypes = mimetypes or set(self.mimetypes.values())
         return [bs for bs in obj.bitstreams if bs.mimetype in mimetypes] or [obj.bitstreams[0]]
 
-    def bitstream_url(self, obj, bs):
-        return self.api.url("/bitstreams/%s/%s" % (obj.id, bs.id))
+    def query_audio(self, index, mask):
+        """
+        Select bitstreams by their audio features, e.g. all bitstreams shorter than 200ms:
+
+        >>> catalog.query_audio(index, index['duration'] < 0.2)
+
+        :param index: `pysoundcomparisons.audioindex.AudioIndex` instance.
+        :param mask: Boolean array over the rows of the index.
+        :return: `list` of (object, bitstream) pairs.
+        """
+        md5s = index.md5s(mask)
+        return [(obj, bs) for obj in self for bs in obj.bitstreams if bs.md5 in md5s]
+
+    def newest_modified(self):
+        """
+        :return: The newest `last-modified` timestamp (in ms) of a bitstream in the catalog.
+        """
+        return max((bs.modified for obj in self for bs in obj.bitstreams), default=0)
+
+    def _search_modified(self, since, limit, offset):
+        return self.api.search(
+            {"bool": {
+                "must": {"query_string": {"query": self.sync_query}},
+                "filter": {"range": {"last-modified": {"gt": since}}}}},
+            index='metadata',
+            limit=limit,
+            offset=offset)
+
+    def _read_object(self, uid, metadata):
+        obj = self.api.get_object(uid)
+        if not isinstance(metadata, dict):
+            metadata = obj.metadata.read()
+        return Object.fromdict(uid, dict(metadata=metadata, bitstreams=obj.read()['bitstream']))
+
+    def sync(self, since=None, limit=500, workers=8):
+        """
+        Add new objects and update objects modified in CDSTAR - bitstreams or metadata only,
+        e.g. renamed objects - since the newest `last-modified` timestamp in the catalog.
+
+        Pages of search results and the modified objects are retrieved with `workers`
+        concurrent requests. Changes are merged into the catalog in one go - and written to
+        disk when leaving the context of the catalog.
+
+        :param since: Timestamp (in ms) to sync from - defaults to `newest_modified()`.
+        :param limit: Number of search results per request (at most 500).
+        :return: `list` of IDs of the new or updated objects.
+        """
+        since = self.newest_modified() if since is None else since
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            first = self._search_modified(since, limit, 0)
+            pages = [first] + list(pool.map(
+                lambda offset: self._search_modified(since, limit, offset),
+                range(limit, first.hitcount, limit)))
+            hits = OrderedDict((r.resource.id, r.source) for page in pages for r in page)
+            objects = list(pool.map(lambda i: self._read_object(*i), hits.items()))
+
+        for obj in objects:
+            self[obj.id] = obj
+        count('synced objects', len(objects))
+        return [obj.id for obj in objects]
 
     def _upload(self, sfn, files):
         """
@@ -81,19 +350,21 @@ class MediaCatalog(Catalog):
         obj = self.api.get_object(cat_obj.id if cat_obj else None)
         print(obj.id)
         md = {'collection': 'soundcomparisons', 'name': sfn, 'type': 'soundfile'}
-        changed = False
+        changed, checksums = False, {}
         if not cat_obj:  # If the object is already in the catalog, the metadata does not change!
             obj.metadata = md
         for f in files:
             fmt = f.suffix[1:]
             if fmt not in self.mimetypes:
                 continue
-            create = True
+            create, content = True, None
             if cat_obj:
                 for cat_bitstream in cat_obj.bitstreams:
                     if cat_bitstream.id.endswith(f.suffix):
-                        # A bitstream for this mimetype already exists!
-                        if cat_bitstream.md5 == md5(f):
+                        # A bitstream for this mimetype already exists! We read the file only
+                        # once - to compare md5 sums and to upload the content.
+                        content = read_hashed(f)
+                        if cat_bitstream.md5 == content[1]:
                             # If the md5 sum is the same, don't bother uploading!
                             create = False
                         else:
@@ -108,7 +379,8 @@ class MediaCatalog(Catalog):
             if create:
                 changed = True
                 print('uploading {0}'.format(f.name))
-                obj.add_bitstream(fname=str(f), name=f.name, mimetype=self.mimetypes[fmt])
+                checksums[f.name] = self._add_bitstream(
+                    obj, f, self.mimetypes[fmt], content=content)
                 time.sleep(0.1)
             else:
                 print('skipping {0}'.format(f.name))
@@ -116,6 +388,37 @@ class MediaCatalog(Catalog):
         if changed:
             obj.read()
             self.add(obj, metadata=md, update=True)
+            mismatches = [
+                bs.id for bs in self.objects[obj.id].bitstreams
+                if bs.id in checksums and bs.md5 != checksums[bs.id]]
+            if mismatches:
+                raise ChecksumMismatch(
+                    'md5 mismatch of uploaded {0}'.format(', '.join(mismatches)))
+
+    def _add_bitstream(self, obj, path, mimetype, content=None):
+        """
+        Upload a file as bitstream of CDSTAR object `obj` - like pycdstar's `add_bitstream`, but
+        computing the md5 sum while the file is sent.
+
+        :param content: (data, md5) pair, as returned by `read_hashed`, if the file has been \
+        read already.
+        :return: md5 sum of the uploaded content.
+        """
+        def post(data):
+            self.api._req(
+                '/bitstreams/{0}/{1}'.format(obj.id, path.name),
+                method='post',
+                data=data,
+                assert_status=201,
+                headers={'content-type': mimetype})
+
+        if content is not None:
+            post(content[0])
+            return content[1]
+        with path.open('rb') as fp:
+            reader = HashingReader(fp)
+            post(reader)
+        return reader.hexdigest()
 
     def upload(self, d):
         """
@@ -123,6 +426,172 @@ class MediaCatalog(Catalog):
         """
         for stem, files in groupby(sorted(d.iterdir(), key=lambda f: f.name), lambda f: f.stem):
             try:
-                self._upload(SoundfileName(stem), files)
+                sfn = SoundfileName(stem)
             except ValueError:
-                pass
+                continue
+            self._upload(sfn, files)
+
+
+def image_derivatives(path):
+    """
+    Create the derivatives of an image - i.e. `thumbnail.jpg` and `web.jpg` - locally.
+
+    Like pycdstar, this requires ImageMagick's `convert` and `identify` commands.
+
+    :return: pair (metadata `dict` with image dimensions, list of (path, name) pairs of the \
+    derivatives, written to temporary files)
+    """
+    img = media.Image(path)
+    return img.add_metadata(), [(str(f.path), f.bitstream_name) for f in img.add_bitstreams()]
+
+
+class ImageCatalog(_Catalog):
+    """
+    The catalog of contributor images, with objects holding the original image plus the
+    derivatives `thumbnail.jpg` and `web.jpg`.
+    """
+    extensions = ['png', 'gif', 'jpg', 'jpeg', 'tif', 'tiff']
+    derivatives = ['thumbnail.jpg', 'web.jpg']
+    # Kinds of bitstreams, as accepted by `matching_bitstreams`:
+    kinds = ['original', 'thumbnail', 'web']
+    _indexes = ['_name_map', '_path_map', '_md5_map']
+
+    def __getitem__(self, key):
+        """
+        Return the object identified by UID, name or path of the original image.
+        """
+        for index in [self.objects, self._name_map, self._path_map]:
+            if key in index:
+                return index[key]
+        raise KeyError(key)
+
+    def __contains__(self, item):
+        return (item in self.objects) or (item in self._name_map) or (item in self._path_map)
+
+    @lazyproperty
+    def _name_map(self):
+        return {obj.metadata['name']: obj for obj in self}
+
+    @lazyproperty
+    def _path_map(self):
+        return {obj.metadata['path']: obj for obj in self if obj.metadata.get('path')}
+
+    @lazyproperty
+    def _md5_map(self):
+        return {bs.md5: (obj, bs) for obj in self for bs in obj.bitstreams}
+
+    def get_md5(self, checksum):
+        """
+        :return: (object, bitstream) pair of a bitstream with md5 `checksum` or `None`.
+        """
+        return self._md5_map.get(checksum)
+
+    def original_bitstream(self, obj):
+        for bs in obj.bitstreams:
+            if bs.id not in self.derivatives:
+                return bs
+
+    def matching_bitstreams(self, obj, kinds=None):
+        """
+        :param obj: Catalog object, or UID, name or path of an object.
+        :param kinds: `list` of kinds of bitstreams - see `ImageCatalog.kinds` - or `None` for \
+        all bitstreams.
+        :return: `list` of the bitstreams of the requested kinds - falling back to the original \
+        image if the object has no matching derivative.
+        """
+        if not isinstance(obj, Object):
+            obj = self[obj]
+        kinds = kinds or self.kinds
+        res = []
+        for bs in obj.bitstreams:
+            kind = bs.id.split('.')[0] if bs.id in self.derivatives else 'original'
+            if kind in kinds:
+                res.append(bs)
+        if not res and self.original_bitstream(obj):
+            res.append(self.original_bitstream(obj))
+        return res
+
+    def changed_images(self, d):
+        """
+        :return: Generator of (path, catalog object) pairs for image files in directory d, \
+        which are not in the catalog (catalog object `None`) or differ from the original image \
+        in the catalog.
+        """
+        for f in sorted(d.iterdir()):
+            if f.suffix[1:].lower() not in self.extensions:
+                continue
+            cat_obj = self._name_map.get(f.stem)
+            if cat_obj:
+                bs = self.original_bitstream(cat_obj)
+                if bs and bs.md5 == md5(f):
+                    continue
+            yield f, cat_obj
+
+    def _upload(self, path, derivatives, metadata, cat_obj):
+        """
+        Create a new CDSTAR object for an image and its derivatives and delete the old one.
+        """
+        obj = self.api.get_object()
+        try:
+            obj.metadata = metadata
+            obj.add_bitstream(
+                fname=str(path),
+                name=media.File(path).clean_name,
+                mimetype=mimetypes.guess_type(path.name, strict=False)[0])
+            for fname, name in derivatives:
+                obj.add_bitstream(fname=fname, name=name, mimetype='image/jpeg')
+            obj.read()
+        except:  # noqa: E722
+            obj.delete()
+            raise
+        finally:
+            for fname, _ in derivatives:
+                Path(fname).unlink()
+        if cat_obj:
+            self.api.get_object(cat_obj.id).delete()
+        return obj
+
+    def upload(self, d, workers=4, log=None):
+        """
+        Upload new or changed image files in directory d to CDSTAR, replacing existing objects
+        with the same name.
+
+        Derivatives are created in a pool of `workers` processes, uploads are run with
+        `workers` threads. The uploaded objects are added to the catalog as one batch.
+
+        :return: The number of uploaded images.
+        """
+        log = log or logging.getLogger(__name__)
+        images, uploaded = list(self.changed_images(d)), 0
+        with ProcessPoolExecutor(max_workers=workers) as processes, \
+                ThreadPoolExecutor(max_workers=workers) as threads, \
+                self.batch():
+            uploads = {}
+            derivatives = {processes.submit(image_derivatives, f): (f, o) for f, o in images}
+            for future in as_completed(derivatives):
+                f, cat_obj = derivatives[future]
+                try:
+                    md, files = future.result()
+                except Exception as e:
+                    log.error('Creating derivatives of {0} failed: {1}'.format(f.name, e))
+                    continue
+                md.update(
+                    collection='soundcomparisons', name=f.stem, type='imagefile', path=f.name)
+                md.setdefault('creator', '{0.__name__} {0.__version__}'.format(pycdstar))
+                uploads[threads.submit(self._upload, f, files, md, cat_obj)] = (f, md, cat_obj)
+
+            for future in as_completed(uploads):
+                f, md, cat_obj = uploads[future]
+                try:
+                    obj = future.result()
+                except Exception as e:
+                    log.error('Uploading {0} failed: {1}'.format(f.name, e))
+                    continue
+                if cat_obj:
+                    self.remove(cat_obj.id)
+                self.add(obj, metadata=md)
+                uploaded += 1
+                log.info('{0} -> {1} object {2}{3}'.format(
+                    f.name, 'replaced' if cat_obj else 'new', obj.id,
+                    ' (was {0})'.format(cat_obj.id) if cat_obj else ''))
+        return uploaded
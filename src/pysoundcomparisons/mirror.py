@@ -0,0 +1,138 @@
+"""
+Functionality to check a local mirror of the sound files - as created by `downloadSoundFiles`,
+i.e. with files stored as VARIETY/BITSTREAM_ID - against the catalog.
+"""
+import os
+import json
+import mmap
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from pysoundcomparisons.mediacatalog import SoundfileName
+from pysoundcomparisons.profiling import timer, count
+
+__all__ = ['file_md5', 'expected_files', 'verify']
+
+CACHE = '.md5cache.json'
+BUFSIZE = 1024 * 1024
+
+
+def file_md5(path, bufsize=BUFSIZE):
+    """
+    Compute the md5 checksum of a file, hashing memory-mapped content in chunks of `bufsize`.
+
+    :return: hex digest of the md5 checksum.
+    """
+    res = hashlib.md5()
+    with open(str(path), 'rb') as fp:
+        if os.fstat(fp.fileno()).st_size:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    for i in range(0, len(mm), bufsize):
+                        res.update(view[i:i + bufsize])
+                finally:
+                    view.release()
+    return res.hexdigest()
+
+
+def _hash(path):
+    return path, file_md5(path)
+
+
+def expected_files(catalog, mimetypes=None):
+    """
+    :param catalog: `MediaCatalog` instance.
+    :param mimetypes: Only bitstreams with one of these mimetypes are expected in the mirror.
+    :return: `dict` mapping relative paths of the files in a mirror to their md5 checksums.
+    """
+    res = {}
+    for obj in catalog:
+        try:
+            variety = SoundfileName(obj.metadata['name']).variety
+        except ValueError:
+            continue
+        for bs in obj.bitstreams:
+            if (not mimetypes) or bs.mimetype in mimetypes:
+                res['{0}/{1}'.format(variety, bs.id)] = bs.md5
+    return res
+
+
+def _load_cache(path):
+    if path.exists():
+        try:
+            with path.open(encoding='utf8') as fp:
+                return json.load(fp)
+        except ValueError:
+            pass
+    return {}
+
+
+def verify(catalog, d, mimetypes=None, workers=4, use_cache=True, partial=False):
+    """
+    Verify a local mirror of the sound files in directory `d` against the catalog.
+
+    Files are hashed in `workers` parallel processes. Checksums are cached in `d/.md5cache.json`,
+    keyed by file size and modification time, so unchanged files are only hashed once.
+
+    :param partial: If `True`, only files of varieties with a folder in `d` are expected.
+
+    :return: `OrderedDict` with sorted lists of relative paths of `missing`, `corrupt` and \
+    `orphan` files and the number of files which were `ok` or had to be `hashed`.
+    """
+    expected = expected_files(catalog, mimetypes=mimetypes)
+    if partial:
+        varieties = set(p.name for p in d.iterdir() if p.is_dir())
+        expected = {k: v for k, v in expected.items() if k.split('/')[0] in varieties}
+    cache_path = d / CACHE
+    cache = _load_cache(cache_path) if use_cache else {}
+    new_cache, found, to_hash, orphan = {}, {}, [], []
+
+    for root, _, files in os.walk(str(d)):
+        for fname in files:
+            path = os.path.join(root, fname)
+            rel = os.path.relpath(path, str(d)).replace(os.sep, '/')
+            if rel == CACHE:
+                continue
+            if rel not in expected:
+                orphan.append(rel)
+                continue
+            stat = os.stat(path)
+            key = [stat.st_size, stat.st_mtime_ns]
+            cached = cache.get(rel)
+            if cached and cached[:2] == key:
+                found[rel] = cached[2]
+                new_cache[rel] = cached
+            else:
+                to_hash.append((path, rel, key))
+
+    if to_hash:
+        count('md5 bytes', sum(key[0] for _, _, key in to_hash))
+        # Hash the biggest files first, to keep all workers busy until the end:
+        to_hash.sort(key=lambda i: -i[2][0])
+        rel_paths = {path: (rel, key) for path, rel, key in to_hash}
+        chunksize = max(1, len(to_hash) // (workers * 16))
+        with timer('md5'), ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, checksum in pool.map(_hash, [i[0] for i in to_hash], chunksize=chunksize):
+                rel, key = rel_paths[path]
+                found[rel] = checksum
+                new_cache[rel] = key + [checksum]
+
+    if use_cache and new_cache != cache:
+        with timer('file write'), cache_path.open('w', encoding='utf8') as fp:
+            json.dump(new_cache, fp, separators=(',', ':'))
+
+    missing, corrupt = [], []
+    for rel, checksum in expected.items():
+        if rel not in found:
+            missing.append(rel)
+        elif found[rel] != checksum:
+            corrupt.append(rel)
+    return OrderedDict([
+        ('missing', sorted(missing)),
+        ('corrupt', sorted(corrupt)),
+        ('orphan', sorted(orphan)),
+        ('ok', len(found) - len(corrupt)),
+        ('hashed', len(to_hash)),
+    ])
@@ -0,0 +1,140 @@
+"""
+A line-delimited form of soundfiles/modified.json - as written by `write_modified_soundfiles` -
+with one JSON record per (category, uid, path), which can be streamed and filtered without
+loading the whole report, and consumers of these records.
+"""
+import json
+import itertools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from pysoundcomparisons.profiling import timer, count
+
+__all__ = [
+    'CATEGORIES', 'iter_records', 'write_records', 'read_records', 'filter_records',
+    'delete_obsolete']
+
+CATEGORIES = ['new', 'modified', 'obsolete', 'check', 'dup_paths', 'dup_md5']
+
+
+def _record(category, uid, path, md5=None):
+    res = OrderedDict([('category', category), ('uid', uid), ('path', path)])
+    if md5:
+        res['md5'] = md5
+    return res
+
+
+def iter_records(data):
+    """
+    :param data: `dict` with the content of 'modified.json'.
+    :return: Generator of records - `OrderedDict`s with keys category, uid and path (and md5 \
+    for category dup_md5).
+    """
+    for path in data.get('new', []):
+        yield _record('new', None, path)
+    for category in ['modified', 'obsolete', 'check']:
+        for uid, paths in data.get(category, {}).items():
+            for path in paths:
+                yield _record(category, uid, path)
+    for path, uids in data.get('dup_paths', {}).items():
+        for uid in uids:
+            yield _record('dup_paths', uid, path)
+    for md5, uids in data.get('dup_md5', {}).items():
+        for uid in uids:
+            yield _record('dup_md5', uid, None, md5=md5)
+
+
+def write_records(path, records):
+    """
+    Write records as JSON lines - with category as first key, see `read_records`.
+
+    :return: Number of records written.
+    """
+    n = 0
+    with timer('file write'), path.open('w', encoding='utf8') as fp:
+        for n, record in enumerate(records, start=1):
+            fp.write(json.dumps(record, separators=(',', ':')) + '\n')
+    return n
+
+
+def read_records(path, categories=None, prefix=None):
+    """
+    Stream the records from a file written by `write_records`.
+
+    Lines of other categories are skipped without being parsed.
+
+    :param categories: Only yield records of these categories.
+    :param prefix: Only yield records with a path whose file name starts with `prefix`, e.g. \
+    a variety.
+    :return: Generator of `dict`s.
+    """
+    heads = tuple(
+        '{{"category":{0},'.format(json.dumps(c)) for c in (categories or []))
+    with path.open(encoding='utf8') as fp:
+        for line in fp:
+            if heads and not line.startswith(heads):
+                continue
+            record = json.loads(line)
+            if _matches(record, prefix=prefix):
+                yield record
+
+
+def _matches(record, categories=None, prefix=None):
+    if categories and record['category'] not in categories:
+        return False
+    return prefix is None or bool(
+        record['path'] and record['path'].split('/')[-1].startswith(prefix))
+
+
+def filter_records(records, categories=None, prefix=None):
+    """
+    Filter records - as returned by `iter_records` - like `read_records` does.
+    """
+    return (r for r in records if _matches(r, categories=categories, prefix=prefix))
+
+
+def _obsolete_uids(catalog, records):
+    seen = set()
+    for r in records:
+        if r['category'] == 'obsolete' and r['uid'] not in seen:
+            seen.add(r['uid'])
+            if r['uid'] in catalog.objects:
+                yield r['uid']
+
+
+def _delete(api, uid):
+    return api.get_object(uid).delete()
+
+
+def delete_obsolete(catalog, records, batch=100, workers=4, log=None):
+    """
+    Delete the objects of obsolete records in CDSTAR and remove them from the catalog.
+
+    Objects are deleted in batches of `batch` objects, with `workers` concurrent requests; the
+    catalog is saved after each batch, so an interrupted run loses no progress.
+
+    :param catalog: `MediaCatalog` instance.
+    :param records: Iterable of records, e.g. as returned by `read_records`.
+    :return: Number of deleted objects.
+    """
+    uids, n = _obsolete_uids(catalog, records), 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            chunk = list(itertools.islice(uids, batch))
+            if not chunk:
+                break
+            futures = {uid: pool.submit(_delete, catalog.api, uid) for uid in chunk}
+            for uid, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    if log:
+                        log.warning('deleting {0} failed: {1}'.format(uid, e))
+                    continue
+                catalog.remove(uid)
+                count('deleted objects')
+                n += 1
+            catalog.save()
+            if log:
+                log.info('{0} objects deleted'.format(n))
+    return n
@@ -0,0 +1,168 @@
+"""
+Dictionary encoding of the study data of the offline version.
+
+The sound paths of the transcriptions - `sound/<variety>/<variety>_<word>.<ext>` or CDSTAR
+bitstream URLs - repeat long path prefixes and variety names. Encoded, each such path is a
+string
+    MARKER <prefix index> [',' <variety index>] ':' <rest>
+with indexes - base 36 - into a table of prefixes and a table of varieties, and the data is
+wrapped in a small JavaScript function which decodes it when the file is loaded, so the
+resulting variable holds exactly the data of the plain file.
+"""
+import re
+import json
+import time
+from collections import OrderedDict
+
+from pysoundcomparisons.precompress import write_precompressed
+
+__all__ = ['encode_study', 'decode_study', 'encoded_js', 'write_encoded_js']
+
+MARKERS = '~^|!`'
+VARIETY = re.compile(r'(.*?)_\d{3,}_')
+
+DECODER = """\
+(function(P,V,M,d){\
+function f(x){\
+if(typeof x==='string'){\
+if(x.charAt(0)!==M)return x;\
+var j=x.indexOf(':'),h=x.slice(1,j).split(','),s=P[parseInt(h[0],36)];\
+if(h.length>1)s+=V[parseInt(h[1],36)];\
+return s+x.slice(j+1)}\
+if(Array.isArray(x))return x.map(f);\
+return x}\
+var t=d.transcriptions;\
+for(var k in t)if(t[k].soundPaths)t[k].soundPaths=f(t[k].soundPaths);\
+return d})"""
+
+
+def _strings(x):
+    if isinstance(x, str):
+        yield x
+    elif isinstance(x, list):
+        for y in x:
+            for s in _strings(y):
+                yield s
+
+
+def _map(x, func):
+    if isinstance(x, str):
+        return func(x)
+    if isinstance(x, list):
+        return [_map(y, func) for y in x]
+    return x
+
+
+def _b36(i):
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    res = ''
+    while True:
+        i, r = divmod(i, 36)
+        res = digits[r] + res
+        if not i:
+            return res
+
+
+class _Table(OrderedDict):
+    def index(self, item):
+        if item not in self:
+            self[item] = len(self)
+        return self[item]
+
+
+def encode_study(data):
+    """
+    :param data: The study data as returned by `/query/data?study=...`.
+    :return: tuple (prefixes, varieties, marker, encoded data) - the data is not modified, \
+    transcriptions are copied.
+    """
+    paths = [
+        s for t in data.get('transcriptions', {}).values()
+        for s in _strings(t.get('soundPaths'))]
+    first = set(s[:1] for s in paths)
+    marker = [m for m in MARKERS if m not in first]
+    if not marker:
+        raise ValueError('no marker available for encoding')
+    marker = marker[0]
+    prefixes, varieties = _Table(), _Table()
+
+    def encode(s):
+        prefix, sep, rest = s.rpartition('/')
+        if not sep:
+            return s
+        head = marker + _b36(prefixes.index(prefix + sep))
+        m = VARIETY.match(rest)
+        if m:
+            head += ',' + _b36(varieties.index(m.group(1)))
+            rest = rest[len(m.group(1)):]
+        return head + ':' + rest
+
+    res = OrderedDict(data)
+    if 'transcriptions' in data:
+        res['transcriptions'] = OrderedDict()
+        for k, t in data['transcriptions'].items():
+            if t.get('soundPaths'):
+                t = OrderedDict(t)
+                t['soundPaths'] = _map(t['soundPaths'], encode)
+            res['transcriptions'][k] = t
+    return list(prefixes), list(varieties), marker, res
+
+
+def decode_study(prefixes, varieties, marker, data):
+    """
+    The inverse of `encode_study` - i.e. what the JavaScript decoder does.
+    """
+    def decode(s):
+        if not s.startswith(marker):
+            return s
+        head, _, rest = s[1:].partition(':')
+        head = [int(i, 36) for i in head.split(',')]
+        return prefixes[head[0]] + (varieties[head[1]] if len(head) > 1 else '') + rest
+
+    res = OrderedDict(data)
+    if 'transcriptions' in data:
+        res['transcriptions'] = OrderedDict()
+        for k, t in data['transcriptions'].items():
+            if t.get('soundPaths'):
+                t = OrderedDict(t)
+                t['soundPaths'] = _map(t['soundPaths'], decode)
+            res['transcriptions'][k] = t
+    return res
+
+
+def _dumps(obj):
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def encoded_js(prefix, data):
+    """
+    :param prefix: JavaScript prefix, e.g. `var localDataStudyX=`.
+    :return: JavaScript assigning the decoded `data` to the variable.
+    """
+    prefixes, varieties, marker, encoded = encode_study(data)
+    return '{0}{1}({2},{3},{4},{5})'.format(
+        prefix, DECODER, _dumps(prefixes), _dumps(varieties), _dumps(marker), _dumps(encoded))
+
+
+def write_encoded_js(path, prefix, data, precompressed=None):
+    """
+    Write the dictionary encoded study data to `path` and its precompressed variants - FILE.gz
+    and, if the brotli package is installed, FILE.br - to the directory `precompressed`.
+
+    :param precompressed: Directory for the precompressed variants - default: the directory \
+    of `path`.
+    :return: `dict` with size of the plain JavaScript, of the encoded file and of its gzip and \
+    brotli (`None` if not written) variants in bytes, and the time spent encoding in seconds.
+    """
+    start = time.time()
+    content = encoded_js(prefix, data).encode('utf8')
+    seconds = time.time() - start
+    precompressed = precompressed or path.parent
+    sizes = write_precompressed(path, content, dest=precompressed)
+    return OrderedDict([
+        ('plain', len((prefix + _dumps(data)).encode('utf8'))),
+        ('encoded', sizes[path]),
+        ('gzip', sizes[precompressed / (path.name + '.gz')]),
+        ('brotli', sizes.get(precompressed / (path.name + '.br'))),
+        ('seconds', seconds),
+    ])
@@ -0,0 +1,56 @@
+"""
+Writing of static files together with precompressed siblings - FILE.gz and, if the brotli
+package is installed, FILE.br - which web servers can deliver as is to clients accepting these
+encodings.
+"""
+import io
+import gzip
+
+from pysoundcomparisons.profiling import timer
+
+__all__ = ['gzip_bytes', 'brotli_bytes', 'write_precompressed']
+
+
+def gzip_bytes(data):
+    """
+    Compress `data` with gzip, without a timestamp, so the result is reproducible.
+    """
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=9, mtime=0) as fp:
+        fp.write(data)
+    return buf.getvalue()
+
+
+def brotli_bytes(data):
+    """
+    :return: `data` compressed with brotli, or `None` if the brotli package is not installed.
+    """
+    try:
+        import brotli
+    except ImportError:  # pragma: no cover
+        return None
+    return brotli.compress(data)
+
+
+def write_precompressed(path, data, dest=None):
+    """
+    Write `data` to `path` and its compressed variants to files named like `path` with suffixes
+    .gz and .br added.
+
+    :param data: `bytes` or `str` - which will be encoded as UTF-8.
+    :param dest: Directory for the compressed variants - default: the directory of `path`.
+    :return: `dict` mapping the paths written to their sizes in bytes.
+    """
+    if isinstance(data, str):
+        data = data.encode('utf8')
+    res, dest = {}, dest or path.parent
+    with timer('file write'):
+        for p, content in [
+            (path, data),
+            (dest / (path.name + '.gz'), gzip_bytes(data)),
+            (dest / (path.name + '.br'), brotli_bytes(data)),
+        ]:
+            if content is not None:
+                p.write_bytes(content)
+                res[p] = len(content)
+    return res
@@ -0,0 +1,108 @@
+"""
+Lightweight instrumentation of the hot paths of pysoundcomparisons.
+
+Code paths report the time spent in a phase - e.g. 'catalog load', 'db', 'http', 'md5' or
+'file write' - using `timer` or `timed`, and count events or bytes using `count`. The numbers
+are collected in the global `PROFILE` and dumped by the CLI when called with `--profile`.
+
+Updates are guarded by a lock, since phases are also timed in worker threads - e.g. of the
+HTTP client.
+"""
+import time
+import json
+import threading
+import functools
+import contextlib
+from collections import OrderedDict
+
+__all__ = ['PROFILE', 'Profile', 'timer', 'timed', 'count']
+
+
+class Profile(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.start = time.perf_counter()
+            self.phases = OrderedDict()
+            self.counters = OrderedDict()
+
+    @contextlib.contextmanager
+    def timer(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                stats = self.phases.setdefault(
+                    phase, OrderedDict([('calls', 0), ('seconds', 0.0)]))
+                stats['calls'] += 1
+                stats['seconds'] += seconds
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def asdict(self, **kw):
+        res = OrderedDict(kw)
+        with self._lock:
+            res['seconds'] = time.perf_counter() - self.start
+            res['phases'] = OrderedDict(
+                (k, OrderedDict([('calls', v['calls']), ('seconds', round(v['seconds'], 6))]))
+                for k, v in sorted(self.phases.items(), key=lambda i: -i[1]['seconds']))
+            res['counters'] = OrderedDict(self.counters)
+        return res
+
+    def dump(self, fp, **kw):
+        json.dump(self.asdict(**kw), fp, indent=4)
+        fp.write('\n')
+
+
+PROFILE = Profile()
+
+
+def timer(phase):
+    """
+    Context manager timing the enclosed block as part of `phase`.
+    """
+    return PROFILE.timer(phase)
+
+
+def count(name, n=1):
+    PROFILE.count(name, n=n)
+
+
+def timed(phase):
+    """
+    Decorator timing calls of the decorated function as part of `phase`.
+    """
+    def wrap(f):
+        @functools.wraps(f)
+        def wrapped(*args, **kw):
+            with PROFILE.timer(phase):
+                return f(*args, **kw)
+        return wrapped
+    return wrap
+
+
+def cprofile_stats(profile, limit=30):
+    """
+    :param profile: A `cProfile.Profile` instance.
+    :return: `list` of `dict`s with stats of the `limit` functions with highest cumulative time.
+    """
+    import pstats
+
+    stats = pstats.Stats(profile)
+    res = []
+    for (fname, line, func), (cc, nc, tt, ct, _) in sorted(
+            stats.stats.items(), key=lambda i: -i[1][3])[:limit]:
+        res.append(OrderedDict([
+            ('function', '{0}:{1}({2})'.format(fname, line, func)),
+            ('calls', nc),
+            ('tottime', round(tt, 6)),
+            ('cumtime', round(ct, 6)),
+        ]))
+    return res
@@ -0,0 +1,136 @@
+"""
+An embedded SQLite mirror of the Sound-Comparisons database, built from the CSV exports of its
+tables in raw/ (see `to_rawcsv.py`), so commands which query the database can run without a
+MariaDB server - pass `--db-host sqlite:PATH` to use it.
+"""
+import os
+import re
+import csv
+import sqlite3
+
+from pysoundcomparisons.profiling import timer, count
+
+__all__ = ['INDEXED_COLUMNS', 'column_types', 'build_sqlite']
+
+# Columns which are indexed in all tables which have them:
+INDEXED_COLUMNS = ['LanguageIx', 'IxElicitation', 'study']
+
+INT = re.compile(r'-?(0|[1-9][0-9]*)$')
+REAL = re.compile(r'-?[0-9]+\.[0-9]+$')
+
+
+def _read_csv(path):
+    with path.open(encoding='utf8', newline='') as fp:
+        reader = csv.reader(fp)
+        header = next(reader, None)
+        if header:
+            yield header
+            for row in reader:
+                yield row
+
+
+def column_types(path):
+    """
+    Infer SQLite column types for a CSV file: INTEGER or REAL if all non-empty values are
+    numbers - without leading zeros, which must be preserved in identifiers - TEXT otherwise.
+
+    :return: `list` of (column name, type) pairs.
+    """
+    rows = _read_csv(path)
+    header = next(rows, [])
+    types = ['INTEGER'] * len(header)
+    for row in rows:
+        for i, value in enumerate(row):
+            if value == '' or types[i] == 'TEXT':
+                continue
+            if types[i] == 'INTEGER' and not INT.match(value):
+                types[i] = 'REAL'
+            if types[i] == 'REAL' and not (INT.match(value) or REAL.match(value)):
+                types[i] = 'TEXT'
+    return list(zip(header, types))
+
+
+def _converted(rows, types):
+    conv = [int if t == 'INTEGER' else float if t == 'REAL' else None for t in types]
+    for row in rows:
+        yield [
+            value if c is None else (c(value) if value != '' else None)
+            for c, value in zip(conv, row)]
+
+
+def _quote(name):
+    return '"{0}"'.format(name.replace('"', '""'))
+
+
+def build_sqlite(raw, path, log=None):
+    """
+    Load all CSV files in directory `raw` into a new SQLite database at `path` - one table
+    per file, named like the file.
+
+    Rows are inserted in bulk, one transaction per table. Columns listed in `INDEXED_COLUMNS`
+    are indexed, and for tables with a `study` column, per-study views `<table>_<study>` - the
+    `Languages_<study>` etc. of the MariaDB database, without the `study` column - are created
+    for all studies in `Studies`.
+
+    The database is written to a temporary file which replaces `path` when complete.
+
+    :return: `dict` mapping table names to row counts.
+    """
+    tmp = path.parent / '.{0}.{1}.tmp'.format(path.name, os.getpid())
+    if tmp.exists():
+        tmp.unlink()
+    res, columns = {}, {}
+    try:
+        con = sqlite3.connect(str(tmp))
+        con.execute('PRAGMA journal_mode = OFF')
+        con.execute('PRAGMA synchronous = OFF')
+        for csv_path in sorted(raw.glob('*.csv')):
+            table = csv_path.stem
+            with timer('csv read'):
+                types = column_types(csv_path)
+            if not types:
+                continue
+            columns[table] = [name for name, _ in types]
+            with timer('db'), con:
+                con.execute('CREATE TABLE {0} ({1})'.format(
+                    _quote(table),
+                    ', '.join('{0} {1}'.format(_quote(n), t) for n, t in types)))
+                rows = _read_csv(csv_path)
+                next(rows)
+                cursor = con.executemany(
+                    'INSERT INTO {0} VALUES ({1})'.format(
+                        _quote(table), ', '.join('?' * len(types))),
+                    _converted(rows, [t for _, t in types]))
+                res[table] = cursor.rowcount
+                for col in INDEXED_COLUMNS:
+                    if col in columns[table]:
+                        con.execute('CREATE INDEX {0} ON {1} ({2})'.format(
+                            _quote('ix_{0}_{1}'.format(table, col)), _quote(table), _quote(col)))
+            count('db rows', res[table])
+            if log:
+                log.info('{0}: {1} rows'.format(table, res[table]))
+
+        if 'Studies' in columns:
+            studies = [r[0] for r in con.execute('SELECT Name FROM Studies ORDER BY Name')]
+            with timer('db'), con:
+                for table, cols in sorted(columns.items()):
+                    if 'study' not in cols:
+                        continue
+                    for study in studies:
+                        view = '{0}_{1}'.format(table, study)
+                        if view in columns:
+                            continue
+                        # Views cannot have bound parameters, so the study name is quoted.
+                        con.execute("CREATE VIEW {0} AS SELECT {1} FROM {2} WHERE study = '{3}'"
+                                    .format(
+                                        _quote(view),
+                                        ', '.join(_quote(c) for c in cols if c != 'study'),
+                                        _quote(table),
+                                        study.replace("'", "''")))
+        con.execute('ANALYZE')
+        con.close()
+        os.replace(str(tmp), str(path))
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return res
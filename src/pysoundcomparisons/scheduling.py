@@ -0,0 +1,129 @@
+"""
+Ordering of downloads by size and enforcement of a bandwidth cap and a byte quota.
+"""
+import re
+import time
+import threading
+
+from clldutils.misc import format_size
+
+__all__ = ['ORDERS', 'schedule', 'parse_size', 'Budget', 'QuotaExceeded']
+
+ORDERS = ['name', 'small', 'interleaved']
+
+
+def schedule(downloads, order='name', size=lambda d: d.bitstream.size):
+    """
+    :param downloads: `list` of downloads, e.g. `pysoundcomparisons.selection.Download`s.
+    :param order: 'name' keeps the order, 'small' puts small files first - for fast progress - \
+    and 'interleaved' alternates between small and big files, so big transfers keep the \
+    connection busy while small ones make progress.
+    :return: `list` of the downloads in the requested order.
+    """
+    if order == 'name':
+        return list(downloads)
+    by_size = sorted(downloads, key=size)
+    if order == 'small':
+        return by_size
+    if order == 'interleaved':
+        res = []
+        i, j = 0, len(by_size) - 1
+        while i <= j:
+            res.append(by_size[i])
+            if i != j:
+                res.append(by_size[j])
+            i, j = i + 1, j - 1
+        return res
+    raise ValueError('unknown order: {0}'.format(order))
+
+
+def parse_size(s):
+    """
+    Parse a number of bytes with an optional unit suffix, e.g. '500K', '2M' or '1.5G'.
+    """
+    m = re.fullmatch(r'\s*([0-9.]+)\s*([kmgt]?)i?b?\s*', str(s), flags=re.IGNORECASE)
+    if not m:
+        raise ValueError('invalid size: {0}'.format(s))
+    return int(float(m.group(1)) * 1024 ** ' kmgt'.index(m.group(2).lower() or ' '))
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+class Budget(object):
+    """
+    Tracks transferred bytes against the known total, enforcing an optional rate limit (by
+    delaying the start of transfers) and an optional quota.
+    """
+    def __init__(self, total, rate=None, quota=None, clock=time.monotonic):
+        """
+        :param total: Total number of bytes to transfer.
+        :param rate: Maximal number of bytes per second or `None`.
+        :param quota: Maximal number of bytes to transfer or `None`.
+        """
+        self.total = total
+        self.rate = rate
+        self.quota = quota
+        self.done = 0
+        self.skipped = 0
+        self.reserved = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.start = clock()
+
+    def check(self, size):
+        """
+        :raises QuotaExceeded: if transferring `size` more bytes would exceed the quota.
+        """
+        if self.quota is not None and self.done + size > self.quota:
+            raise QuotaExceeded('quota of {0} exhausted'.format(format_size(self.quota)))
+
+    def skip(self, size):
+        """
+        Account for `size` bytes which did not have to be transferred.
+        """
+        self.skipped += size
+
+    def reserve(self, size):
+        """
+        Reserve `size` bytes of the rate limit for a transfer which is about to start.
+
+        The caller - not the code handling completed transfers - is expected to wait, e.g.
+        with `asyncio.sleep`, so concurrent transfers are spread out to keep the rate.
+
+        :return: Number of seconds to wait before starting the transfer.
+        """
+        if not self.rate:
+            return 0
+        with self._lock:
+            ahead = self.reserved / self.rate - (self._clock() - self.start)
+            self.reserved += size
+        return max(ahead, 0)
+
+    def consume(self, size):
+        """
+        Account for `size` transferred bytes.
+        """
+        with self._lock:
+            self.done += size
+
+    @property
+    def remaining(self):
+        return max(self.total - self.done - self.skipped, 0)
+
+    def eta(self):
+        """
+        :return: Estimated number of seconds until all bytes are transferred, or `None`.
+        """
+        elapsed = self._clock() - self.start
+        if not self.done or not elapsed:
+            return None
+        return self.remaining / (self.done / elapsed)
+
+    def __str__(self):
+        eta = self.eta()
+        return '{0} of {1} transferred, ETA {2}'.format(
+            format_size(self.done),
+            format_size(self.total - self.skipped),
+            '?' if eta is None else time.strftime('%H:%M:%S', time.gmtime(eta)))
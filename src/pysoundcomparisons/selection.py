@@ -0,0 +1,171 @@
+"""
+Resolution of the items passed to `downloadSoundFiles` - UIDs, study names, FilePathParts,
+FilePathParts plus word, full sound file names and LanguageIx - into the bitstreams to
+download.
+"""
+import re
+from collections import OrderedDict, namedtuple
+
+from clldutils.misc import format_size
+
+from pysoundcomparisons.mediacatalog import SoundfileNames
+
+__all__ = ['Selection', 'Download']
+
+LANGUAGE_IX = re.compile(r'^\d{11,}$')
+
+Download = namedtuple('Download', ['obj', 'bitstream', 'folder'])
+
+
+class Selection(object):
+    """
+    A plan of sound files to download, created by classifying all arguments in one pass.
+    """
+    def __init__(self, catalog, studies=None):
+        """
+        :param catalog: `MediaCatalog` instance.
+        :param studies: Names of all studies - if `None`, study names and LanguageIx are not \
+        recognized.
+        """
+        self.catalog = catalog
+        self.all_studies = studies
+        self.extensions = []
+        self.uids = []
+        self.names = []
+        self.prefixes = []
+        self.studies = []
+        self.language_ixs = []
+        self.warnings = []
+        self.keys = None
+
+    @classmethod
+    def from_args(cls, items, catalog, db=None):
+        """
+        :param items: The items passed on the command line.
+        :param db: `pysoundcomparisons.db.DB` instance, needed to resolve study names and \
+        LanguageIx.
+        """
+        res = cls(
+            catalog,
+            studies=[r['Name'] for r in db("select Name from Studies")] if db is not None else None)
+        res.classify(items)
+        res.resolve(db=db)
+        return res
+
+    def classify(self, items):
+        studies = set(self.all_studies or [])
+        for item in OrderedDict.fromkeys(items):
+            if item == 'db_needed':
+                continue
+            elif item in self.catalog.mimetypes:
+                self.extensions.append(item)
+            elif item in self.catalog.objects:
+                self.uids.append(item)
+            elif item in studies:
+                self.studies.append(item)
+            elif self.all_studies is not None and LANGUAGE_IX.match(item):
+                self.language_ixs.append(item)
+            elif item in self.catalog._name_uid_map:
+                self.names.append(item)
+            elif item.rpartition('.')[0] in self.catalog._name_uid_map:
+                self.names.append(item.rpartition('.')[0])
+            else:
+                self.prefixes.append(item)
+
+    def _query_file_path_parts(self, db):
+        """
+        Resolve study names and LanguageIx to FilePathParts with a single query.
+        """
+        selects = []
+        for study in (self.all_studies if self.language_ixs else self.studies):
+            sql = "SELECT DISTINCT FilePathPart AS f, LanguageIx AS i, '{0}' AS s " \
+                  "FROM Languages_{0}".format(study)
+            if study not in self.studies:
+                sql += " WHERE LanguageIx IN ({0})".format(','.join(self.language_ixs))
+            selects.append(sql)
+        return list(db(" UNION ".join(selects)))
+
+    def resolve(self, db=None):
+        keys = []
+        keys.extend(self.catalog.objects[uid].metadata['name'] for uid in self.uids)
+        keys.extend(self.names)
+        for prefix in self.prefixes:
+            keys.extend(self.catalog.get_soundfilenames(prefix))
+
+        if db is not None and (self.studies or self.language_ixs):
+            found = set()
+            for row in self._query_file_path_parts(db):
+                if row['s'] in self.studies or str(row['i']) in self.language_ixs:
+                    new_keys = self.catalog.get_soundfilenames(row['f'])
+                    if not new_keys:
+                        self.warnings.append(
+                            'Nothing found for {0} in catalog - will be ignored'.format(row['f']))
+                    keys.extend(new_keys)
+                    found.add(str(row['i']))
+            for ix in self.language_ixs:
+                if ix not in found:
+                    self.warnings.append('LanguageIx {0} unknown - will be ignored'.format(ix))
+
+        self.keys = SoundfileNames.parse(OrderedDict.fromkeys(keys))
+        for name in self.keys.invalid:
+            self.warnings.append('Path for {0} is not valid - will be skipped'.format(name))
+
+    @property
+    def mimetypes(self):
+        return [self.catalog.mimetypes[ext] for ext in self.extensions or self.catalog.mimetypes]
+
+    def downloads(self, transcode=False):
+        """
+        :param transcode: If `True`, objects lacking all requested formats do not fall back to \
+        their first bitstream - the formats are supposed to be transcoded (see `transcodes`).
+        :return: `list` of `Download`s, ordered by folder and name.
+        """
+        mimetypes = self.mimetypes
+        res = []
+        for folder, names in self.keys.by_variety().items():
+            for name in names:
+                obj = self.catalog[name]
+                if transcode:
+                    bitstreams = [bs for bs in obj.bitstreams if bs.mimetype in mimetypes]
+                else:
+                    bitstreams = self.catalog.matching_bitstreams(obj, mimetypes=mimetypes)
+                for bs in bitstreams:
+                    res.append(Download(obj, bs, folder))
+        return res
+
+    def transcodes(self, source_preference=('wav', 'ogg', 'mp3')):
+        """
+        :return: `list` of (`Download` of the source bitstream, target extension) pairs for \
+        the requested formats which are not available for a selected object.
+        """
+        res = []
+        if not self.extensions:
+            return res
+        preference = [self.catalog.mimetypes[ext] for ext in source_preference]
+        for folder, names in self.keys.by_variety().items():
+            for name in names:
+                obj = self.catalog[name]
+                available = {bs.mimetype: bs for bs in obj.bitstreams}
+                missing = [
+                    ext for ext in self.extensions
+                    if self.catalog.mimetypes[ext] not in available]
+                if missing and available:
+                    source = sorted(
+                        obj.bitstreams,
+                        key=lambda bs: preference.index(bs.mimetype)
+                        if bs.mimetype in preference else len(preference))[0]
+                    for ext in missing:
+                        res.append((Download(obj, source, folder), ext))
+        return res
+
+    def estimate(self):
+        """
+        :return: pair (number of files, total size in bytes) of the selected bitstreams.
+        """
+        downloads = self.downloads()
+        return len(downloads), sum(d.bitstream.size for d in downloads)
+
+    def __str__(self):
+        n, size = self.estimate()
+        return '{0} sound files selected - {1} files, {2}'.format(
+            len(self.keys), n, format_size(size))
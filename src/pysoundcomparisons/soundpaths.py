@@ -0,0 +1,260 @@
+"""
+Computation of the valid sound file paths - i.e. FilePathPart/FilePathPart+WordIdentifier with
+optional suffixes for alternative lexemes and pronunciations - from the database or from the
+exported raw/*.csv files, and a compact binary index of these paths.
+"""
+import os
+import csv
+import mmap
+import heapq
+import struct
+import tempfile
+import itertools
+from array import array
+from collections import defaultdict
+
+from pysoundcomparisons.profiling import timer, count
+
+__all__ = [
+    'EXCLUDED_STUDIES', 'alternative_suffix', 'iter_paths_db', 'iter_paths_raw', 'external_sort',
+    'write_paths', 'SoundPathIndex']
+
+EXCLUDED_STUDIES = {'Europe'}
+
+SQL_WORDS = """\
+SELECT L.FilePathPart AS f, W.SoundFileWordIdentifierText AS w
+FROM Words AS W, Languages AS L
+WHERE L.study = %s AND W.study = L.study"""
+
+SQL_TRANSCRIPTIONS = """\
+SELECT
+    L.FilePathPart AS f,
+    W.SoundFileWordIdentifierText AS w,
+    T.AlternativeLexemIx AS lex,
+    T.AlternativePhoneticRealisationIx AS pron
+FROM Transcriptions AS T, Words AS W, Languages AS L
+WHERE
+    L.study = %s AND W.study = L.study AND T.study NOT IN ({0}) AND
+    L.LanguageIx = T.LanguageIx AND
+    W.IxElicitation = T.IxElicitation AND
+    W.IxMorphologicalInstance = T.IxMorphologicalInstance"""
+
+
+def alternative_suffix(lex, pron):
+    """
+    :return: The suffix of sound file names for alternative lexemes and pronunciations.
+    """
+    lex, pron = int(lex or 0), int(pron or 0)
+    if lex > 1 and pron == 0:
+        return '_lex{0}'.format(lex)
+    if lex == 0 and pron > 1:
+        return '_pron{0}'.format(pron)
+    if lex > 1 and pron > 1:
+        return '_lex{0}_pron{1}'.format(lex, pron)
+    return ''
+
+
+def _path(fpp, word, suffix=''):
+    return '{0}/{0}{1}{2}'.format(fpp, word, suffix)
+
+
+def iter_paths_db(db, studies):
+    """
+    Compute valid sound file paths with two streamed queries per study.
+
+    :param db: `pysoundcomparisons.db.DB` instance.
+    :param studies: Names of the studies.
+    :return: Generator of paths - possibly with duplicates.
+    """
+    excluded = ','.join("'{0}'".format(s) for s in sorted(EXCLUDED_STUDIES))
+    for study in studies:
+        if study in EXCLUDED_STUDIES:
+            continue
+        for row in db.stream(SQL_WORDS, (study,)):
+            yield _path(row['f'], row['w'])
+        for row in db.stream(SQL_TRANSCRIPTIONS.format(excluded), (study,)):
+            yield _path(row['f'], row['w'], alternative_suffix(row['lex'], row['pron']))
+
+
+def _read_csv(path):
+    with path.open(encoding='utf8', newline='') as fp:
+        for row in csv.DictReader(fp):
+            yield row
+
+
+def iter_paths_raw(raw):
+    """
+    Compute valid sound file paths from the CSV exports of the database tables Languages, Words
+    and Transcriptions in directory `raw`.
+
+    Only languages and words are held in memory, transcriptions are streamed.
+
+    :return: Generator of paths - possibly with duplicates.
+    """
+    languages = defaultdict(list)
+    for row in _read_csv(raw / 'Languages.csv'):
+        if row['study'] not in EXCLUDED_STUDIES:
+            languages[row['LanguageIx']].append((row['study'], row['FilePathPart']))
+    words = defaultdict(list)
+    for row in _read_csv(raw / 'Words.csv'):
+        if row['study'] not in EXCLUDED_STUDIES:
+            words[row['study']].append(row['SoundFileWordIdentifierText'])
+            words[row['study'], row['IxElicitation'], row['IxMorphologicalInstance']].append(
+                row['SoundFileWordIdentifierText'])
+
+    for langs in languages.values():
+        for study, fpp in langs:
+            for word in words.get(study, []):
+                yield _path(fpp, word)
+
+    for row in _read_csv(raw / 'Transcriptions.csv'):
+        if row['study'] in EXCLUDED_STUDIES:
+            continue
+        suffix = alternative_suffix(
+            row['AlternativeLexemIx'], row['AlternativePhoneticRealisationIx'])
+        for study, fpp in languages.get(row['LanguageIx'], []):
+            for word in words.get(
+                    (study, row['IxElicitation'], row['IxMorphologicalInstance']), []):
+                yield _path(fpp, word, suffix)
+
+
+def _sort_key(s):
+    return s.lower(), s
+
+
+def external_sort(items, key=_sort_key, chunk_size=200000, tmpdir=None):
+    """
+    Sort strings without holding them all in memory: Chunks of `chunk_size` items are sorted
+    and written to temporary files, which are then merged.
+
+    :param key: Sort key - must define a total order on the strings, since duplicates are \
+    only detected when adjacent.
+    :return: Generator of the sorted, unique items.
+    """
+    items = iter(items)
+    files = []
+    try:
+        while True:
+            chunk = sorted(set(itertools.islice(items, chunk_size)), key=key)
+            if not chunk:
+                break
+            fp = tempfile.TemporaryFile(mode='w+', encoding='utf8', dir=tmpdir)
+            fp.writelines(s + '\n' for s in chunk)
+            fp.seek(0)
+            files.append(fp)
+        count('sort chunks', len(files))
+        prev = None
+        for s in heapq.merge(*[(line[:-1] for line in fp) for fp in files], key=key):
+            if s != prev:
+                yield s
+                prev = s
+    finally:
+        for fp in files:
+            fp.close()
+
+
+def write_paths(path, items):
+    """
+    Write sorted paths to a text file - one path per line, without trailing newline.
+
+    :return: Number of paths written.
+    """
+    n = 0
+    with timer('file write'), path.open('w', encoding='utf8') as fp:
+        for i, item in enumerate(items):
+            fp.write(item if i == 0 else '\n' + item)
+            n += 1
+    return n
+
+
+class SoundPathIndex(object):
+    """
+    A memory-mapped, sorted set of strings, stored as
+
+    - magic bytes `SCVP`,
+    - number of strings N as unsigned 32-bit int,
+    - N + 1 offsets into the data section as unsigned 32-bit ints,
+    - the UTF-8 encoded strings, sorted bytewise.
+
+    Membership tests are binary searches on the mapped file.
+    """
+    MAGIC = b'SCVP'
+
+    def __init__(self, path):
+        self.path = path
+        self._fp = path.open('rb')
+        self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:4] != self.MAGIC:
+            self.close()
+            raise ValueError('{0} is not a sound path index'.format(path))
+        self._n = struct.unpack_from('<I', self._mm, 4)[0]
+        self._data = 8 + 4 * (self._n + 1)
+
+    def close(self):
+        self._mm.close()
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._n
+
+    def _get(self, i):
+        start, end = struct.unpack_from('<II', self._mm, 8 + 4 * i)
+        return self._mm[self._data + start:self._data + end]
+
+    def __getitem__(self, i):
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return self._get(i).decode('utf8')
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self._get(i).decode('utf8')
+
+    def __contains__(self, item):
+        item = item.encode('utf8')
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._get(mid) < item:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo < self._n and self._get(lo) == item
+
+    @classmethod
+    def write(cls, path, items, **kw):
+        """
+        Write an index of `items` - which need not be sorted or unique - to `path`.
+
+        :param kw: Keyword arguments passed into `external_sort`.
+        """
+        offsets = array('I', [0])
+        with timer('file write'), tempfile.TemporaryFile(dir=str(path.parent)) as data:
+            # Sorting by code point is the same as sorting the UTF-8 encoded bytes.
+            for item in external_sort(items, key=None, **kw):
+                item = item.encode('utf8')
+                data.write(item)
+                offsets.append(offsets[-1] + len(item))
+            data.seek(0)
+            tmp = path.parent / '.{0}.{1}.tmp'.format(path.name, os.getpid())
+            try:
+                with tmp.open('wb') as fp:
+                    fp.write(cls.MAGIC)
+                    fp.write(struct.pack('<I', len(offsets) - 1))
+                    fp.write(struct.pack('<{0}I'.format(len(offsets)), *offsets))
+                    while True:
+                        chunk = data.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        fp.write(chunk)
+                os.replace(str(tmp), str(path))
+            finally:
+                if tmp.exists():
+                    tmp.unlink()
+        return len(offsets) - 1
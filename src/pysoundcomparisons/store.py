@@ -0,0 +1,131 @@
+"""
+A content-addressed local store for sound file bitstreams.
+
+Bitstreams are stored once per md5 checksum - as reported by the catalog - in
+STORE/<md5[:2]>/<md5>, and linked into the VARIETY/BITSTREAM_ID layout of a mirror, so
+byte-identical sound files are downloaded and stored only once.
+"""
+import os
+import uuid
+from collections import OrderedDict
+
+from pysoundcomparisons.mirror import file_md5
+from pysoundcomparisons.profiling import timer, count
+
+__all__ = ['Store', 'dedup_stats', 'link']
+
+
+def link(path, target):
+    """
+    Link file `path` to `target`, replacing an existing file.
+
+    Hardlinks are used if possible, symlinks if `path` is on a different file system.
+    """
+    if target.exists():
+        if os.path.samefile(str(path), str(target)):
+            return target
+        target.unlink()
+    elif target.is_symlink():  # A dangling symlink.
+        target.unlink()
+    with timer('file write'):
+        try:
+            os.link(str(path), str(target))
+        except OSError:
+            os.symlink(str(path.resolve()), str(target))
+    return target
+
+
+class Store(object):
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, checksum):
+        return self.root / checksum[:2] / checksum
+
+    def __contains__(self, checksum):
+        return self.path(checksum).exists()
+
+    def __iter__(self):
+        """
+        :return: Generator of (checksum, path) pairs of all objects in the store.
+        """
+        if self.root.exists():
+            for d in sorted(self.root.iterdir()):
+                if d.is_dir() and len(d.name) == 2:
+                    for p in sorted(d.iterdir()):
+                        if p.name.startswith(d.name) and len(p.name) == 32:
+                            yield p.name, p
+
+    def fetch(self, checksum, download):
+        """
+        Make sure the object with md5 `checksum` is in the store.
+
+        :param download: callable, accepting a file path as sole argument, to download the \
+        content if it is not yet in the store. If it returns a pair (size, md5) - as \
+        `Client.fetch` does, which hashes the content while downloading - the file is not read \
+        again to compute the checksum.
+        :return: path of the object.
+        :raises ValueError: if the md5 of the downloaded content does not match `checksum`.
+        """
+        path = self.path(checksum)
+        if path.exists():
+            count('store hits')
+            return path
+        count('store misses')
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.parent / '.{0}.{1}'.format(checksum, uuid.uuid4().hex)
+        try:
+            res = download(str(tmp))
+            if (res[1] if isinstance(res, tuple) else file_md5(tmp)) != checksum:
+                raise ValueError('md5 mismatch of downloaded content for {0}'.format(checksum))
+            os.replace(str(tmp), str(path))
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return path
+
+    def link(self, checksum, target):
+        """
+        Link the object with md5 `checksum` to path `target`, replacing an existing file.
+
+        Hardlinks are used if possible, symlinks if the store is on a different file system.
+        """
+        return link(self.path(checksum), target)
+
+    def stats(self):
+        """
+        :return: `OrderedDict` with number and total size of objects in the store, and the \
+        number and size of additional hardlinks to these objects.
+        """
+        res = OrderedDict([('objects', 0), ('bytes', 0), ('links', 0), ('bytes_linked', 0)])
+        for _, p in self:
+            stat = p.stat()
+            res['objects'] += 1
+            res['bytes'] += stat.st_size
+            # One link is the store entry itself, the first mirror link counts as the copy
+            # which would be stored anyway.
+            if stat.st_nlink > 2:
+                res['links'] += stat.st_nlink - 2
+                res['bytes_linked'] += (stat.st_nlink - 2) * stat.st_size
+        return res
+
+
+def dedup_stats(catalog, mimetypes=None):
+    """
+    :param catalog: `MediaCatalog` instance.
+    :return: `OrderedDict` with number and total size of all bitstreams in the catalog and of \
+    the unique ones (by md5), i.e. those a content-addressed store would hold.
+    """
+    sizes = {}
+    res = OrderedDict([('bitstreams', 0), ('bytes', 0)])
+    for obj in catalog:
+        for bs in obj.bitstreams:
+            if (not mimetypes) or bs.mimetype in mimetypes:
+                res['bitstreams'] += 1
+                res['bytes'] += bs.size
+                sizes[bs.md5] = bs.size
+    res['unique_bitstreams'] = len(sizes)
+    res['unique_bytes'] = sum(sizes.values())
+    res['bytes_saved'] = res['bytes'] - res['unique_bytes']
+    return res
@@ -0,0 +1,91 @@
+"""
+Streaming I/O computing md5 checksums in the same pass as a transfer, so content is read from -
+or written to - disk only once:
+
+- `write_hashed` writes downloaded chunks to a temporary file, verifying the checksum before
+  the file is renamed to its target,
+- `HashingReader` hashes a file while `requests` reads it for an upload, and
+- `read_hashed` reads a file once, to compare its checksum before uploading the content.
+"""
+import os
+import uuid
+import hashlib
+
+from pysoundcomparisons.profiling import timer, count
+
+__all__ = ['ChecksumMismatch', 'HashingReader', 'read_hashed', 'write_hashed', 'BUFSIZE']
+
+BUFSIZE = 1024 * 1024
+
+
+class ChecksumMismatch(ValueError):
+    pass
+
+
+class HashingReader(object):
+    """
+    A wrapper for a binary file object, updating an md5 checksum with the content read.
+
+    Passed as `data` to `requests`, the file is uploaded with a Content-Length header, read in
+    chunks.
+    """
+    def __init__(self, fp):
+        self.fp = fp
+        self.checksum = hashlib.md5()
+        self.size = 0
+
+    def __len__(self):
+        return os.fstat(self.fp.fileno()).st_size - self.fp.tell()
+
+    def read(self, size=-1):
+        chunk = self.fp.read(size)
+        self.checksum.update(chunk)
+        self.size += len(chunk)
+        return chunk
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(BUFSIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    def hexdigest(self):
+        return self.checksum.hexdigest()
+
+
+def read_hashed(path):
+    """
+    :return: pair (content of the file as `bytes`, md5 checksum).
+    """
+    with timer('file read'):
+        data = path.read_bytes()
+    count('md5 bytes', len(data))
+    with timer('md5'):
+        return data, hashlib.md5(data).hexdigest()
+
+
+def write_hashed(chunks, path, md5=None):
+    """
+    Write chunks of bytes to a temporary file next to `path`, computing the md5 checksum on the
+    fly; the file is renamed to `path` when complete - and, if `md5` is given, only if the
+    checksum matches.
+
+    :return: pair (number of bytes, md5 checksum).
+    :raises ChecksumMismatch: if the checksum does not match `md5`.
+    """
+    checksum, size = hashlib.md5(), 0
+    tmp = path.parent / '.{0}.{1}.part'.format(path.name, uuid.uuid4().hex)
+    try:
+        with tmp.open('wb') as fp:
+            for chunk in chunks:
+                checksum.update(chunk)
+                fp.write(chunk)
+                size += len(chunk)
+        if md5 and checksum.hexdigest() != md5:
+            raise ChecksumMismatch('md5 mismatch of {0}'.format(path.name))
+        os.replace(str(tmp), str(path))
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return size, checksum.hexdigest()
@@ -10,15 +10,14 @@ and exports all tables to {repo_root}/raw/{table}.csv
 
 import sys
 import os
-import requests
 import argparse
 import tempfile
 
-from requests.auth import HTTPBasicAuth
 from fabric.api import local
 from pycdstar.api import Cdstar
 from pathlib import Path
 from pysoundcomparisons.db import DB
+from pysoundcomparisons.httpclient import Client
 from csvw.dsv import UnicodeWriter
 from collections import OrderedDict
 
@@ -41,16 +40,16 @@ def main():
     args = parser.parse_args()
 
     # download lastest Sound-Comparisons database dump as gz file
-    cdstar = Cdstar(user=CDSTAR_USER, password=CDSTAR_PW, service_url=CDSTAR_URL)
+    client = Client(auth=(CDSTAR_USER, CDSTAR_PW))
+    cdstar = client.install(Cdstar(user=CDSTAR_USER, password=CDSTAR_PW, service_url=CDSTAR_URL))
     search_res = cdstar.search(DB_DUMP_UID)
     if search_res.hitcount is 0:
         raise ValueError('Nothing found.')
     if len(search_res[0].resource.bitstreams) == 0:
         raise ValueError('No bitstream found.')
     latest_bs = search_res[0].resource.bitstreams[-1]
-    with open(dump_file, 'wb') as f:
-        f.write(requests.get("%s/bitstreams/%s/%s" % (CDSTAR_URL, DB_DUMP_UID, latest_bs.id),
-                        auth=HTTPBasicAuth(CDSTAR_USER, CDSTAR_PW)).content)
+    client.fetch(
+        "%s/bitstreams/%s/%s" % (CDSTAR_URL, DB_DUMP_UID, latest_bs.id), Path(dump_file))
 
     # load data into MariaDB
     db = DB(host=args.sc_host, db=args.db_name, user=args.db_user, password=args.db_password)
@@ -0,0 +1,93 @@
+"""
+Transcoding of sound files into formats which are not available in the catalog, with a
+persistent cache of the results - keyed by md5 of the source and target format - so repeated
+builds never transcode the same content twice.
+
+Transcoding requires ffmpeg (https://www.ffmpeg.org).
+"""
+import os
+import uuid
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from pysoundcomparisons.audiotags import ffmpeg
+from pysoundcomparisons.profiling import timer, count
+
+__all__ = ['CODECS', 'SOURCE_PREFERENCE', 'transcode', 'TranscodeCache']
+
+# ffmpeg encoder options per target format:
+CODECS = {
+    'mp3': ['-codec:a', 'libmp3lame', '-q:a', '4'],
+    'ogg': ['-codec:a', 'libvorbis', '-q:a', '4'],
+    'wav': ['-codec:a', 'pcm_s16le'],
+}
+
+# Formats to transcode from, best first - lossless sources avoid generation loss:
+SOURCE_PREFERENCE = ['wav', 'ogg', 'mp3']
+
+
+def transcode(src, dest, fmt):
+    """
+    Transcode sound file `src` into format `fmt`, writing the result to `dest`.
+    """
+    subprocess.run(
+        [ffmpeg(), '-loglevel', 'error', '-y', '-i', str(src), '-vn', *CODECS[fmt],
+         '-f', fmt, str(dest)],
+        check=True)
+    return dest
+
+
+class TranscodeCache(object):
+    """
+    Transcoded sound files, stored as ROOT/<fmt>/<md5[:2]>/<md5>.<fmt>, where md5 is the checksum
+    of the source file.
+    """
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, checksum, fmt):
+        return self.root / fmt / checksum[:2] / '{0}.{1}'.format(checksum, fmt)
+
+    def __contains__(self, key):
+        return self.path(*key).exists()
+
+    def transcode_all(self, jobs, workers=4, log=None):
+        """
+        Transcode source files in parallel processes, skipping those in the cache.
+
+        :param jobs: Iterable of triples (source path, source md5, target format).
+        :return: `dict` mapping (source md5, target format) pairs to paths in the cache - for \
+        all jobs which did not fail.
+        """
+        res, todo = {}, {}
+        for src, checksum, fmt in jobs:
+            if (checksum, fmt) in res or (checksum, fmt) in todo:
+                continue
+            if (checksum, fmt) in self:
+                count('transcode cache hits')
+                res[checksum, fmt] = self.path(checksum, fmt)
+            else:
+                path = self.path(checksum, fmt)
+                if not path.parent.exists():
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                todo[checksum, fmt] = (
+                    src, path.parent / '.{0}.{1}'.format(uuid.uuid4().hex, fmt), fmt)
+
+        if todo:
+            count('transcodes', len(todo))
+            with timer('transcode'), ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {key: pool.submit(transcode, *args) for key, args in todo.items()}
+                for key, future in futures.items():
+                    tmp = todo[key][1]
+                    try:
+                        future.result()
+                        os.replace(str(tmp), str(self.path(*key)))
+                        res[key] = self.path(*key)
+                    except Exception as e:
+                        if log:
+                            log.warning('transcoding {0} to {1} failed: {2}'.format(
+                                todo[key][0], key[1], e))
+                    finally:
+                        if tmp.exists():
+                            tmp.unlink()
+        return res
@@ -0,0 +1,69 @@
+"""
+A combined bundle of the translations of all languages of the site: a shared table of the
+translation keys and, per language, an array of the values in the order of the keys - with
+`null` for keys a language does not translate.
+
+The bundle is stored as minified JSON in translations/translations.bundle.json, with gzip and
+brotli compressed siblings.
+"""
+import json
+from collections import OrderedDict
+
+from pysoundcomparisons.precompress import write_precompressed
+
+__all__ = ['BUNDLE', 'read_translations', 'make_bundle', 'write_bundle', 'read_bundle', 'i18n']
+
+BUNDLE = 'translations.bundle.json'
+
+
+def read_translations(d):
+    """
+    :param d: The translations directory, containing `<BrowserMatch>/translations.json`.
+    :return: `OrderedDict` mapping BrowserMatch to the translations of the language.
+    """
+    res = OrderedDict()
+    for p in sorted(d.glob('*/translations.json')):
+        with p.open(encoding='utf8') as fp:
+            res[p.parent.name] = json.load(fp, object_pairs_hook=OrderedDict)
+    return res
+
+
+def make_bundle(translations):
+    """
+    :param translations: `dict` mapping BrowserMatch to `dict`s of translations.
+    :return: The bundle as `OrderedDict` with keys `keys` and `languages`.
+    """
+    keys = sorted(set(k for tr in translations.values() for k in tr))
+    return OrderedDict([
+        ('keys', keys),
+        ('languages', OrderedDict(
+            (lang, [tr.get(k) for k in keys]) for lang, tr in sorted(translations.items()))),
+    ])
+
+
+def write_bundle(path, bundle):
+    """
+    :return: `dict` mapping the paths written to their sizes in bytes.
+    """
+    return write_precompressed(
+        path, json.dumps(bundle, ensure_ascii=False, separators=(',', ':')))
+
+
+def read_bundle(path):
+    with path.open(encoding='utf8') as fp:
+        return json.load(fp)
+
+
+def i18n(bundle, languages=None):
+    """
+    Expand a bundle into the i18next resources as served by `/translations?lng=...`, i.e.
+    `{BrowserMatch: {"translation": {key: value}}}`.
+
+    :param languages: BrowserMatch of the languages to include - all if `None`.
+    :raises KeyError: if a language is not in the bundle.
+    """
+    keys = bundle['keys']
+    return OrderedDict(
+        (lang, {'translation': OrderedDict(
+            (k, v) for k, v in zip(keys, bundle['languages'][lang]) if v is not None)})
+        for lang in (languages or bundle['languages']))
@@ -0,0 +1,147 @@
+"""
+Incremental upload of sound files from a staging directory like soundfiles/upload.
+
+Processed files are recorded in a journal - keyed by file name, size and modification time -
+and moved to an archive folder, so repeated runs only hash and upload new or changed files.
+"""
+import json
+import time
+import shutil
+from itertools import groupby
+from collections import OrderedDict
+
+from pysoundcomparisons.mediacatalog import SoundfileName
+from pysoundcomparisons.profiling import timer
+
+__all__ = ['Journal', 'sync_upload', 'watch']
+
+JOURNAL = '.journal.jsonl'
+ARCHIVE = 'archive'
+
+
+def _key(path, stat=None):
+    stat = stat or path.stat()
+    return path.name, stat.st_size, stat.st_mtime_ns
+
+
+class Journal(object):
+    """
+    An append-only log of processed files, stored as JSON lines.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries = OrderedDict()
+        if path.exists():
+            with path.open(encoding='utf8') as fp:
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:  # A line truncated by a crash.
+                        continue
+                    self.entries[(entry['name'], entry['size'], entry['mtime'])] = entry
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, key, **kw):
+        entry = OrderedDict([('name', key[0]), ('size', key[1]), ('mtime', key[2])])
+        entry['time'] = int(time.time())
+        entry.update(kw)
+        self.entries[key] = entry
+        with timer('file write'), self.path.open('a', encoding='utf8') as fp:
+            fp.write(json.dumps(entry) + '\n')
+
+
+def _pending(d, journal, snapshot=None):
+    """
+    :return: `list` of (SoundfileName, [(path, key)]) pairs for groups of files in `d` with at \
+    least one file not yet in the journal.
+    """
+    files = []
+    for p in d.iterdir():
+        if p.is_file() and not p.name.startswith('.'):
+            key = _key(p)
+            if snapshot is not None and snapshot.get(p.name) != key:
+                # The file is new or still growing - wait for the next poll.
+                continue
+            files.append((p, key))
+
+    res = []
+    for stem, group in groupby(sorted(files, key=lambda i: i[0].name), lambda i: i[0].stem):
+        group = list(group)
+        try:
+            sfn = SoundfileName(stem)
+        except ValueError:
+            continue
+        if any(key not in journal for _, key in group):
+            res.append((sfn, group))
+    return res
+
+
+def sync_upload(catalog, d, journal=None, archive=None, batch=50, snapshot=None, log=None):
+    """
+    Upload new or changed sound files from directory `d`.
+
+    :param catalog: `MediaCatalog` instance.
+    :param journal: `Journal` instance - defaults to the journal in `d/.journal.jsonl`.
+    :param archive: Directory to move uploaded files to or `None`, to leave them in place.
+    :param batch: Number of uploaded sound files after which the catalog is saved.
+    :param snapshot: `dict` mapping file names to keys from a previous poll - if passed, only \
+    files which did not change since then are processed.
+    :return: Number of uploaded sound files (i.e. groups of files with the same name).
+    """
+    journal = journal or Journal(d / JOURNAL)
+    n = 0
+    for sfn, files in _pending(d, journal, snapshot=snapshot):
+        try:
+            catalog._upload(sfn, [p for p, _ in files])
+        except Exception as e:  # pragma: no cover
+            if log:
+                log.error('{0}: {1}'.format(sfn, e))
+            continue
+        n += 1
+        for p, key in files:
+            if archive:
+                target = archive / sfn.variety / p.name
+                if not target.parent.exists():
+                    target.parent.mkdir(parents=True)
+                shutil.move(str(p), str(target))
+            journal.add(key, sfn=str(sfn), archived=bool(archive))
+        if n % batch == 0:
+            catalog.save()
+    catalog.save()
+    return n
+
+
+def watch(catalog, d, interval=10, journal=None, archive=None, batch=50, log=None, polls=None):
+    """
+    Watch directory `d` by polling it every `interval` seconds, uploading sound files once their
+    size and modification time did not change between two polls.
+
+    :param polls: Number of polls, or `None` to run until interrupted.
+    """
+    journal = journal or Journal(d / JOURNAL)
+    snapshot, n, i = {}, 0, 0
+    try:
+        while polls is None or i < polls:
+            i += 1
+            if snapshot:
+                uploaded = sync_upload(
+                    catalog, d,
+                    journal=journal, archive=archive, batch=batch, snapshot=snapshot, log=log)
+                if uploaded and log:
+                    log.info('{0} sound files uploaded'.format(uploaded))
+                n += uploaded
+            snapshot = {
+                p.name: _key(p) for p in d.iterdir()
+                if p.is_file() and not p.name.startswith('.')}
+            if polls is None or i < polls:
+                time.sleep(interval)
+    except KeyboardInterrupt:  # pragma: no cover
+        pass
+    finally:
+        catalog.save()
+    return n
@@ -0,0 +1,152 @@
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+import pytest
+
+
+class CdstarServer(ThreadingMixIn, HTTPServer):
+    """
+    A local stand-in for the parts of the CDSTAR REST API used by pysoundcomparisons.
+
+    `objects` maps object UIDs to `dict`s with keys `metadata` and `bitstream` (as in CDSTAR's
+    JSON) - and optionally `last-modified`, the timestamp of a change of the metadata only -,
+    `content` maps (UID, bitstream ID) pairs to the bytes of the bitstreams.
+
+    To stand in for sc-host as well, `static` maps other paths to content. `failures` maps paths
+    to the number of requests answered with HTTP 503 before the path is served, `delay` sets
+    the seconds to wait before responding, and `max_active` records the maximal number of
+    requests handled concurrently.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), CdstarHandler)
+        self.objects = {}
+        self.content = {}
+        self.static = {}
+        self.requests = []
+        self.failures = {}
+        self.delay = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{0}'.format(self.server_address[1])
+
+    def add(self, uid, metadata, *bitstreams):
+        self.objects[uid] = dict(metadata=metadata, bitstream=list(bitstreams))
+
+
+def _range_gt(query):
+    if isinstance(query, dict):
+        for k, v in query.items():
+            if k == 'range':
+                return list(v.values())[0]['gt']
+            res = _range_gt(v)
+            if res is not None:
+                return res
+
+
+class CdstarHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, status=200, content_type='application/json'):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        try:
+            time.sleep(self.server.delay)
+            self._get()
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def _get(self):
+        url = urlparse(self.path)
+        self.server.requests.append(('GET', url.path))
+        with self.server.lock:
+            if self.server.failures.get(url.path):
+                self.server.failures[url.path] -= 1
+                return self._send({}, status=503)
+        if self.path in self.server.static:
+            return self._send(self.server.static[self.path], content_type='text/html')
+        comps = url.path.strip('/').split('/')
+        objects = self.server.objects
+        if comps[0] == 'objects' and comps[1] in objects:
+            return self._send(dict(uid=comps[1], bitstream=objects[comps[1]]['bitstream']))
+        if comps[0] == 'metadata' and comps[1] in objects:
+            return self._send(objects[comps[1]]['metadata'])
+        if comps[0] == 'bitstreams' and tuple(comps[1:3]) in self.server.content:
+            return self._send(
+                self.server.content[tuple(comps[1:3])], content_type='application/octet-stream')
+        self._send({}, status=404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        self.server.requests.append(('POST', url.path))
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        comps = url.path.strip('/').split('/')
+        if comps[0] == 'bitstreams' and comps[1] in self.server.objects:
+            self.server.content[tuple(comps[1:3])] = body
+            self.server.objects[comps[1]]['bitstream'].append({
+                'bitstreamid': comps[2],
+                'checksum': hashlib.md5(body).hexdigest(),
+                'checksum-algorithm': 'MD5',
+                'filesize': len(body),
+                'content-type': self.headers['Content-Type'],
+                'created': 1,
+                'last-modified': int(time.time() * 1000)})
+            return self._send(dict(uid=comps[1], bitstreamid=comps[2]), status=201)
+        query = json.loads(body.decode('utf8'))
+        params = {k: int(v[0]) for k, v in parse_qs(url.query).items() if k in ['limit', 'offset']}
+        since = _range_gt(query) or 0
+        hits = [
+            dict(uid=uid, source=obj['metadata'], score=1, type='metadata')
+            for uid, obj in sorted(self.server.objects.items())
+            if max([bs['last-modified'] for bs in obj['bitstream']]
+                   + [obj.get('last-modified', 0)]) > since]
+        offset = params.get('offset', 0)
+        self._send(dict(
+            maxscore=1,
+            hitcount=len(hits),
+            hits=hits[offset:offset + params.get('limit', 15)]))
+
+    def do_DELETE(self):
+        url = urlparse(self.path)
+        self.server.requests.append(('DELETE', url.path))
+        comps = url.path.strip('/').split('/')
+        if comps[0] == 'bitstreams' and tuple(comps[1:3]) in self.server.content:
+            del self.server.content[tuple(comps[1:3])]
+            obj = self.server.objects[comps[1]]
+            obj['bitstream'] = [bs for bs in obj['bitstream'] if bs['bitstreamid'] != comps[2]]
+            self.send_response(204)
+            self.end_headers()
+            return
+        self._send({}, status=404)
+
+
+@pytest.fixture
+def cdstar_server():
+    server = CdstarServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,87 @@
+import wave
+from pathlib import Path
+
+import pytest
+import numpy as np
+
+from pysoundcomparisons.mediacatalog import MediaCatalog
+from pysoundcomparisons.audioindex import *
+from pysoundcomparisons.__main__ import main
+
+
+def _write_wav(path, samples, rate=8000, channels=1, sampwidth=2):
+    """
+    Write float samples in [-1, 1] as PCM wav file.
+    """
+    scaled = np.round(np.asarray(samples) * (2 ** (8 * sampwidth - 1) - 1)).astype(np.int64)
+    if sampwidth == 1:
+        frames = (scaled + 128).astype(np.uint8).tobytes()
+    else:
+        frames = b''.join(int(s).to_bytes(sampwidth, 'little', signed=True) for s in scaled)
+    with wave.open(str(path), 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(sampwidth)
+        w.setframerate(rate)
+        w.writeframes(frames)
+    return path
+
+
+@pytest.mark.parametrize('sampwidth', [1, 2, 3, 4])
+def test_decode(tmp_path, sampwidth):
+    samples = 0.5 * np.sin(np.linspace(0, 20 * np.pi, 1600))
+    decoded, rate, channels = decode(
+        _write_wav(tmp_path / 'x.wav', samples, channels=2, sampwidth=sampwidth))
+    assert (rate, channels, len(decoded)) == (8000, 2, 1600)
+    assert np.allclose(decoded, samples, atol=2 ** (2 - 8 * sampwidth))
+
+
+def test_features():
+    duration, rate, channels, peak, rms = features(
+        0.5 * np.sin(np.linspace(0, 200 * np.pi, 16000, endpoint=False)), 8000, 2)
+    assert (duration, rate, channels) == (1.0, 8000, 2)
+    assert peak == pytest.approx(0.5, abs=1e-3)
+    assert rms == pytest.approx(0.5 / np.sqrt(2), abs=1e-3)
+    assert features(np.array([]), 8000, 1) == (0.0, 8000, 1, 0.0, 0.0)
+
+
+def test_AudioIndex(tmp_path):
+    index = AudioIndex()
+    assert len(index) == 0 and 'a' * 32 not in index
+    assert index.update([
+        ('b' * 32, 1.5, 8000, 1, 0.5, 0.1), ('a' * 32, 0.1, 44100, 2, 1.0, 0.3)]) == 2
+    assert index.update([('b' * 32, 2.5, 8000, 1, 0.5, 0.1)]) == 1
+    assert len(index) == 2
+    assert list(index['md5']) == [b'a' * 32, b'b' * 32]
+    assert index.get('b' * 32)['duration'] == 2.5
+    assert index.get('c' * 32) is None
+    assert index.md5s(index['duration'] < 0.2) == {'a' * 32}
+
+    index.save(tmp_path / 'index.npz')
+    index = AudioIndex(tmp_path / 'index.npz')
+    assert index.get('a' * 32) == {
+        'md5': 'a' * 32, 'duration': pytest.approx(0.1), 'rate': 44100, 'channels': 2,
+        'peak': 1.0, 'rms': pytest.approx(0.3)}
+    assert not list(tmp_path.glob('.*.tmp'))
+
+
+def test_AudioIndex_index(tmp_path, mocker):
+    catalog = MediaCatalog(Path(__file__).parent / 'fixtures' / 'catalog.json')
+    wav = [bs for obj in catalog for bs in obj.bitstreams if bs.id.endswith('.wav')][0]
+    short = _write_wav(tmp_path / 'short.wav', np.zeros(800))
+    log = mocker.Mock()
+
+    index = AudioIndex(tmp_path / 'index.npz')
+    assert index.index(
+        [(short, wav.md5), (short, wav.md5), (tmp_path / 'x.wav', 'c' * 32)], log=log) == 1
+    assert log.warning.called
+    assert index.get(wav.md5)['duration'] == pytest.approx(0.1)
+    # Only new checksums are decoded:
+    assert index.index([(tmp_path / 'x.wav', wav.md5)]) == 0
+    assert [bs.id for _, bs in catalog.query_audio(index, index['peak'] == 0)] == [wav.id]
+    assert catalog.query_audio(index, index['duration'] > 1) == []
+
+
+def test_index_audio_no_directory(tmp_path):
+    with pytest.raises(SystemExit) as e:
+        main(['--repos', str(tmp_path), 'index_audio', str(tmp_path / 'missing')])
+    assert e.value.code == 1
@@ -0,0 +1,95 @@
+import struct
+import itertools
+
+import pytest
+
+from pysoundcomparisons.audiotags import *
+from pysoundcomparisons.audiotags import _ogg_crc, _ogg_pages, _paginate
+
+TAGS = dict(title='626_leaf', album='Oce_Van_Mal_Nth_WNth_MaluaBay_Marasup_Dl', artist='Ünïcode')
+
+
+def mp3(tag=b''):
+    return tag + b'\xff\xfb\x90\x00' + b'\x00' * 1000
+
+
+def wav(*chunks):
+    body = b'WAVE' + b''.join(chunks)
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def ogg(comment=b'\x03vorbis\x03\x00\x00\x00abc\x00\x00\x00\x00\x01'):
+    serial = 1234
+    return b''.join(itertools.chain(
+        _paginate([b'\x01vorbis' + b'\x00' * 23], serial, 0),
+        _paginate([comment, b'\x05vorbis' + b'x' * 600], serial, 1),
+        _paginate([b'a' * 300, b'b' * 10], serial, 2),
+        _paginate([b'c' * 100], serial, 3)))
+
+
+@pytest.mark.parametrize('fmt,data', [
+    ('mp3', mp3()),
+    ('mp3', mp3(b'ID3\x03\x00\x00\x00\x00\x00\x14TIT2\x00\x00\x00\x0a\x00\x00\x00old title')),
+    ('wav', wav(b'fmt \x04\x00\x00\x00abcd', b'data\x03\x00\x00\x00xyz\x00')),
+    ('ogg', ogg()),
+], ids=['mp3', 'mp3-id3', 'wav', 'ogg'])
+def test_retag(fmt, data):
+    res = retag(data, fmt, **TAGS)
+    assert read_tags(res, fmt) == TAGS
+    # Re-tagging is idempotent:
+    assert retag(res, fmt, **TAGS) == res
+    assert read_tags(retag(res, fmt, title='x'), fmt)['album'] == TAGS['album']
+
+
+def test_retag_mp3_keeps_frames():
+    tag = b'ID3\x04\x00\x00\x00\x00\x00\x19TCON\x00\x00\x00\x05\x00\x00\x00Folk'
+    res = retag(mp3(tag + b'\x00' * 10), 'mp3', title='t')
+    assert b'TCON' in res and res.endswith(mp3())
+
+
+def test_retag_wav_position():
+    res = retag(wav(b'fmt \x04\x00\x00\x00abcd', b'data\x03\x00\x00\x00xyz\x00'), 'wav', title='t')
+    assert res.index(b'LIST') < res.index(b'data')
+    assert struct.unpack('<I', res[4:8])[0] == len(res) - 8
+
+
+def test_retag_ogg_repaginate():
+    # A comment header which does not fit on the header page anymore:
+    res = retag(ogg(), 'ogg', title='x' * 70000)
+    assert read_tags(res, 'ogg')['title'] == 'x' * 70000
+    pages = _ogg_pages(res)
+    assert [p[4] for p in pages] == list(range(len(pages)))
+    for start, end, _, _, _, _, _ in pages:
+        page = bytearray(res[start:end])
+        crc = struct.unpack_from('<I', page, 22)[0]
+        struct.pack_into('<I', page, 22, 0)
+        assert _ogg_crc(page) == crc
+
+
+@pytest.mark.parametrize('fmt,data', [
+    ('mp3', b'not an mp3'),
+    ('wav', b'RIFF'),
+    ('ogg', b'OggS'),
+    ('ogg', b''.join(_paginate([b'\x01unknown'], 1, 0))),
+    ('flac', b''),
+])
+def test_retag_invalid(fmt, data):
+    with pytest.raises(ValueError):
+        retag(data, fmt, **TAGS)
+
+
+def test_retag_unknown_tag():
+    with pytest.raises(TypeError):
+        retag(mp3(), 'mp3', comment='x')
+
+
+def test_ffmpeg_retag(mocker, tmp_path):
+    mocker.patch('pysoundcomparisons.audiotags.shutil.which', mocker.Mock(return_value=None))
+    with pytest.raises(OSError):
+        ffmpeg_retag(tmp_path / 'a.mp3', tmp_path / 'b.mp3', title='x')
+
+    mocker.patch('pysoundcomparisons.audiotags.shutil.which', mocker.Mock(return_value='ffmpeg'))
+    run = mocker.patch('pysoundcomparisons.audiotags.subprocess.run')
+    ffmpeg_retag(tmp_path / 'a.mp3', tmp_path / 'b.mp3', title='x y', album="it's")
+    cmd = run.call_args[0][0]
+    assert "album=it's" in cmd and 'title=x y' in cmd
@@ -0,0 +1,125 @@
+import json
+import time
+import zipfile
+import hashlib
+import logging
+import argparse
+from pathlib import Path
+
+import pytest
+
+from pysoundcomparisons.mediacatalog import MediaCatalog
+from pysoundcomparisons.soundpaths import SoundPathIndex
+from pysoundcomparisons.api import SoundComparisons
+from pysoundcomparisons.commands.write_modified_soundfiles import modified_soundfiles, write_report
+from pysoundcomparisons.commands import download_soundfiles, _copy_save_url
+
+NAME = 'Oce_Van_Mal_Nth_WNth_MaluaBay_Marasup_Dl_626_leaf_lif'
+
+
+@pytest.fixture
+def catalog():
+    return MediaCatalog(Path(__file__).parent / 'fixtures' / 'catalog.json')
+
+
+def test_modified_soundfiles(catalog):
+    server = [
+        '43528088e68f21bcd318e3738342281e  /srv/sound/x/{0}.mp3\n'.format(NAME),
+        'f7f3bec0501d149acdff552c7f379825  /srv/sound/x/{0}.ogg\n'.format(NAME),
+        '00000000000000000000000000000000  /srv/sound/x/{0}.wav\n'.format(NAME),
+        '00000000000000000000000000000000  /srv/sound/x/x_123_new.wav\n',
+        '00000000000000000000000000000000  /srv/sound/x/x_123_invalid.wav\n',
+    ]
+    res = modified_soundfiles(catalog, server, {'x_123_new'})
+    assert res['new'] == ['x/x_123_new']
+    assert res['modified'] == {'EAEA0-0000-3A1B-047F-0': ['x/{0}.wav'.format(NAME)]}
+    assert not res['obsolete'] and not res['check']
+
+    assert modified_soundfiles(catalog, [], set())['obsolete'] == {
+        'EAEA0-0000-3A1B-047F-0': [NAME]}
+    assert modified_soundfiles(catalog, [], {NAME})['check'] == {
+        'EAEA0-0000-3A1B-047F-0': [NAME]}
+
+
+def test_modified_soundfiles_index(catalog, tmp_path):
+    SoundPathIndex.write(tmp_path / 'valid.idx', [NAME])
+    with SoundPathIndex(tmp_path / 'valid.idx') as valid:
+        assert modified_soundfiles(catalog, [], valid)['check'] == {
+            'EAEA0-0000-3A1B-047F-0': [NAME]}
+
+
+def test_write_report(tmp_path):
+    d = tmp_path / 'soundfiles'
+    d.mkdir()
+    api = SoundComparisons(tmp_path)
+    write_report(d, {'obsolete': {'u1': [NAME]}}, jsonl=True)
+    assert [r['uid'] for r in api.modified_soundfiles(['obsolete'])] == ['u1']
+
+    # A later report without jsonl must not be shadowed by the old modified.jsonl:
+    write_report(d, {'obsolete': {'u2': [NAME]}})
+    assert not d.joinpath('modified.jsonl').exists()
+    assert [r['uid'] for r in api.modified_soundfiles(['obsolete'])] == ['u2']
+
+
+@pytest.fixture
+def sound_repos(cdstar_server, tmp_path, monkeypatch):
+    objects = {}
+    for i in range(6):
+        uid, data = 'EAEA0-0000-0000-000{0}-0'.format(i), str(i).encode() * 1000
+        bs = {
+            'bitstreamid': 'Lg_Dl_10{0}_word_w.mp3'.format(i),
+            'checksum': hashlib.md5(data).hexdigest(),
+            'checksum-algorithm': 'MD5',
+            'content-type': 'audio/mpeg',
+            'filesize': len(data),
+            'created': 1530871113011,
+            'last-modified': 1530871113011}
+        cdstar_server.add(uid, {}, bs)
+        cdstar_server.content[uid, bs['bitstreamid']] = data
+        objects[uid] = dict(metadata=dict(name='Lg_Dl_10{0}_word_w'.format(i)), bitstreams=[bs])
+    repos = tmp_path / 'repos'
+    repos.joinpath('soundfiles').mkdir(parents=True)
+    with zipfile.ZipFile(str(repos / 'soundfiles' / 'catalog.json.zip'), 'w') as z:
+        z.writestr('catalog.json', json.dumps(objects))
+    monkeypatch.setenv('CDSTAR_URL', cdstar_server.url)
+    return repos
+
+
+def _download(repos, tmp_path, **kw):
+    args = argparse.Namespace(
+        args=['Lg_Dl'], repos=repos, log=logging.getLogger(__name__), workers=2, **kw)
+    download_soundfiles.run(args, out_path=tmp_path / 'sound')
+    return sorted(p.name for p in tmp_path.joinpath('sound', 'Lg_Dl').iterdir())
+
+
+def test_download_soundfiles_max_rate(sound_repos, cdstar_server, tmp_path):
+    cdstar_server.delay = 0.2
+    start = time.monotonic()
+    assert len(_download(sound_repos, tmp_path, max_rate='10K')) == 6
+    # 6000 bytes at 10KiB/sec - the last download may only start after 5000 / 10240 seconds:
+    assert time.monotonic() - start > 0.45
+    assert cdstar_server.max_active > 1, 'downloads still run concurrently'
+
+
+def test_download_soundfiles_quota(sound_repos, tmp_path, caplog):
+    assert len(_download(sound_repos, tmp_path, quota='3500')) == 3
+    assert 'stopping' in caplog.text
+
+
+def test_copy_save_url(cdstar_server, tmp_path, caplog):
+    cdstar_server.static['/js/App.js'] = b'app'
+    log = logging.getLogger(__name__)
+    assert _copy_save_url(cdstar_server.url, 'js/App.js', str(tmp_path / 'App.js'), log=log)
+    assert tmp_path.joinpath('App.js').read_bytes() == b'app'
+    assert not _copy_save_url(cdstar_server.url, 'js/x.js', str(tmp_path / 'x.js'), log=log)
+    assert cdstar_server.url + '/js/x.js' in caplog.text
+
+
+def test_download_soundfiles_db_error(sound_repos, tmp_path, caplog):
+    args = argparse.Namespace(
+        args=['Lg_Dl', 'db_needed'], repos=sound_repos, log=logging.getLogger(__name__),
+        db_host='sqlite:' + str(tmp_path / 'missing' / 'db.sqlite'),
+        db_name=None, db_user=None, db_password=None)
+    download_soundfiles.run(args, out_path=tmp_path / 'sound')
+    assert 'Check DB settings!' in caplog.text
+    assert 'unable to open database file' in caplog.text
@@ -0,0 +1,93 @@
+import hashlib
+
+import pytest
+import requests
+
+from pysoundcomparisons.httpclient import *
+
+DATA = b'x' * 1000
+MD5 = hashlib.md5(DATA).hexdigest()
+
+
+@pytest.fixture
+def http():
+    res = Client(per_host=2, retry=RetryPolicy(backoff=0.01))
+    yield res
+    res.close()
+
+
+@pytest.fixture
+def server(cdstar_server):
+    cdstar_server.add('EAEA0-0000-0000-0001-0', {}, dict(bitstreamid='a.mp3'))
+    cdstar_server.content['EAEA0-0000-0000-0001-0', 'a.mp3'] = DATA
+    cdstar_server.static['/index.html'] = b'<html></html>'
+    return cdstar_server
+
+
+def _bitstream(server, name='a.mp3'):
+    return '{0}/bitstreams/EAEA0-0000-0000-0001-0/{1}'.format(server.url, name)
+
+
+def test_RetryPolicy():
+    policy = RetryPolicy(backoff=1, factor=2, max_backoff=3)
+    assert [policy.delay(i) for i in range(1, 5)] == [1, 2, 3, 3]
+    assert policy.retryable(HTTPError('u', 503))
+    assert not policy.retryable(HTTPError('u', 404))
+    assert policy.retryable(ChecksumMismatch())
+    assert not policy.retryable(KeyError())
+
+
+def test_Client_get(http, server):
+    assert http.get(server.url + '/index.html').content == b'<html></html>'
+    assert http.get_json(server.url + '/metadata/EAEA0-0000-0000-0001-0') == {}
+    with pytest.raises(HTTPError) as e:
+        http.get(server.url + '/missing')
+    assert e.value.status == 404
+    assert len(server.requests) == 3, 'status 404 is not retried'
+
+
+def test_Client_retry(http, server):
+    server.failures['/index.html'] = 2
+    assert http.get(server.url + '/index.html').status_code == 200
+    metrics = http.metrics.asdict()[server.url.split('//')[1]]
+    assert metrics['retries'] == 2 and metrics['errors'] == 2 and metrics['requests'] == 3
+
+    server.failures['/index.html'] = 3
+    with pytest.raises(HTTPError):
+        http.get(server.url + '/index.html')
+    assert 'requests' in str(http.metrics)
+
+
+def test_Client_fetch(http, server, tmp_path):
+    assert http.fetch(_bitstream(server), tmp_path / 'a.mp3', md5=MD5) == (len(DATA), MD5)
+    assert (tmp_path / 'a.mp3').read_bytes() == DATA
+
+    with pytest.raises(ChecksumMismatch):
+        http.fetch(_bitstream(server), tmp_path / 'b.mp3', md5='0' * 32)
+    assert [p.name for p in tmp_path.iterdir()] == ['a.mp3'], 'no partial files remain'
+
+    with pytest.raises(HTTPError):
+        http.fetch(_bitstream(server, 'x.mp3'), tmp_path / 'x.mp3')
+
+
+def test_Client_fetch_all(http, server, tmp_path):
+    server.delay = 0.05
+    jobs = [(_bitstream(server), tmp_path / '{0}.mp3'.format(i), MD5) for i in range(8)]
+    jobs.append((_bitstream(server, 'x.mp3'), tmp_path / 'x.mp3', None))
+    done = []
+    res = http.fetch_all(jobs, callback=lambda job, r: done.append(job))
+    assert res[:8] == [(len(DATA), MD5)] * 8
+    assert isinstance(res[8], HTTPError)
+    assert len(done) == 9
+    assert 1 < server.max_active <= 2
+
+
+def test_Client_install(http, server):
+    session = http.install(requests.Session())
+    assert http.install(session).hooks['response'] == [http._on_response]
+    session.get(server.url + '/index.html')
+    assert http.metrics.asdict()[server.url.split('//')[1]]['requests'] == 1
+
+
+def test_client():
+    assert client() is client(per_host=10)
@@ -0,0 +1,85 @@
+import csv
+
+import pytest
+
+from pysoundcomparisons.db import DB
+from pysoundcomparisons.rawdb import build_sqlite
+from pysoundcomparisons.languagecheck import *
+from pysoundcomparisons.__main__ import main
+
+
+def _write_csv(path, header, *rows):
+    with path.open('w', encoding='utf8', newline='') as fp:
+        w = csv.writer(fp)
+        w.writerow(header)
+        w.writerows(rows)
+
+
+@pytest.fixture
+def raw(tmp_path):
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    _write_csv(raw / 'Studies.csv', ['Name'], ['S'], ['T'], ['U'])
+    _write_csv(
+        raw / 'Languages.csv',
+        ['study', 'LanguageIx', 'ShortName', 'FilePathPart', 'Latitude'],
+        ['S', '1', 'A', 'Lg_A', '1.5'],
+        ['T', '1', 'A', 'Lg_A', '1.5'],
+        ['U', '1', 'A', 'Lg_A', ''],
+        ['S', '2', 'B', 'Lg_B', '2'],
+        ['T', '2', 'Bb', 'Lg_Bb', '2'],
+        ['T', '3', 'C', 'Lg_C', '3'])
+    return raw
+
+
+def test_LanguageTable(raw):
+    table = LanguageTable.from_raw(raw)
+    assert len(table) == 6
+    assert table.values['LanguageIx'] == ['1', '2', '3']
+    assert table.column('Latitude').tolist() == ['1.5', '1.5', '', '2', '2', '3']
+
+
+def test_find_conflicts(raw, tmp_path):
+    conflicts = find_conflicts(LanguageTable.from_raw(raw))
+    assert conflicts.languages == ['1', '2']
+    assert conflicts.fields == ['ShortName', 'FilePathPart', 'Latitude']
+    assert conflicts.matrix.tolist() == [[1, 1, 2], [2, 2, 1]]
+    assert conflicts.by_field() == {'ShortName': 1, 'FilePathPart': 1, 'Latitude': 1}
+    assert conflicts.values('1', 'Latitude') == {'1.5': ['S', 'T'], '': ['U']}
+    report = list(conflicts.report())
+    assert report[0] == 'LanguageIx = 1 (A):'
+    assert report[3] == '    ShortName: "B" in S; "Bb" in T'
+
+    conflicts.write_csv(tmp_path / 'conflicts.csv')
+    with (tmp_path / 'conflicts.csv').open(encoding='utf8') as fp:
+        assert list(csv.reader(fp)) == [
+            ['LanguageIx', 'ShortName', 'FilePathPart', 'Latitude'],
+            ['1', '', '', '2'],
+            ['2', '2', '2', '']]
+
+    conflicts = find_conflicts(
+        LanguageTable.from_raw(raw), ignore=['ShortName', 'FilePathPart', 'Latitude'])
+    assert len(conflicts) == 0
+    assert len(find_conflicts(LanguageTable(['study', 'LanguageIx'], []))) == 0
+
+
+def test_check_languages(raw, tmp_path):
+    with pytest.raises(SystemExit) as e:
+        main(['--repos', str(tmp_path), 'check_languages', str(tmp_path / 'conflicts.csv')])
+    assert e.value.code == 1
+    assert tmp_path.joinpath('conflicts.csv').exists()
+
+    _write_csv(raw / 'Languages.csv', ['study', 'LanguageIx', 'ShortName'], ['S', '1', 'A'])
+    with pytest.raises(SystemExit) as e:
+        main(['--repos', str(tmp_path), 'check_languages'])
+    assert e.value.code == 0
+
+
+def test_LanguageTable_from_db(raw, tmp_path):
+    build_sqlite(raw, tmp_path / 'db.sqlite')
+    db = DB(host='sqlite:' + str(tmp_path / 'db.sqlite'))
+    table = LanguageTable.from_db(db, ['S', 'T', 'U'])
+    assert table.header == ['study', 'LanguageIx', 'ShortName', 'FilePathPart', 'Latitude']
+    # Numbers are read as such from the database, NULL as empty string:
+    assert table.column('Latitude').tolist() == ['1.5', '2.0', '1.5', '2.0', '3.0', '']
+    assert find_conflicts(table).languages == ['1', '2']
@@ -0,0 +1,52 @@
+import re
+import sys
+import subprocess
+
+import pytest
+
+from pysoundcomparisons.__main__ import COMMANDS, LazyCommand, main
+
+HEAVY_MODULES = [
+    'requests',
+    'sqlalchemy',
+    'cdstarcat',
+    'pycdstar',
+    'tqdm',
+    'csvw',
+    'pysoundcomparisons.db',
+    'pysoundcomparisons.mediacatalog',
+]
+
+
+def _importtime(module):
+    """
+    :return: `dict` mapping names of imported modules to cumulative import time in microseconds.
+    """
+    res = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import {0}'.format(module)],
+        stderr=subprocess.PIPE, check=True)
+    return {
+        m.group('name'): int(m.group('cumulative')) for m in re.finditer(
+            r'import time:\s+\d+ \|\s+(?P<cumulative>\d+) \|\s+(?P<name>\S+)',
+            res.stderr.decode('utf8'))}
+
+
+def test_import_time():
+    times = _importtime('pysoundcomparisons.__main__')
+    assert not set(HEAVY_MODULES).intersection(times)
+    # Importing the CLI took about 600ms with all dependencies loaded upfront, about 10ms with
+    # lazily loaded commands.
+    assert times['pysoundcomparisons.__main__'] < 250000
+
+
+@pytest.mark.parametrize('name,module', COMMANDS)
+def test_commands(name, module):
+    cmd = LazyCommand(name, module)
+    assert callable(cmd.func) and cmd.doc
+
+
+def test_help(capsys):
+    with pytest.raises(SystemExit) as e:
+        main(['help', 'write_languages'])
+    assert e.value.code == 0
+    assert 'languages.csv' in capsys.readouterr()[0]
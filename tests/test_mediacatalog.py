@@ -1,6 +1,11 @@
+import json
+import shutil
+import concurrent.futures
 from pathlib import Path
 
 import pytest
+from clldutils.path import md5
+from cdstarcat import Object
 
 from pysoundcomparisons.mediacatalog import *
 
@@ -21,6 +26,25 @@ def test_SoundfileName():
     sfn = SoundfileName('abc_123_def')
     assert not sfn.extension
     assert sfn.variety == 'abc'
+    assert not hasattr(sfn, '__dict__')
+    sfn = SoundfileName('a_b_123_def.mp3')
+    assert (sfn.variety, sfn.word_id, sfn.word, sfn.extension) == ('a_b', '123', 'def', 'mp3')
+    assert sfn == 'a_b_123_def' and sfn.path.name == 'a_b_123_def.mp3'
+
+
+def test_SoundfileNames():
+    names = ['b_001_x.ogg', 'abc', 'a_b_123_def.mp3', 'b_001_x', '']
+    sfns = SoundfileNames.parse(names)
+    assert len(sfns) == 3
+    assert sfns.invalid == ['abc', '']
+    assert sfns.keys() == ['b_001_x', 'a_b_123_def', 'b_001_x']
+    assert [s.extension for s in sfns] == ['ogg', 'mp3', None]
+    assert sfns[1] == SoundfileName(names[2]) and sfns[1].variety == 'a_b'
+    assert sfns.variety[0] is sfns.variety[2]
+    assert list(sfns.by_variety().items()) == [('a_b', ['a_b_123_def']), ('b', ['b_001_x'] * 2)]
+    assert SoundfileNames.parse(['a\nb_123_c', 'b_001_x']).invalid == ['a\nb_123_c']
+    with pytest.raises(ValueError):
+        SoundfileNames.parse(names, strict=True)
 
 
 def test_MediaCatalog(catalog):
@@ -30,8 +54,211 @@ def test_MediaCatalog(catalog):
         catalog.matching_bitstreams("Oce_Van_Mal_Nth_WNth_MaluaBay_Marasup_Dl_626_leaf_lif")) == 3
 
 
+def test_MediaCatalog_indexes(catalog):
+    name = 'Oce_Van_Mal_Nth_WNth_MaluaBay_Marasup_Dl_626_leaf_lif'
+    obj = catalog[name]
+    assert catalog.get_soundfilenames('Oce_Van') == [name]
+    catalog.remove(obj)
+    assert name not in catalog and catalog.get_soundfilenames('Oce_Van') == []
+    catalog[obj.id] = Object.fromdict(obj.id, dict(obj.asdict(), metadata=dict(
+        obj.metadata, name='Oce_Van_x_626_leaf')))
+    assert catalog['Oce_Van_x_626_leaf'].id == obj.id
+    assert catalog.get_soundfilenames('Oce_Van') == ['Oce_Van_x_626_leaf']
+
+
 def test_zip_MediaCatalog(zip_catalog):
     assert "EAEA0-0000-3A1B-047F-0" in zip_catalog
     assert len(zip_catalog["Oce_Van_Mal_Nth_WNth_MaluaBay_Marasup_Dl_626_leaf_lif"].bitstreams) == 3
     assert len(
         zip_catalog.matching_bitstreams("Oce_Van_Mal_Nth_WNth_MaluaBay_Marasup_Dl_626_leaf_lif")) == 3
+
+
+@pytest.fixture
+def image_catalog(tmp_path):
+    images = tmp_path / 'images'
+    images.mkdir()
+    for name in ['AA.jpg', 'BB.png', 'CC.jpg', 'README']:
+        images.joinpath(name).write_text(name)
+    bitstreams = [
+        dict(bitstreamid=n, checksum=md5(images / 'AA.jpg') if n == 'AA.jpg' else 'x',
+             created=1, last_modified=1, filesize=1, **{'content-type': 'image/jpeg'})
+        for n in ['AA.jpg', 'thumbnail.jpg', 'web.jpg']]
+    for bs in bitstreams:
+        bs['last-modified'] = bs.pop('last_modified')
+    catalog = tmp_path / 'catalog.json'
+    catalog.write_text(json.dumps({
+        'EAEA0-0729-4A3B-4E20-0': dict(bitstreams=bitstreams, metadata=dict(name='AA')),
+        'EAEA0-0729-4A3B-4E20-1': dict(bitstreams=bitstreams[1:], metadata=dict(name='BB')),
+    }))
+    return ImageCatalog(catalog), images
+
+
+def test_ImageCatalog_changed_images(image_catalog):
+    catalog, images = image_catalog
+    assert catalog.original_bitstream(catalog.objects['EAEA0-0729-4A3B-4E20-0']).id == 'AA.jpg'
+    assert [(f.name, getattr(o, 'id', None)) for f, o in catalog.changed_images(images)] == [
+        ('BB.png', 'EAEA0-0729-4A3B-4E20-1'), ('CC.jpg', None)]
+
+
+def test_ImageCatalog_indexes(image_catalog):
+    catalog, images = image_catalog
+    obj = catalog.objects['EAEA0-0729-4A3B-4E20-0']
+    obj.metadata['path'] = 'AA.jpg'
+    assert catalog['AA'] is obj and catalog['AA.jpg'] is obj and 'AA.jpg' in catalog
+    assert 'XX' not in catalog
+    with pytest.raises(KeyError):
+        catalog['XX']
+    assert catalog.get_md5(md5(images / 'AA.jpg')) == (obj, obj.bitstreams[0])
+    assert catalog.get_md5('y') is None
+
+    assert [bs.id for bs in catalog.matching_bitstreams('AA')] == [
+        'AA.jpg', 'thumbnail.jpg', 'web.jpg']
+    assert [bs.id for bs in catalog.matching_bitstreams(obj, ['original', 'web'])] == [
+        'AA.jpg', 'web.jpg']
+    obj.bitstreams.pop()
+    assert [bs.id for bs in catalog.matching_bitstreams(obj, ['web'])] == ['AA.jpg']
+    assert catalog.matching_bitstreams('BB', ['original']) == []
+
+    catalog.remove(obj)
+    assert 'AA' not in catalog and catalog.get_md5(md5(images / 'AA.jpg')) is None
+
+
+def test_ImageCatalog_batch(image_catalog):
+    catalog, _ = image_catalog
+    index = catalog._name_map
+    with catalog.batch():
+        catalog.remove('EAEA0-0729-4A3B-4E20-0')
+        assert catalog._name_map is index and 'AA' in catalog
+    assert catalog.dirty and 'AA' not in catalog
+
+
+def test_ImageCatalog_upload(image_catalog, mocker):
+    catalog, images = image_catalog
+
+    def derivatives(path):
+        derivative = images.parent / (path.stem + '_thumbnail.jpg')
+        derivative.write_text('x')
+        return {'height': 1}, [(str(derivative), 'thumbnail.jpg')]
+
+    mocker.patch(
+        'pysoundcomparisons.mediacatalog.ProcessPoolExecutor',
+        concurrent.futures.ThreadPoolExecutor)
+    mocker.patch(
+        'pysoundcomparisons.mediacatalog.image_derivatives',
+        derivatives)
+    obj = mocker.Mock(id='EAEA0-0729-4A3B-4E20-2', bitstreams=[])
+    catalog.api = mocker.Mock(get_object=mocker.Mock(return_value=obj))
+    mocker.patch('pysoundcomparisons.mediacatalog.time')
+    reset = mocker.spy(catalog, '_reset_indexes')
+    assert catalog.upload(images, workers=2) == 2
+    assert reset.call_count == 1, 'indexes are reset once per batch of uploads'
+    assert catalog[catalog.objects[obj.id].metadata['name']] is catalog.objects[obj.id]
+    assert obj.add_bitstream.call_count == 4
+    assert not list(images.parent.glob('*_thumbnail.jpg'))
+    assert 'EAEA0-0729-4A3B-4E20-1' not in catalog.objects
+    assert catalog.objects['EAEA0-0729-4A3B-4E20-2'].metadata['height'] == 1
+
+
+def _bitstream(name, modified):
+    return {
+        'bitstreamid': name, 'checksum': '0' * 32, 'created': 1, 'checksum-algorithm': 'MD5',
+        'last-modified': modified, 'filesize': 10, 'content-type': 'audio/mpeg'}
+
+
+def test_MediaCatalog_sync(cdstar_server, tmp_path):
+    shutil.copy(str(Path(__file__).parent / 'fixtures' / 'catalog.json'), str(tmp_path))
+    cat = MediaCatalog(tmp_path / 'catalog.json', cdstar_url=cdstar_server.url)
+    since = cat.newest_modified()
+    assert since == 1530871118237
+
+    old = cat['EAEA0-0000-3A1B-047F-0']
+    cdstar_server.add(old.id, old.metadata, *[bs.asdict() for bs in old.bitstreams])
+    for i in range(7):
+        name = 'x_{0:03d}_new'.format(i)
+        cdstar_server.add(
+            'EAEA0-0000-0000-000{0}-0'.format(i),
+            dict(collection='soundcomparisons', name=name, type='soundfile'),
+            _bitstream(name + '.mp3', since + i + 1))
+    assert cat.sync(limit=3, workers=2) == ['EAEA0-0000-0000-000{0}-0'.format(i) for i in range(7)]
+    assert 'x_003_new' in cat and len(cat) == 8
+    # Only objects modified since the last sync are requested:
+    assert not [r for r in cdstar_server.requests if old.id in r[1]]
+    assert len([r for r in cdstar_server.requests if r[0] == 'POST']) == 3
+
+    with cat:
+        cdstar_server.objects['EAEA0-0000-0000-0006-0']['bitstream'].append(
+            _bitstream('x_006_new.ogg', since + 100))
+        cdstar_server.requests = []
+        assert cat.sync() == ['EAEA0-0000-0000-0006-0']
+        assert len(cdstar_server.requests) == 2
+    cat = MediaCatalog(tmp_path / 'catalog.json')
+    assert len(cat) == 8 and len(cat['x_006_new'].bitstreams) == 2
+
+
+def test_MediaCatalog_sync_metadata(cdstar_server, tmp_path):
+    shutil.copy(str(Path(__file__).parent / 'fixtures' / 'catalog.json'), str(tmp_path))
+    cat = MediaCatalog(tmp_path / 'catalog.json', cdstar_url=cdstar_server.url)
+    old = cat['EAEA0-0000-3A1B-047F-0']
+    # Only the name changed - e.g. with rename_soundfile - the bitstreams did not:
+    cdstar_server.add(
+        old.id, dict(old.metadata, name='x_626_renamed'), *[bs.asdict() for bs in old.bitstreams])
+    cdstar_server.objects[old.id]['last-modified'] = cat.newest_modified() + 1
+    assert old.metadata['name'] in cat
+    assert cat.sync() == [old.id]
+    assert 'x_626_renamed' in cat and old.metadata['name'] not in cat
+    assert cat[old.id].metadata['name'] == 'x_626_renamed'
+
+
+@pytest.mark.parametrize('name', ['catalog.json', 'catalog.json.zip'])
+def test_MediaCatalog_save(tmp_path, name):
+    shutil.copy(str(Path(__file__).parent / 'fixtures' / name), str(tmp_path))
+    path = tmp_path / name
+    mtime = path.stat().st_mtime_ns
+    with MediaCatalog(path) as cat:
+        assert not cat.dirty
+    assert path.stat().st_mtime_ns == mtime
+
+    obj = cat['EAEA0-0000-3A1B-047F-0']
+    with cat:
+        cat.remove(obj)
+        assert cat.dirty
+        cat['EAEA0-0000-3A1B-047E-0'] = obj
+    assert not cat.dirty and [p.name for p in tmp_path.iterdir()] == [name]
+    cat = MediaCatalog(path)
+    assert list(cat.objects) == ['EAEA0-0000-3A1B-047E-0']
+    assert cat['EAEA0-0000-3A1B-047E-0'].asdict() == obj.asdict()
+
+    assert cat.save(force=True)
+    if not name.endswith('.zip'):
+        assert path.read_text(encoding='utf8') == cat.dumps()
+        assert len(cat.dumps().splitlines()) == len(cat) + 2
+
+
+def test_MediaCatalog_upload(cdstar_server, tmp_path, mocker):
+    shutil.copy(str(Path(__file__).parent / 'fixtures' / 'catalog.json'), str(tmp_path))
+    cat = MediaCatalog(tmp_path / 'catalog.json', cdstar_url=cdstar_server.url)
+    sfn = SoundfileName('Oce_Van_Mal_Nth_WNth_MaluaBay_Marasup_Dl_626_leaf_lif')
+    obj = cat[sfn]
+    # The ogg bitstream is new, the mp3 bitstream changed:
+    del obj.bitstreams[1:]
+    cdstar_server.add(obj.id, obj.metadata, *[bs.asdict() for bs in obj.bitstreams])
+    cdstar_server.content[obj.id, obj.bitstreams[0].id] = b''
+    files = [tmp_path / (sfn + ext) for ext in ['.mp3', '.ogg']]
+    for i, f in enumerate(files):
+        f.write_bytes(str(i).encode() * 1000)
+    mocker.patch('pysoundcomparisons.mediacatalog.time')
+
+    cat._upload(sfn, files)
+    assert {bs.id: bs.md5 for bs in cat[sfn].bitstreams} == {f.name: md5(f) for f in files}
+    assert cdstar_server.content[obj.id, files[1].name] == files[1].read_bytes()
+    assert [r[0] for r in cdstar_server.requests].count('DELETE') == 1
+
+    # Unchanged files are not uploaded again:
+    cdstar_server.requests = []
+    cat._upload(sfn, files)
+    assert not [r for r in cdstar_server.requests if r[0] == 'POST']
+
+    files[1].write_bytes(b'changed')
+    mocker.patch('pysoundcomparisons.mediacatalog.read_hashed', return_value=(b'x', '0' * 32))
+    with pytest.raises(ValueError):
+        cat._upload(sfn, files)
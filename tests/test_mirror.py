@@ -0,0 +1,68 @@
+import os
+import shutil
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from pysoundcomparisons.mediacatalog import MediaCatalog
+from pysoundcomparisons.mirror import *
+from pysoundcomparisons.__main__ import main
+
+VARIETY = 'Oce_Van_Mal_Nth_WNth_MaluaBay_Marasup_Dl'
+NAME = VARIETY + '_626_leaf_lif'
+
+
+@pytest.fixture
+def catalog():
+    return MediaCatalog(Path(__file__).parent / 'fixtures' / 'catalog.json')
+
+
+@pytest.mark.parametrize('size', [0, 10, 3 * 1024 * 1024 + 1])
+def test_file_md5(tmp_path, size):
+    data = os.urandom(size)
+    tmp_path.joinpath('f').write_bytes(data)
+    assert file_md5(tmp_path / 'f') == hashlib.md5(data).hexdigest()
+
+
+def test_verify(catalog, tmp_path):
+    assert len(expected_files(catalog)) == 3
+    assert list(expected_files(catalog, mimetypes=['audio/wav'])) == [
+        '{0}/{1}.wav'.format(VARIETY, NAME)]
+
+    d = tmp_path / VARIETY
+    d.mkdir()
+    d.joinpath(NAME + '.mp3').write_bytes(b'corrupt')
+    d.joinpath('x.mp3').write_bytes(b'')
+    res = verify(catalog, tmp_path, workers=1)
+    assert res['missing'] == ['{0}/{1}.{2}'.format(VARIETY, NAME, ext) for ext in ['ogg', 'wav']]
+    assert res['corrupt'] == ['{0}/{1}.mp3'.format(VARIETY, NAME)]
+    assert res['orphan'] == ['{0}/x.mp3'.format(VARIETY)]
+    assert res['hashed'] == 1 and tmp_path.joinpath('.md5cache.json').exists()
+
+    # Unchanged files are not hashed again:
+    res = verify(catalog, tmp_path, mimetypes=['audio/mpeg'], workers=1)
+    assert res['hashed'] == 0 and not res['missing'] and res['corrupt']
+    assert verify(catalog, tmp_path, workers=1, use_cache=False)['hashed'] == 1
+
+    empty = tmp_path / 'empty'
+    empty.mkdir()
+    assert len(verify(catalog, empty, workers=1)['missing']) == 3
+    assert not verify(catalog, empty, workers=1, partial=True)['missing']
+
+
+@pytest.mark.parametrize('args,code', [
+    (['missing'], 1),
+    (['mirror'], 1),
+    (['mirror', 'partial'], 0),
+])
+def test_verify_soundfiles(tmp_path, args, code):
+    tmp_path.joinpath('soundfiles').mkdir()
+    tmp_path.joinpath('mirror').mkdir()
+    shutil.copy(
+        str(Path(__file__).parent / 'fixtures' / 'catalog.json.zip'),
+        str(tmp_path / 'soundfiles' / 'catalog.json.zip'))
+    args[0] = str(tmp_path / args[0])
+    with pytest.raises(SystemExit) as e:
+        main(['--repos', str(tmp_path), '--workers', '1', 'verify_soundfiles'] + args)
+    assert e.value.code == code
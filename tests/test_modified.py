@@ -0,0 +1,80 @@
+import os
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from pysoundcomparisons.api import SoundComparisons
+from pysoundcomparisons.mediacatalog import MediaCatalog
+from pysoundcomparisons.modified import *
+
+NAME = 'Oce_Van_Mal_Nth_WNth_MaluaBay_Marasup_Dl_626_leaf_lif'
+UID = 'EAEA0-0000-3A1B-047F-0'
+
+
+@pytest.fixture
+def data():
+    return {
+        'new': ['x/x_123_new'],
+        'modified': {'u1': ['x/x_123_a.wav']},
+        'obsolete': {UID: [NAME], 'u2': ['y_123_b']},
+        'check': {},
+        'dup_paths': {'x_123_a': ['u1', 'u3']},
+        'dup_md5': {'abc': ['u1', 'u2']},
+    }
+
+
+def test_records(data, tmp_path):
+    records = list(iter_records(data))
+    assert len(records) == 8
+    assert records[-1] == {'category': 'dup_md5', 'uid': 'u2', 'path': None, 'md5': 'abc'}
+    assert write_records(tmp_path / 'm.jsonl', records) == 8
+    assert list(read_records(tmp_path / 'm.jsonl')) == records
+    assert [r['uid'] for r in read_records(tmp_path / 'm.jsonl', ['obsolete'])] == [UID, 'u2']
+    assert [r['path'] for r in read_records(tmp_path / 'm.jsonl', prefix='x_')] == [
+        'x/x_123_new', 'x/x_123_a.wav', 'x_123_a', 'x_123_a']
+    assert list(filter_records(records, ['obsolete'], prefix='y')) == [
+        {'category': 'obsolete', 'uid': 'u2', 'path': 'y_123_b'}]
+
+
+def test_SoundComparisons_modified_soundfiles(data, tmp_path):
+    tmp_path.joinpath('soundfiles').mkdir()
+    with tmp_path.joinpath('soundfiles', 'modified.json').open('w') as fp:
+        json.dump(data, fp)
+    api = SoundComparisons(tmp_path)
+    expected = [('obsolete', 'u2')]
+    assert [(r['category'], r['uid']) for r in api.modified_soundfiles(['obsolete'], 'y')] == \
+        expected
+    write_records(tmp_path / 'soundfiles' / 'modified.jsonl', iter_records({}))
+    assert list(api.modified_soundfiles(['obsolete'])) == []
+
+
+def test_delete_obsolete(data, tmp_path, mocker):
+    shutil.copy(str(Path(__file__).parent / 'fixtures' / 'catalog.json'), str(tmp_path))
+    catalog = MediaCatalog(tmp_path / 'catalog.json')
+    catalog.api = mocker.Mock()
+    log = mocker.Mock()
+    records = list(iter_records(data)) * 2
+    assert delete_obsolete(catalog, records, batch=1, workers=2, log=log) == 1
+    catalog.api.get_object.assert_called_once_with(UID)
+    assert UID not in catalog.objects
+    assert UID not in json.loads(tmp_path.joinpath('catalog.json').read_text(encoding='utf8'))
+
+    catalog = MediaCatalog(Path(__file__).parent / 'fixtures' / 'catalog.json')
+    catalog.api = mocker.Mock()
+    catalog.api.get_object.return_value.delete.side_effect = ValueError
+    catalog.save = mocker.Mock()
+    assert delete_obsolete(catalog, records, log=log) == 0
+    assert UID in catalog.objects and log.warning.called
+
+
+def test_SoundComparisons_modified_soundfiles_stale(data, tmp_path):
+    tmp_path.joinpath('soundfiles').mkdir()
+    write_records(tmp_path / 'soundfiles' / 'modified.jsonl', iter_records({}))
+    with tmp_path.joinpath('soundfiles', 'modified.json').open('w') as fp:
+        json.dump(data, fp)
+    jsonl = tmp_path / 'soundfiles' / 'modified.jsonl'
+    os.utime(str(jsonl), (jsonl.stat().st_atime, jsonl.stat().st_mtime - 10))
+    api = SoundComparisons(tmp_path)
+    assert [r['uid'] for r in api.modified_soundfiles(['obsolete'])] == [UID, 'u2']
@@ -0,0 +1,61 @@
+import gzip
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from pysoundcomparisons.offline import *
+
+
+@pytest.fixture
+def study():
+    return {
+        'languages': [{'FilePathPart': 'Lg_A'}],
+        'transcriptions': {
+            '1': {'soundPaths': [
+                'sound/Lg_A/Lg_A_010_one.ogg', 'sound/Lg_A/Lg_A_010_one.mp3']},
+            '2': {'soundPaths': [
+                ['https://cdstar.shh.mpg.de/bitstreams/EAEA0-1/Lg_B_020_two:x.ogg'], 'x', '']},
+            '3': {'soundPaths': []},
+            '4': {'Phonetic': '~'},
+        },
+    }
+
+
+def test_encode_study(study):
+    prefixes, varieties, marker, encoded = encode_study(study)
+    assert prefixes == ['sound/Lg_A/', 'https://cdstar.shh.mpg.de/bitstreams/EAEA0-1/']
+    assert varieties == ['Lg_A', 'Lg_B']
+    assert encoded['transcriptions']['1']['soundPaths'] == [
+        '~0,0:_010_one.ogg', '~0,0:_010_one.mp3']
+    assert encoded['transcriptions']['2']['soundPaths'][1:] == ['x', '']
+    assert study['transcriptions']['1']['soundPaths'][0] == 'sound/Lg_A/Lg_A_010_one.ogg'
+    assert decode_study(prefixes, varieties, marker, encoded) == study
+
+    study['transcriptions']['2']['soundPaths'].append('~x')
+    assert encode_study(study)[2] == '^'
+
+
+def test_write_encoded_js(study, tmp_path):
+    stats = write_encoded_js(tmp_path / 'data_study_X.js', 'var localDataStudyX=', study)
+    assert stats['encoded'] == tmp_path.joinpath('data_study_X.js').stat().st_size
+    with gzip.open(str(tmp_path / 'data_study_X.js.gz'), 'rb') as fp:
+        assert fp.read() == tmp_path.joinpath('data_study_X.js').read_bytes()
+    assert stats['gzip'] == tmp_path.joinpath('data_study_X.js.gz').stat().st_size
+    assert 'brotli' in stats
+
+
+def test_write_encoded_js_precompressed(study, tmp_path):
+    data, precompressed = tmp_path / 'data', tmp_path / 'precompressed'
+    data.mkdir()
+    precompressed.mkdir()
+    write_encoded_js(data / 'data_study_X.js', 'var localDataStudyX=', study, precompressed)
+    assert [p.name for p in data.iterdir()] == ['data_study_X.js']
+    assert precompressed.joinpath('data_study_X.js.gz').exists()
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='requires node')
+def test_encoded_js(study):  # pragma: no cover
+    js = encoded_js('var localDataStudyX=', study) + ';console.log(JSON.stringify(localDataStudyX))'
+    assert json.loads(subprocess.check_output(['node', '-e', js]).decode('utf8')) == study
@@ -0,0 +1,74 @@
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from pysoundcomparisons.profiling import *
+from pysoundcomparisons.__main__ import LazyCommand
+
+
+def test_profile():
+    p = Profile()
+    with p.timer('a'):
+        time.sleep(0.01)
+    with p.timer('a'):
+        pass
+    p.count('n', 5)
+    p.count('n')
+    res = p.asdict(command='x')
+    assert res['command'] == 'x'
+    assert res['phases']['a']['calls'] == 2 and res['phases']['a']['seconds'] >= 0.01
+    assert res['counters'] == {'n': 6}
+
+
+def test_profile_threads():
+    p = Profile()
+
+    def work(_):
+        for _ in range(2000):
+            with p.timer('a'):
+                p.count('n')
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(work, range(8)))
+    finally:
+        sys.setswitchinterval(interval)
+    assert p.phases['a']['calls'] == p.counters['n'] == 16000
+
+
+def test_timed():
+    PROFILE.reset()
+
+    @timed('f')
+    def f(x):
+        count('f calls')
+        return x
+
+    assert f(3) == 3
+    with timer('g'):
+        f(1)
+    assert PROFILE.phases['f']['calls'] == 2 and PROFILE.phases['g']['calls'] == 1
+    assert PROFILE.counters['f calls'] == 2
+
+
+def test_profiled_command(mocker, tmp_path, capsys):
+    def run(args):
+        with timer('http'):
+            return 5
+
+    mocker.patch.object(LazyCommand, 'func', new_callable=mocker.PropertyMock, return_value=run)
+    cmd = LazyCommand('cmd', 'cmd')
+    assert cmd(argparse.Namespace()) == 5
+
+    assert cmd(argparse.Namespace(profile='-', cprofile=False)) == 5
+    assert json.loads(capsys.readouterr()[0])['phases']['http']['calls'] == 1
+
+    out = tmp_path / 'profile.json'
+    assert cmd(argparse.Namespace(profile=str(out), cprofile=True)) == 5
+    res = json.loads(out.read_text(encoding='utf8'))
+    assert res['command'] == 'cmd' and res['cprofile']
+    assert tmp_path.joinpath('profile.json.pstats').exists()
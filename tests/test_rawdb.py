@@ -0,0 +1,94 @@
+import csv
+import sqlite3
+
+import pytest
+
+from pysoundcomparisons.rawdb import *
+from pysoundcomparisons.soundpaths import iter_paths_raw, iter_paths_db
+
+
+def _write_csv(path, header, *rows):
+    with path.open('w', encoding='utf8', newline='') as fp:
+        w = csv.writer(fp)
+        w.writerow(header)
+        w.writerows(rows)
+
+
+@pytest.fixture
+def raw(tmp_path):
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    _write_csv(raw / 'Studies.csv', ['Name'], ['S'], ['T'], ['Europe'])
+    _write_csv(
+        raw / 'Languages.csv',
+        ['study', 'LanguageIx', 'ShortName', 'FilePathPart', 'Latitude'],
+        ['S', '11111111111', 'A', 'Lg_A', '1.5'], ['S', '2', 'B', 'Lg_B', ''],
+        ['T', '11111111111', 'A', 'Lg_A', '1.5'], ['Europe', '3', 'E', 'Lg_E', '3'])
+    _write_csv(
+        raw / 'Words.csv',
+        ['study', 'IxElicitation', 'IxMorphologicalInstance', 'SoundFileWordIdentifierText'],
+        ['S', '10', '0', '_010_one'], ['S', '20', '0', '_020_two'], ['T', '10', '0', '_010'],
+        ['Europe', '10', '0', '_x'])
+    _write_csv(
+        raw / 'Transcriptions.csv',
+        ['study', 'LanguageIx', 'IxElicitation', 'IxMorphologicalInstance',
+         'AlternativeLexemIx', 'AlternativePhoneticRealisationIx'],
+        ['S', '11111111111', '10', '0', '0', '2'], ['S', '11111111111', '10', '0', '0', '0'],
+        ['T', '11111111111', '10', '0', '2', '0'], ['Europe', '3', '10', '0', '2', '0'])
+    return raw
+
+
+def test_column_types(tmp_path):
+    _write_csv(
+        tmp_path / 't.csv', ['i', 'r', 't', 'z', 'e'],
+        ['1', '1.5', 'a', '01', ''], ['-2', '', '1', '1', ''])
+    assert column_types(tmp_path / 't.csv') == [
+        ('i', 'INTEGER'), ('r', 'REAL'), ('t', 'TEXT'), ('z', 'TEXT'), ('e', 'INTEGER')]
+
+
+def test_build_sqlite(raw, tmp_path):
+    res = build_sqlite(raw, tmp_path / 'db.sqlite')
+    assert res == {'Studies': 3, 'Languages': 4, 'Words': 4, 'Transcriptions': 4}
+    assert not list(tmp_path.glob('.*.tmp'))
+
+    con = sqlite3.connect(str(tmp_path / 'db.sqlite'))
+    indexes = {r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert 'ix_Transcriptions_LanguageIx' in indexes
+    assert 'ix_Words_IxElicitation' in indexes
+    assert 'ix_Languages_study' in indexes
+    assert con.execute(
+        "SELECT Latitude FROM Languages WHERE LanguageIx = 2").fetchone() == (None,)
+    # Per-study views, without the study column:
+    cursor = con.execute('SELECT * FROM Languages_S ORDER BY LanguageIx')
+    assert [d[0] for d in cursor.description] == [
+        'LanguageIx', 'ShortName', 'FilePathPart', 'Latitude']
+    assert [r[0] for r in cursor] == [2, 11111111111]
+    # Identical rows of a language in different studies collapse in a UNION:
+    assert len(con.execute(
+        'SELECT * FROM Languages_S UNION SELECT * FROM Languages_T').fetchall()) == 2
+    con.close()
+
+    # Rebuilding replaces the database:
+    (raw / 'Words.csv').unlink()
+    assert 'Words' not in build_sqlite(raw, tmp_path / 'db.sqlite')
+
+
+def test_DB_sqlite(raw, tmp_path):
+    from pysoundcomparisons.db import DB
+
+    build_sqlite(raw, tmp_path / 'db.sqlite')
+    db = DB(host='sqlite:' + str(tmp_path / 'db.sqlite'))
+    assert db.is_sqlite
+    assert db("SET @@group_concat_max_len = 4096") is None
+    assert [r['ShortName'] for r in db(
+        "SELECT ShortName FROM Languages_S WHERE LanguageIx = %s", (2,))] == ['B']
+    # Only placeholders outside of string literals are adapted:
+    assert [tuple(r) for r in db(
+        "SELECT ShortName, '%s' FROM Languages_S WHERE LanguageIx = %s", (2,))] == [('B', '%s')]
+    res = db("SELECT LanguageIx, ShortName FROM Languages_S WHERE LanguageIx = %s", (2,))
+    assert res.keys() == ['LanguageIx', 'ShortName'] and res[0][1:] == ('B',)
+    assert res[0].items() == [('LanguageIx', 2), ('ShortName', 'B')]
+    # Changes are committed:
+    assert db("CREATE TABLE t (x INTEGER)") == [] and db("SELECT * FROM t").keys() == ['x']
+    assert sorted(set(iter_paths_db(db, ['S', 'T', 'Europe']))) == \
+        sorted(set(iter_paths_raw(raw)))
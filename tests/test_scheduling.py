@@ -0,0 +1,53 @@
+import types
+
+import pytest
+
+from pysoundcomparisons.scheduling import *
+
+
+def _download(size):
+    return types.SimpleNamespace(bitstream=types.SimpleNamespace(size=size))
+
+
+@pytest.mark.parametrize('order,sizes', [
+    ('name', [3, 1, 5, 2, 4]),
+    ('small', [1, 2, 3, 4, 5]),
+    ('interleaved', [1, 5, 2, 4, 3]),
+])
+def test_schedule(order, sizes):
+    res = schedule([_download(s) for s in [3, 1, 5, 2, 4]], order=order)
+    assert [d.bitstream.size for d in res] == sizes
+
+
+def test_schedule_invalid():
+    with pytest.raises(ValueError):
+        schedule([], order='random')
+
+
+@pytest.mark.parametrize(
+    's,size', [('100', 100), ('2k', 2048), ('1.5M', 1572864), ('1GB', 2 ** 30)])
+def test_parse_size(s, size):
+    assert parse_size(s) == size
+
+
+def test_parse_size_invalid():
+    with pytest.raises(ValueError):
+        parse_size('x')
+
+
+def test_Budget():
+    clock = types.SimpleNamespace(now=0)
+    budget = Budget(1000, rate=100, quota=500, clock=lambda: clock.now)
+    assert budget.eta() is None and 'ETA ?' in str(budget)
+    budget.skip(200)
+    # Concurrent transfers are spread out to keep the rate:
+    assert [budget.reserve(100) for _ in range(3)] == [0, 1.0, 2.0]
+    budget.consume(100)
+    clock.now += 6
+    budget.consume(100)
+    assert budget.reserve(100) == 0, 'no need to wait, we are behind the rate limit'
+    assert budget.remaining == 600 and budget.eta() == pytest.approx(600 / (200 / 6))
+    budget.check(300)
+    with pytest.raises(QuotaExceeded):
+        budget.check(301)
+    assert Budget(1000).reserve(1000) == 0
@@ -0,0 +1,71 @@
+from pathlib import Path
+
+import pytest
+
+from pysoundcomparisons.mediacatalog import MediaCatalog
+from pysoundcomparisons.selection import *
+
+VARIETY = 'Oce_Van_Mal_Nth_WNth_MaluaBay_Marasup_Dl'
+NAME = VARIETY + '_626_leaf_lif'
+UID = 'EAEA0-0000-3A1B-047F-0'
+
+
+@pytest.fixture
+def catalog():
+    return MediaCatalog(Path(__file__).parent / 'fixtures' / 'catalog.json')
+
+
+class DB(object):
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, sql):
+        self.queries.append(sql)
+        if sql.startswith('select Name'):
+            return [{'Name': 'Pacific'}, {'Name': 'Europe'}]
+        res = []
+        if "'Pacific' AS s" in sql:
+            res.append({'f': VARIETY, 'i': 11121250509, 's': 'Pacific'})
+        if "'Europe' AS s" in sql:
+            res.append({'f': 'Ger_Eng', 'i': 11131000008, 's': 'Europe'})
+        return res
+
+
+@pytest.mark.parametrize('items', [
+    [UID], [NAME], [NAME + '.mp3'], [VARIETY], [VARIETY[:10]], [UID, NAME, VARIETY]])
+def test_Selection(catalog, items):
+    sel = Selection.from_args(items + ['ogg', 'mp3'], catalog)
+    assert sel.keys.keys() == [NAME] and not sel.warnings
+    assert sel.estimate() == (2, 23703 + 27949)
+    assert [d.folder for d in sel.downloads()] == [VARIETY] * 2
+    assert '1 sound files selected - 2 files' in str(sel)
+
+
+def test_Selection_default_extensions(catalog):
+    sel = Selection.from_args([UID, 'x_123_unknown'], catalog)
+    assert len(sel.downloads()) == 3 and sel.prefixes == ['x_123_unknown']
+
+
+def test_Selection_db(catalog):
+    db = DB()
+    sel = Selection.from_args(['Pacific', '11131000008', '11199999999'], catalog, db=db)
+    assert sel.studies == ['Pacific'] and sel.language_ixs == ['11131000008', '11199999999']
+    assert sel.keys.keys() == [NAME]
+    assert sel.warnings == [
+        'Nothing found for Ger_Eng in catalog - will be ignored',
+        'LanguageIx 11199999999 unknown - will be ignored']
+    # Studies and LanguageIx are resolved with a single query:
+    assert len(db.queries) == 2 and 'LanguageIx IN (11131000008,11199999999)' in db.queries[1]
+
+
+def test_Selection_transcodes(catalog):
+    sel = Selection.from_args([UID], catalog)
+    assert not sel.transcodes()
+    obj = catalog[UID]
+    obj.bitstreams.pop(0)  # Remove the mp3 bitstream.
+    sel = Selection.from_args([UID, 'mp3'], catalog)
+    assert [d.bitstream.id for d in sel.downloads()] == [NAME + '.ogg']
+    assert sel.downloads(transcode=True) == []
+    assert [(d.bitstream.id, ext) for d, ext in sel.transcodes()] == [(NAME + '.wav', 'mp3')]
+    assert [(d.bitstream.id, ext) for d, ext in sel.transcodes(('ogg', 'wav'))] == [
+        (NAME + '.ogg', 'mp3')]
@@ -0,0 +1,74 @@
+import csv
+import random
+
+import pytest
+
+from pysoundcomparisons.soundpaths import *
+
+
+def _write_csv(path, header, *rows):
+    with path.open('w', encoding='utf8', newline='') as fp:
+        w = csv.writer(fp)
+        w.writerow(header)
+        w.writerows(rows)
+
+
+@pytest.mark.parametrize('lex,pron,suffix', [
+    (0, 0, ''), (1, 1, ''), ('2', '0', '_lex2'), (0, 3, '_pron3'), (2, 3, '_lex2_pron3'),
+    (1, 2, '')])
+def test_alternative_suffix(lex, pron, suffix):
+    assert alternative_suffix(lex, pron) == suffix
+
+
+def test_iter_paths_raw(tmp_path):
+    _write_csv(
+        tmp_path / 'Languages.csv',
+        ['study', 'LanguageIx', 'FilePathPart'],
+        ['S', '1', 'Lg_A'], ['S', '2', 'Lg_B'], ['Europe', '3', 'Lg_E'])
+    _write_csv(
+        tmp_path / 'Words.csv',
+        ['study', 'IxElicitation', 'IxMorphologicalInstance', 'SoundFileWordIdentifierText'],
+        ['S', '10', '0', '_010_one'], ['S', '20', '0', '_020_two'], ['Europe', '10', '0', '_x'])
+    _write_csv(
+        tmp_path / 'Transcriptions.csv',
+        ['study', 'LanguageIx', 'IxElicitation', 'IxMorphologicalInstance',
+         'AlternativeLexemIx', 'AlternativePhoneticRealisationIx'],
+        ['S', '1', '10', '0', '0', '2'], ['S', '1', '10', '0', '0', '0'],
+        ['Europe', '3', '10', '0', '2', '0'])
+    assert sorted(set(iter_paths_raw(tmp_path))) == [
+        'Lg_A/Lg_A_010_one', 'Lg_A/Lg_A_010_one_pron2', 'Lg_A/Lg_A_020_two',
+        'Lg_B/Lg_B_010_one', 'Lg_B/Lg_B_020_two']
+
+
+def test_external_sort():
+    items = ['b{0}'.format(i) for i in range(100)] + ['A{0}'.format(i) for i in range(100)]
+    items = items + items[:50]
+    random.Random(1).shuffle(items)
+    expected = sorted(set(items), key=lambda s: (s.lower(), s))
+    assert list(external_sort(items, chunk_size=7)) == expected
+    assert list(external_sort(['a', 'B', 'A'])) == ['A', 'a', 'B']
+    assert list(external_sort([])) == []
+
+
+def test_write_paths(tmp_path):
+    assert write_paths(tmp_path / 'p.txt', ['a', 'b']) == 2
+    assert tmp_path.joinpath('p.txt').read_text(encoding='utf8') == 'a\nb'
+
+
+def test_SoundPathIndex(tmp_path):
+    items = ['x_{0}'.format(i) for i in range(1000)] + ['ü', 'z', 'ä'] * 2
+    assert SoundPathIndex.write(tmp_path / 'i.idx', items, chunk_size=100) == 1003
+    with SoundPathIndex(tmp_path / 'i.idx') as idx:
+        assert len(idx) == 1003
+        assert list(idx) == sorted(set(items))
+        assert idx[0] == 'x_0' and idx[1002] == 'ü'
+        assert all(i in idx for i in items)
+        assert not any(i in idx for i in ['', 'x', 'x_1000', 'zz', 'ö'])
+
+    SoundPathIndex.write(tmp_path / 'empty.idx', [])
+    with SoundPathIndex(tmp_path / 'empty.idx') as idx:
+        assert len(idx) == 0 and 'a' not in idx
+
+    tmp_path.joinpath('p.txt').write_text('abcdefgh', encoding='utf8')
+    with pytest.raises(ValueError):
+        SoundPathIndex(tmp_path / 'p.txt')
@@ -0,0 +1,62 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from pysoundcomparisons.mediacatalog import MediaCatalog
+from pysoundcomparisons.store import *
+
+DATA = b'sound'
+MD5 = hashlib.md5(DATA).hexdigest()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return Store(tmp_path / 'store')
+
+
+def download(data=DATA):
+    def f(path):
+        Path(path).write_bytes(data)
+    return f
+
+
+def test_Store(store, tmp_path, mocker):
+    path = store.fetch(MD5, download())
+    assert MD5 in store and path.read_bytes() == DATA
+    assert list(store) == [(MD5, path)]
+
+    dl = mocker.Mock()
+    assert store.fetch(MD5, dl) == path and not dl.called
+
+    with pytest.raises(ValueError):
+        store.fetch('0' * 32, download())
+    file_md5 = mocker.patch('pysoundcomparisons.store.file_md5')
+    with pytest.raises(ValueError):
+        store.fetch('0' * 32, lambda path: (len(DATA), MD5))
+    assert not file_md5.called
+    assert '0' * 32 not in store and len(list(path.parent.parent.glob('*/*'))) == 1
+
+    for i in range(3):
+        target = tmp_path / 'mirror{0}'.format(i) / 'a.mp3'
+        target.parent.mkdir()
+        target.write_bytes(b'old')
+        store.link(MD5, target)
+        assert target.read_bytes() == DATA
+        assert store.link(MD5, target) == target
+    assert store.stats() == {'objects': 1, 'bytes': 5, 'links': 2, 'bytes_linked': 10}
+
+
+def test_Store_symlink(store, tmp_path, mocker):
+    store.fetch(MD5, download())
+    mocker.patch('pysoundcomparisons.store.os.link', mocker.Mock(side_effect=OSError))
+    target = tmp_path / 'a.mp3'
+    store.link(MD5, target)
+    assert target.is_symlink() and target.read_bytes() == DATA
+
+
+def test_dedup_stats():
+    catalog = MediaCatalog(Path(__file__).parent / 'fixtures' / 'catalog.json')
+    res = dedup_stats(catalog)
+    assert res['bitstreams'] == res['unique_bitstreams'] == 3 and res['bytes_saved'] == 0
+    assert dedup_stats(catalog, mimetypes=['audio/wav'])['bytes'] == 185794
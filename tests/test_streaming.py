@@ -0,0 +1,37 @@
+import io
+import hashlib
+
+import pytest
+
+from pysoundcomparisons.streaming import *
+
+DATA = b'abc' * 1000
+MD5 = hashlib.md5(DATA).hexdigest()
+
+
+def test_HashingReader(tmp_path):
+    p = tmp_path / 'a.wav'
+    p.write_bytes(DATA)
+    with p.open('rb') as fp:
+        reader = HashingReader(fp)
+        assert len(reader) == len(DATA)
+        assert reader.read(10) == DATA[:10] and len(reader) == len(DATA) - 10
+        assert b''.join(reader) == DATA[10:]
+    assert reader.hexdigest() == MD5 and reader.size == len(DATA)
+
+
+def test_read_hashed(tmp_path):
+    p = tmp_path / 'a.wav'
+    p.write_bytes(DATA)
+    assert read_hashed(p) == (DATA, MD5)
+
+
+def test_write_hashed(tmp_path):
+    chunks = [DATA[i:i + 100] for i in range(0, len(DATA), 100)]
+    assert write_hashed(chunks, tmp_path / 'a.wav', md5=MD5) == (len(DATA), MD5)
+    assert (tmp_path / 'a.wav').read_bytes() == DATA
+
+    with pytest.raises(ChecksumMismatch):
+        write_hashed(io.BytesIO(b'x'), tmp_path / 'a.wav', md5=MD5)
+    assert [p.name for p in tmp_path.iterdir()] == ['a.wav']
+    assert (tmp_path / 'a.wav').read_bytes() == DATA
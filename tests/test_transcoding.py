@@ -0,0 +1,44 @@
+import concurrent.futures
+from pathlib import Path
+
+import pytest
+
+from pysoundcomparisons.transcoding import *
+
+
+@pytest.fixture
+def ffmpeg(mocker):
+    def run(cmd, check=True):
+        if 'fail' in cmd[5]:
+            raise OSError()
+        Path(cmd[-1]).write_text(cmd[-2], encoding='utf8')
+
+    mocker.patch('pysoundcomparisons.transcoding.ffmpeg', mocker.Mock(return_value='ffmpeg'))
+    mocker.patch(
+        'pysoundcomparisons.transcoding.ProcessPoolExecutor', concurrent.futures.ThreadPoolExecutor)
+    return mocker.patch('pysoundcomparisons.transcoding.subprocess.run', side_effect=run)
+
+
+def test_transcode(ffmpeg, tmp_path):
+    transcode(tmp_path / 'a.wav', tmp_path / 'a.ogg', 'ogg')
+    assert 'libvorbis' in ffmpeg.call_args[0][0]
+
+
+def test_TranscodeCache(ffmpeg, tmp_path, mocker):
+    cache = TranscodeCache(tmp_path / 'cache')
+    jobs = [
+        (tmp_path / 'a.wav', 'a' * 32, 'ogg'),
+        (tmp_path / 'a.wav', 'a' * 32, 'mp3'),
+        (tmp_path / 'b.wav', 'a' * 32, 'ogg'),  # Same content.
+        (tmp_path / 'fail.wav', 'f' * 32, 'ogg'),
+    ]
+    log = mocker.Mock()
+    res = cache.transcode_all(jobs, workers=2, log=log)
+    assert set(res) == {('a' * 32, 'ogg'), ('a' * 32, 'mp3')}
+    assert res['a' * 32, 'ogg'].read_text(encoding='utf8') == 'ogg'
+    assert ffmpeg.call_count == 3 and log.warning.call_count == 1
+    assert ('a' * 32, 'mp3') in cache and ('f' * 32, 'ogg') not in cache
+    assert not list(cache.root.glob('*/*/.*'))
+
+    assert set(cache.transcode_all(jobs[:2])) == {('a' * 32, 'ogg'), ('a' * 32, 'mp3')}
+    assert ffmpeg.call_count == 3
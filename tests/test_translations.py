@@ -0,0 +1,33 @@
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+
+from pysoundcomparisons.translations import *
+
+
+def test_bundle(tmp_path):
+    translations = {'en': {'b': 'B', 'a': 'A'}, 'de': {'a': 'Ä'}}
+    bundle = make_bundle(translations)
+    assert bundle == {'keys': ['a', 'b'], 'languages': {'de': ['Ä', None], 'en': ['A', 'B']}}
+    assert i18n(bundle) == {
+        'de': {'translation': {'a': 'Ä'}}, 'en': {'translation': {'a': 'A', 'b': 'B'}}}
+    assert list(i18n(bundle, ['en'])) == ['en']
+    with pytest.raises(KeyError):
+        i18n(bundle, ['fr'])
+
+    sizes = write_bundle(tmp_path / BUNDLE, bundle)
+    assert tmp_path / (BUNDLE + '.gz') in sizes
+    assert read_bundle(tmp_path / BUNDLE) == bundle
+    with gzip.open(str(tmp_path / (BUNDLE + '.gz')), 'rt', encoding='utf8') as fp:
+        assert json.load(fp) == bundle
+    assert '\n' not in tmp_path.joinpath(BUNDLE).read_text(encoding='utf8')
+
+
+def test_read_translations():
+    d = Path(__file__).parent.parent / 'translations'
+    translations = read_translations(d)
+    assert 'en' in translations
+    bundle = make_bundle(translations)
+    assert dict(i18n(bundle, ['en'])['en']['translation']) == dict(translations['en'])
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from pysoundcomparisons.uploadsync import *
+
+
+@pytest.fixture
+def upload(tmp_path):
+    d = tmp_path / 'upload'
+    d.mkdir()
+    for name in ['a_b_123_x.mp3', 'a_b_123_x.ogg', 'c_001_y.wav', 'README', '.hidden']:
+        d.joinpath(name).write_text(name, encoding='utf8')
+    return d
+
+
+@pytest.fixture
+def catalog(mocker):
+    return mocker.Mock()
+
+
+def test_Journal(tmp_path):
+    j = Journal(tmp_path / 'journal')
+    j.add(('a', 1, 2), md5='x')
+    with j.path.open('a', encoding='utf8') as fp:
+        fp.write('{"name": "trunc')
+    j = Journal(tmp_path / 'journal')
+    assert ('a', 1, 2) in j and len(j) == 1
+
+
+def test_sync_upload(upload, catalog, tmp_path):
+    assert sync_upload(catalog, upload, batch=1) == 2
+    assert catalog._upload.call_count == 2 and catalog.save.call_count == 3
+    assert sync_upload(catalog, upload) == 0
+
+    # Changed files are uploaded again:
+    upload.joinpath('c_001_y.wav').write_text('changed', encoding='utf8')
+    assert sync_upload(catalog, upload) == 1
+    assert [p.name for p in catalog._upload.call_args[0][1]] == ['c_001_y.wav']
+
+    archive = tmp_path / 'archive'
+    upload.joinpath('c_001_y.mp3').write_text('new', encoding='utf8')
+    assert sync_upload(catalog, upload, archive=archive) == 1
+    assert archive.joinpath('c', 'c_001_y.mp3').exists()
+    assert archive.joinpath('c', 'c_001_y.wav').exists()
+    assert sorted(p.name for p in upload.iterdir()) == [
+        '.hidden', '.journal.jsonl', 'README', 'a_b_123_x.mp3', 'a_b_123_x.ogg']
+
+
+def test_sync_upload_snapshot(upload, catalog):
+    snapshot = {p.name: (p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in upload.iterdir()}
+    st = upload.joinpath('c_001_y.wav').stat()
+    os.utime(str(upload / 'c_001_y.wav'), ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+    assert sync_upload(catalog, upload, snapshot=snapshot) == 1
+    assert catalog._upload.call_args[0][0] == 'a_b_123_x'
+
+
+def test_watch(upload, catalog, mocker):
+    sleep = mocker.patch('pysoundcomparisons.uploadsync.time.sleep')
+    assert watch(catalog, upload, archive=upload / 'archive', polls=2) == 2
+    assert sleep.call_count == 1
+    assert not list(upload.glob('*.mp3'))